@@ -0,0 +1,348 @@
+# scripts/aggregates.py
+# -*- coding: utf-8 -*-
+"""
+Sektör / pazar / endeks agregaları: her grup ve her dönem için hazır istatistikler.
+
+Gruplar kap_json/<T>.json summary bloğundan (screen.py ile aynı anahtarlar):
+  sector:<sektor_ana>, sub:<sektor_alt_list>, market:<islem_gordugu_pazar>,
+  index:<dahil_oldugu_endeksler>, all:BIST (tüm şirketler)
+Değerler ratios/<T>.json'dan (scripts/ratios.py): her dönem satırı + "latest"
+(her şirketin son dönemi ve piyasa çarpanları; sektör medyan F/K'sı buradan).
+
+Her grup × dönem × metrik için: n, sum (yalnızca toplanabilir metrikler), mean,
+p10, p25, median, p75, p90. Oran metrikleri için ayrıca ağırlıklı değer (WEIGHTED:
+ör. net_margin = Σ net kâr / Σ satış, pe = Σ piyasa değeri / Σ net kâr).
+
+Artımlı güncelleme (aggregates/state.json):
+  tickers : ticker -> {stat: [ratios, kap] (boyut, mtime_ns), groups{anahtar: etiket},
+                       periods{dönem: [AGG_METRICS sırasında değerler]}}
+  Yalnızca ratios / kap_json dosyası değişen tickerlar yeniden okunur; eski ve yeni
+  grupları kirli işaretlenir ve sadece kirli gruplar yeniden hesaplanır / yazılır.
+  Üye listesi boşalan grubun dosyası ve DB satırları silinir.
+
+Çıktılar:
+  docs/aggregates/index.json           : grup listesi {key, kind, name, n, file}
+  docs/aggregates/<kind>/<slug>.json   : {key, kind, name, members, periods,
+                                          stats{metrik: {n, median, ...: [dönem başına]}},
+                                          weighted{metrik: [dönem başına]}}
+  Supabase 'aggregates' tablosu (ENV varsa): group_key, kind, name, period ("2025/6"
+  veya "latest"), metric, n, sum, mean, p10, p25, median, p75, p90, weighted;
+  on_conflict group_key,period,metric
+
+Kullanım:
+  python3 scripts/aggregates.py                  # artımlı güncelle (+ DB)
+  python3 scripts/aggregates.py --force --no-db  # baştan hesapla
+  python3 scripts/aggregates.py show "sector:İMALAT" pe --period latest
+Gereken ENV (DB yazmak için):
+  SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+"""
+
+import os, json, time, argparse
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from merge_kap_bilanco import KAP_DIR, ensure_dir, load_json_safe, supabase_client_or_none, upsert
+import metrics
+import ratios
+from quarterly import period_index, read_tickers
+from kap_types import fold, norm
+
+AGG_DIR = "aggregates"
+STATE_PATH = os.path.join(AGG_DIR, "state.json")
+DOCS_DIR = os.path.join("docs", "aggregates")
+VERSION = 1
+DB_TABLE = "aggregates"
+LATEST = "latest"
+
+AGG_METRICS = ratios.METRICS + ["market_cap", "ev", "pe", "pb", "ev_ebitda"]
+SUM_METRICS = {"revenue_ttm", "net_income_ttm", "ebitda_ttm", "equity", "total_assets",
+               "cash", "total_debt", "net_debt", "market_cap", "ev"}
+# metrik -> (pay, payda): grup değeri = Σ pay / Σ payda (ikisi de dolu olan üyeler)
+WEIGHTED = {
+    "net_margin": ("net_income_ttm", "revenue_ttm"),
+    "roe": ("net_income_ttm", "equity"),
+    "roa": ("net_income_ttm", "total_assets"),
+    "debt_to_equity": ("total_debt", "equity"),
+    "pe": ("market_cap", "net_income_ttm"),
+    "pb": ("market_cap", "equity"),
+    "ev_ebitda": ("ev", "ebitda_ttm"),
+}
+QUANTILES = [("p10", 10), ("p25", 25), ("median", 50), ("p75", 75), ("p90", 90)]
+STATS = ["n", "sum", "mean"] + [q for q, _ in QUANTILES]
+
+def _stat(path: str) -> List[int]:
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except FileNotFoundError:
+        return [-1, -1]
+
+def slug(label: str) -> str:
+    return fold(label).lower().replace(" ", "-") or "_"
+
+def group_file(key: str) -> str:
+    kind, label = key.split(":", 1)
+    return f"{kind}/{slug(label)}.json"
+
+def groups_of(summary: Dict[str, Any]) -> Dict[str, str]:
+    """KAP summary -> {grup anahtarı: etiket}."""
+    out = {"all:BIST": "BIST"}
+    def mark(kind: str, label: Optional[str]):
+        if label and norm(label):
+            out.setdefault(f"{kind}:{norm(label)}", label)
+    mark("sector", summary.get("sektor_ana"))
+    for sub in summary.get("sektor_alt_list") or []:
+        mark("sub", sub)
+    mark("market", summary.get("islem_gordugu_pazar"))
+    for ix in summary.get("dahil_oldugu_endeksler") or []:
+        mark("index", ix)
+    return out
+
+def contributions(doc: Dict[str, Any]) -> Dict[str, List[Optional[float]]]:
+    """ratios dokümanı -> {dönem: değerler}; son dönemin piyasa çarpanlarıyla 'latest'."""
+    out = {}
+    for r in doc.get("periods") or []:
+        out[r["period"]] = [r.get(m) for m in AGG_METRICS]
+    latest = doc.get("latest") or {}
+    if latest.get("period"):
+        out[LATEST] = [latest.get(m) for m in AGG_METRICS]
+    return out
+
+def _period_order(pk: str) -> int:
+    return 1 << 30 if pk == LATEST else period_index(pk)
+
+def _clean(x: float) -> Optional[float]:
+    return None if not np.isfinite(x) else float(x)
+
+def quantiles(X: np.ndarray, n: np.ndarray, qs: List[float]) -> np.ndarray:
+    """np.nanpercentile(X, qs, axis=0) (doğrusal ara değer) sütun döngüsü olmadan:
+    NaN'lar sıralamada sona düşer, her sütunun ilk n değeri üzerinden indekslenir."""
+    S = np.sort(X, axis=0)
+    out = np.full((len(qs),) + X.shape[1:], np.nan)
+    has = n > 0
+    for i, q in enumerate(qs):
+        pos = (n - 1).clip(min=0) * (q / 100.0)
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, (n - 1).clip(min=0))
+        a = np.take_along_axis(S, lo[None], axis=0)[0]
+        b = np.take_along_axis(S, hi[None], axis=0)[0]
+        out[i] = np.where(has, a + (b - a) * (pos - lo), np.nan)
+    return out
+
+def group_stats(members: List[Dict[str, List[Optional[float]]]]) -> Tuple[List[str], Dict[str, Dict[str, list]], Dict[str, list]]:
+    """Üye katkıları -> (dönemler, stats{metrik: {istatistik: [dönem başına]}}, weighted)."""
+    periods = sorted({pk for m in members for pk in m}, key=_period_order)
+    pi = {pk: i for i, pk in enumerate(periods)}
+    X = np.full((len(members), len(periods), len(AGG_METRICS)), np.nan)
+    for i, m in enumerate(members):
+        for pk, vals in m.items():
+            X[i, pi[pk]] = [np.nan if v is None else v for v in vals]
+    X[~np.isfinite(X)] = np.nan
+    ok = ~np.isnan(X)
+    n = ok.sum(axis=0)                                   # [dönem, metrik]
+    total = np.where(n > 0, np.nansum(X, axis=0), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / n
+    Q = quantiles(X, n, [q for _, q in QUANTILES])
+
+    stats: Dict[str, Dict[str, list]] = {}
+    for j, m in enumerate(AGG_METRICS):
+        s = {"n": n[:, j].astype(int).tolist(), "mean": [_clean(v) for v in mean[:, j]]}
+        if m in SUM_METRICS:
+            s["sum"] = [_clean(v) for v in total[:, j]]
+        for qi, (q, _) in enumerate(QUANTILES):
+            s[q] = [_clean(v) for v in Q[qi, :, j]]
+        stats[m] = s
+    weighted: Dict[str, list] = {}
+    for m, (num, den) in WEIGHTED.items():
+        a, b = X[:, :, AGG_METRICS.index(num)], X[:, :, AGG_METRICS.index(den)]
+        both = ~np.isnan(a) & ~np.isnan(b)
+        sa, sb = np.where(both, a, 0).sum(axis=0), np.where(both, b, 0).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weighted[m] = [_clean(v) for v in np.where(both.any(axis=0) & (sb != 0), sa / sb, np.nan)]
+    return periods, stats, weighted
+
+class Aggregates:
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.tickers: Dict[str, Dict[str, Any]] = data.get("tickers") or {}
+        self.dirty: Set[str] = set()
+        self.members: Dict[str, Set[str]] = {}
+        for t, rec in self.tickers.items():
+            for g in rec["groups"]:
+                self.members.setdefault(g, set()).add(t)
+
+    def labels(self, key: str) -> str:
+        for t in self.members.get(key) or ():
+            return self.tickers[t]["groups"][key]
+        return key.split(":", 1)[1]
+
+    def remove(self, ticker: str):
+        rec = self.tickers.pop(ticker, None)
+        if not rec:
+            return
+        for g in rec["groups"]:
+            self.members.get(g, set()).discard(ticker)
+            self.dirty.add(g)
+
+    def add(self, ticker: str, rec: Dict[str, Any]):
+        old = self.tickers.get(ticker)
+        if old and old["groups"] == rec["groups"] and old["periods"] == rec["periods"]:
+            old["stat"] = rec["stat"]          # yalnızca dosya dokunulmuş; agregalar aynı
+            return
+        self.remove(ticker)
+        self.tickers[ticker] = rec
+        for g in rec["groups"]:
+            self.members.setdefault(g, set()).add(ticker)
+            self.dirty.add(g)
+
+    def update(self, tickers: List[str], force: bool = False) -> Tuple[int, int]:
+        """Değişen ratios / kap_json'ları yeniden okur; (okunan, silinen)."""
+        read = removed = 0
+        want = set(tickers)
+        for t in list(self.tickers):
+            if t not in want:
+                self.remove(t)
+                removed += 1
+        for t in tickers:
+            st = [_stat(os.path.join(ratios.RATIOS_DIR, f"{t}.json")), _stat(os.path.join(KAP_DIR, f"{t}.json"))]
+            if not force and t in self.tickers and self.tickers[t].get("stat") == st:
+                continue
+            doc = ratios.load_cached(t)
+            if doc is None:
+                if t in self.tickers:
+                    self.remove(t)
+                    removed += 1
+                continue
+            kap = load_json_safe(os.path.join(KAP_DIR, f"{t}.json")) or {}
+            self.add(t, {"stat": st, "groups": groups_of(kap.get("summary") or {}),
+                         "periods": contributions(doc)})
+            read += 1
+        if force:
+            self.dirty.update(self.members)
+        metrics.inc("aggregates_tickers", read, result="read")
+        return read, removed
+
+    def compute(self, key: str) -> Dict[str, Any]:
+        members = sorted(self.members.get(key) or ())
+        periods, stats, weighted = group_stats([self.tickers[t]["periods"] for t in members])
+        kind = key.split(":", 1)[0]
+        return {"key": key, "kind": kind, "name": self.labels(key), "members": members,
+                "periods": periods, "stats": stats, "weighted": weighted}
+
+    # --- kalıcılık ---
+    def save(self, path: str = STATE_PATH):
+        ensure_dir(os.path.dirname(path) or ".")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION, "tickers": self.tickers}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        metrics.bytes_written(path)
+
+    @classmethod
+    def load(cls, path: str = STATE_PATH) -> Optional["Aggregates"]:
+        data = load_json_safe(path)
+        if not data or data.get("version") != VERSION:
+            return None
+        return cls(data)
+
+# ---------- yayın ----------
+def _write_json(path: str, doc: Any):
+    ensure_dir(os.path.dirname(path) or ".")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    metrics.bytes_written(path)
+
+def db_rows(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for pi, pk in enumerate(doc["periods"]):
+        for m, s in doc["stats"].items():
+            if not s["n"][pi]:
+                continue
+            row = {"group_key": doc["key"], "kind": doc["kind"], "name": doc["name"], "period": pk, "metric": m}
+            row.update({k: s[k][pi] if k in s else None for k in STATS})
+            row["weighted"] = doc["weighted"][m][pi] if m in doc["weighted"] else None
+            rows.append(row)
+    return rows
+
+def publish(agg: Aggregates, docs_dir: str = DOCS_DIR, sb=None, full: bool = False) -> Tuple[int, int]:
+    """Kirli grupları docs/ (+ DB) yazar; (yazılan, silinen) grup sayısı."""
+    keys = sorted(agg.members) if full or not os.path.exists(os.path.join(docs_dir, "index.json")) else sorted(agg.dirty)
+    written = deleted = 0
+    rows: List[Dict[str, Any]] = []
+    for key in keys:
+        path = os.path.join(docs_dir, group_file(key))
+        if not agg.members.get(key):
+            agg.members.pop(key, None)
+            if os.path.exists(path):
+                os.remove(path)
+            if sb is not None:
+                sb.table(DB_TABLE).delete().eq("group_key", key).execute()
+            deleted += 1
+            continue
+        doc = agg.compute(key)
+        _write_json(path, doc)
+        written += 1
+        if sb is not None:
+            # dönemi / metriği artık olmayan eski satırlar kalmasın
+            sb.table(DB_TABLE).delete().eq("group_key", key).execute()
+            rows += db_rows(doc)
+    for i in range(0, len(rows), 1000):
+        upsert(sb, DB_TABLE, rows[i:i + 1000], "group_key,period,metric")
+    agg.dirty.clear()
+    if not (written or deleted):
+        return written, deleted
+    index = {"version": VERSION, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+             "metrics": AGG_METRICS, "stats": STATS, "weighted": WEIGHTED,
+             "groups": [{"key": k, "kind": k.split(":", 1)[0], "name": agg.labels(k),
+                         "n": len(agg.members[k]), "file": group_file(k)} for k in sorted(agg.members)]}
+    _write_json(os.path.join(docs_dir, "index.json"), index)
+    return written, deleted
+
+def run(tickers: List[str], force: bool = False, sb=None) -> Tuple[Aggregates, int, int, int]:
+    agg = (None if force else Aggregates.load()) or Aggregates()
+    fresh = not agg.tickers
+    read, removed = agg.update(tickers, force=force)
+    written, deleted = publish(agg, sb=sb, full=force or fresh)
+    if read or removed or not os.path.exists(STATE_PATH):
+        agg.save()
+    return agg, read, written, deleted
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", nargs="?", choices=["show"])
+    ap.add_argument("args", nargs="*", help="show: GRUP_ANAHTARI [METRİK]")
+    ap.add_argument("--force", action="store_true", help="tüm tickerları yeniden oku, tüm grupları yaz")
+    ap.add_argument("--no-db", action="store_true", help="Supabase'e yazma")
+    ap.add_argument("--period", help="show: yalnızca bu dönem (ör. 2025/6, latest)")
+    args = ap.parse_args()
+
+    if args.cmd == "show":
+        if not args.args:
+            ap.error("grup anahtarı gerekli (ör. sector:İMALAT)")
+        kind, _, label = args.args[0].partition(":")
+        doc = load_json_safe(os.path.join(DOCS_DIR, group_file(f"{kind}:{norm(label)}")))
+        if doc is None:
+            raise SystemExit(f"✗ Grup yok: {args.args[0]} ({DOCS_DIR}/index.json)")
+        names = args.args[1:] or ["revenue_ttm", "net_margin", "pe"]
+        print(f"{doc['name']} ({doc['kind']}, {len(doc['members'])} şirket)")
+        for pi, pk in enumerate(doc["periods"]):
+            if args.period and pk != args.period:
+                continue
+            for m in names:
+                s = dict(doc["stats"][m], weighted=doc["weighted"].get(m))
+                cells = [f"{k}={s[k][pi]:.4g}" for k in STATS + ["weighted"] if s.get(k) and s[k][pi] is not None]
+                print(f"  {pk:8s} {m:18s} " + "  ".join(cells))
+        return
+
+    t0 = time.perf_counter()
+    sb = None if args.no_db else supabase_client_or_none()
+    agg, read, written, deleted = run(read_tickers([]), force=args.force, sb=sb)
+    print(f"✓ aggregates: {len(agg.tickers)} ticker, {len(agg.members)} grup; {read} ticker okundu, "
+          f"{written} grup yazıldı, {deleted} silindi → {DOCS_DIR}/ ({time.perf_counter() - t0:.2f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# scripts/bench.py
+# -*- coding: utf-8 -*-
+"""
+Tam piyasa ölçeğinde benchmark: sentetik veri setinde (scripts/synth_data.py)
+hattın sıcak noktalarını ölçer, süre + tepe bellek (RSS) raporlar.
+
+Durumlar (her biri ayrı alt süreçte; bellek ölçümü birbirini etkilemez):
+  merge    merge_kap_bilanco.main --no-db   (kap + bilanco -> final/)
+  index    build_index.py                   (final/ -> docs/)
+  fin_rows sheets_upsert_from_data0825.fin_rows (upsert_FIN'in satır üretimi, akışla)
+  db_rows  import_merged_to_db satır üreticileri (DB yerine sayan bir hedef)
+  kap_norm kap_json -> KAP tablo satırları: kap_types.parse (tipli kayıtlar + önbellekli)
+           ile eski hücre başına dönüşüm (_legacy_kap_rows) karşılaştırmalı; çıktılar aynı olmalı
+
+Veri setleri .cache/bench/n<N>/ altında üretilir ve sonraki koşularda yeniden
+kullanılır (aynı N + seed).
+
+Kullanım:
+  python3 scripts/bench.py                       # 50 / 500 / 5000 ticker
+  python3 scripts/bench.py --sizes 50 500 --cases merge db_rows
+  python3 scripts/bench.py --json .cache/bench/results.json
+"""
+
+import os, sys, gc, json, time, shutil, argparse, resource, subprocess
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+DEFAULT_SIZES = [50, 500, 5000]
+CASES = ["merge", "index", "fin_rows", "db_rows", "kap_norm"]
+BENCH_DIR = os.path.join(".cache", "bench")
+
+def peak_rss_mb() -> float:
+    # Linux'ta KB, macOS'ta bayt
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / (1 << 20) if sys.platform == "darwin" else r / 1024
+
+class _CountingSink:
+    """import_merged_to_db için DB yerine geçen hedef: satırları sayar, hiçbir yere yazmaz."""
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        self._table = None
+
+    def table(self, name):
+        self._table = name
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.rows[self._table] = self.rows.get(self._table, 0) + len(rows)
+        return self
+
+    def delete(self):
+        return self
+
+    def eq(self, *a):
+        return self
+
+    def execute(self):
+        return self
+
+# ---------- durumlar (alt süreçte, cwd = veri kökü) ----------
+def case_merge(root: str) -> Dict[str, Any]:
+    import merge_kap_bilanco
+    sys.argv = ["merge_kap_bilanco.py", "--no-db", "--fresh"]
+    merge_kap_bilanco.main()
+    return {"files": len(os.listdir(os.path.join(root, "final")))}
+
+def case_index(root: str) -> Dict[str, Any]:
+    # build_index.py kökünü kendi konumundan bulur: kopyası veri köküne konur
+    import runpy
+    dst = os.path.join(root, "scripts")
+    os.makedirs(dst, exist_ok=True)
+    for name in os.listdir(HERE):
+        if name.endswith(".py"):
+            shutil.copy2(os.path.join(HERE, name), os.path.join(dst, name))
+    sys.path.insert(0, dst)
+    runpy.run_path(os.path.join(dst, "build_index.py"), run_name="__main__")
+    return {"files": len(os.listdir(os.path.join(root, "docs", "final")))}
+
+def case_fin_rows(root: str) -> Dict[str, Any]:
+    from sheets_upsert_from_data0825 import fin_rows
+    n = 0
+    for name in sorted(os.listdir(os.path.join(root, "bilanco_json"))):
+        n += len(fin_rows(os.path.join(root, "bilanco_json", name)))   # run_one gibi: dosyadan akışla
+    return {"rows": n}
+
+def case_db_rows(root: str) -> Dict[str, Any]:
+    from merge_kap_bilanco import load_json_safe, import_merged_to_db
+    sink = _CountingSink()
+    for name in sorted(os.listdir(os.path.join(root, "final"))):
+        merged = load_json_safe(os.path.join(root, "final", name))
+        if merged:
+            import_merged_to_db(sink, merged)
+    return {"rows": sum(sink.rows.values()), "tables": sink.rows}
+
+# --- kap_norm referansı: kap_types öncesi merge_kap_bilanco'daki hücre başına dönüşüm ---
+def _legacy_number(s):
+    import re
+    if s is None:
+        return None
+    if isinstance(s, (int, float)):
+        return s
+    s = str(s).strip()
+    if not s:
+        return None
+    s = s.replace(".", "").replace("\u00A0", " ")
+    s = s.replace(",", ".")
+    s = re.sub(r"\s+", "", s)
+    try:
+        if "." in s:
+            return float(s)
+        return int(s)
+    except Exception:
+        try:
+            return float(s)
+        except Exception:
+            return None
+
+def _legacy_date(s):
+    if not s:
+        return None
+    s = str(s).strip()
+    try:
+        d, m, y = s.split("/")
+        return f"{int(y):04d}-{int(m):02d}-{int(d):02d}"
+    except Exception:
+        return None
+
+def _legacy_kap_rows(ticker: str, kap: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    from kap_types import fold   # is_executive: "İcrada Görevli" / "İcrada Görevli Değil"
+    num, date = _legacy_number, _legacy_date
+    summary, general, ownership = kap.get("summary") or {}, kap.get("general") or {}, kap.get("ownership") or {}
+    shares = None
+    for row in ownership.get("sermaye_5ustu") or []:
+        if str(row.get("Ortağın Adı-Soyadı/Ticaret Ünvanı", "")).strip().upper() == "TOPLAM":
+            shares = num(row.get("Sermayedeki Payı(TL)"))
+            break
+    out = {"companies": [{
+        "ticker": ticker, "website": summary.get("internet_adresi"), "sector_main": summary.get("sektor_ana"),
+        "sector_sub": summary.get("sektor_alt"), "market": summary.get("islem_gordugu_pazar"),
+        "indices": summary.get("dahil_oldugu_endeksler") or [], "address": general.get("merkez_adresi"),
+        "listing_date": date(general.get("kotasyon_tarihi")),
+        "free_float_ratio": num(ownership.get("fiili_dolasim_oran")),
+        "free_float_mcap": num(ownership.get("fiili_dolasim_tutar_tl")), "shares_outstanding": shares}]}
+    fin = "Denetim, Muhasebe ve/veya Finans Alanında En Az 5 Yıllık Deneyime Sahip Olup Olmadığı"
+    out["kap_board_members"] = [{
+        "ticker": ticker, "name": m.get("Adı-Soyadı"), "gender": m.get("Cinsiyeti"), "role": m.get("Görevi"),
+        "profession": m.get("Mesleği"), "first_elected": date(m.get("Yönetim Kuruluna İlk Seçilme Tarihi")),
+        "is_executive": None if m.get("İcrada Görevli Olup Olmadığı") is None else (fold(str(m.get("İcrada Görevli Olup Olmadığı"))) == "ICRADA GOREVLI"),
+        "duties_last5y": m.get("Son 5 Yılda Ortaklıkta Üstlendiği Görevler"),
+        "outside_roles": m.get("Son Durum itibariyle Ortaklık Dışında Aldığı Görevler"),
+        "has_fin_exp": None if not m.get(fin) else (str(m.get(fin)).strip().lower() == "evet"),
+        "equity_pct": num(m.get("Sermayedeki Payı (%)")), "represented_share_group": m.get("Temsil Ettiği Pay Grubu"),
+    } for m in kap.get("board_members") or []]
+    out["kap_ownership"] = [{
+        "ticker": ticker, "holder": o.get("Ortağın Adı-Soyadı/Ticaret Ünvanı"), "paid_in_tl": num(o.get("Sermayedeki Payı(TL)")),
+        "pct": num(o.get("Sermayedeki Payı(%)")), "voting_pct": num(o.get("Oy Hakkı Oranı(%)")),
+    } for o in ownership.get("sermaye_5ustu") or []]
+    out["kap_subsidiaries"] = [{
+        "ticker": ticker, "company": s.get("Ticaret Ünvanı"), "activity": s.get("Şirketin Faaliyet Konusu"),
+        "paid_in_capital": num(s.get("Ödenmiş/Çıkarılmış Sermayesi")), "share_amount": num(s.get("Şirketin Sermayedeki Payı")),
+        "currency": s.get("Para Birimi"), "share_pct": num(s.get("Şirketin Sermayedeki Payı(%)")),
+        "relation": s.get("Şirket ile Olan İlişkinin Niteliği"),
+    } for s in ownership.get("bagli_ortakliklar") or []]
+    out["kap_vote_rights"] = [{"ticker": ticker, "field": p.get("alan"), "value": p.get("deger")}
+                              for p in (kap.get("oy_haklari") or {}).get("pairs") or []]
+    k47 = kap.get("katilim_4_7")
+    if k47:
+        out["kap_katilim_4_7"] = [{"ticker": ticker, **{k: num(v) if isinstance(v, str) else v for k, v in k47.items()}}]
+    return out
+
+def case_kap_norm(root: str) -> Dict[str, Any]:
+    import kap_types
+    from merge_kap_bilanco import load_json_safe
+    d = os.path.join(root, "kap_json")
+    docs = [(n[:-5], load_json_safe(os.path.join(d, n))) for n in sorted(os.listdir(d)) if n.endswith(".json")]
+    docs = [(t, k) for t, k in docs if k]
+    # iki geçiş de çıktısını tutmadan ölçülür (biri diğerinin yığınıyla GC'yi yavaşlatmasın)
+    gc.collect()
+    t0 = time.perf_counter()
+    for t, k in docs:
+        _legacy_kap_rows(t, k)
+    t1 = time.perf_counter()
+    kap_types.cache_clear()
+    gc.collect()
+    t2 = time.perf_counter()
+    for t, k in docs:
+        kap_types.parse(k, t).rows()
+    t3 = time.perf_counter()
+    info = kap_types.cache_info().values()
+    hits, misses = sum(c["hits"] for c in info), sum(c["misses"] for c in info)
+    rows = 0
+    for t, k in docs:
+        typed = kap_types.parse(k, t).rows()
+        if typed != _legacy_kap_rows(t, k):
+            raise AssertionError(f"{t}: kap_types.parse çıktısı eski dönüşümden farklı")
+        rows += sum(len(v) for v in typed.values())
+    return {"rows": rows, "legacy_s": t1 - t0, "typed_s": t3 - t2,
+            "speedup": (t1 - t0) / max(t3 - t2, 1e-9), "cache_hit_rate": hits / max(hits + misses, 1)}
+
+def run_case(case: str, root: str):
+    """Alt süreç girişi: sonucu tek satır JSON olarak stdout'a yazar."""
+    os.chdir(root)
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")   # ticker başına log satırları ölçümü bozmasın
+    t0 = time.perf_counter()
+    try:
+        extra = globals()[f"case_{case}"](root)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+    dt = time.perf_counter() - t0
+    print(json.dumps({"seconds": dt, "peak_rss_mb": peak_rss_mb(), **extra}))
+
+# ---------- yönetici ----------
+def dataset(n: int, seed: int, base: str = BENCH_DIR) -> str:
+    import synth_data
+    root = os.path.abspath(os.path.join(base, f"n{n}"))
+    try:
+        with open(os.path.join(root, synth_data.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("n") == n and meta.get("seed") == seed and meta.get("final"):
+            return root
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"→ {n} ticker sentetik veri üretiliyor → {root}")
+    t0 = time.perf_counter()
+    synth_data.generate(n, root, seed=seed, final=True)
+    print(f"  ✓ {time.perf_counter() - t0:.1f} s")
+    return root
+
+def bench(sizes: List[int], cases: List[str], seed: int = 42, base: str = BENCH_DIR) -> List[Dict[str, Any]]:
+    results = []
+    for n in sizes:
+        root = dataset(n, seed, base)
+        env = {**os.environ, "METRICS_DISABLE": "1", "JOBS_DB": os.path.join(root, ".cache", "jobs.sqlite")}
+        for case in cases:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--_case", case, "--_root", root],
+                                  capture_output=True, text=True, env=env)
+            if proc.returncode != 0:
+                print(f"✗ {case} @ {n}: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}")
+                results.append({"n": n, "case": case, "error": proc.stderr[-2000:]})
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            r.update({"n": n, "case": case, "ms_per_ticker": r["seconds"] * 1000 / n})
+            results.append(r)
+            print(f"{n:6d} {case:9s} {r['seconds']:9.2f} s {r['ms_per_ticker']:9.2f} ms/t {r['peak_rss_mb']:9.1f} MB"
+                  f"  {r.get('rows', r.get('files', ''))}"
+                  + (f"  (eski {r['legacy_s'] * 1000:.0f} ms → {r['typed_s'] * 1000:.0f} ms, ×{r['speedup']:.1f},"
+                     f" önbellek isabeti %{r['cache_hit_rate'] * 100:.0f})" if "speedup" in r else ""))
+    return results
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    ap.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--dir", default=BENCH_DIR, help="sentetik veri setlerinin kökü")
+    ap.add_argument("--json", help="sonuçları bu dosyaya yaz")
+    ap.add_argument("--_case", help=argparse.SUPPRESS)
+    ap.add_argument("--_root", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args._case:
+        run_case(args._case, args._root)
+        return
+
+    print(f"{'n':>6s} {'case':9s} {'süre':>11s} {'ticker başı':>14s} {'tepe RSS':>12s}  satır/dosya")
+    results = bench(args.sizes, args.cases, seed=args.seed, base=args.dir)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"generated_at": time.time(), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"✓ sonuçlar → {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# scripts/bilanco_fetch.py
+# -*- coding: utf-8 -*-
+"""
+İş Yatırım MaliTablo API'sinden bilanco_json/<T>.json güncelleme (isyatirim-sync.ts +
+isyatirim-all-json.ts'in Python karşılığı, artımlı).
+
+  - Dosya yoksa (ya da --full): 2008/3'ten bugüne tüm tarihçe.
+  - Dosya varsa: yalnızca değeri olan son dönemden REVISION_WINDOW çeyrek geriden
+    başlayarak bugüne kadarki dönemler istenir (yeni dönemler + geriye dönük düzeltmeler).
+  - AUTO: CONSOL ve XI_29 grupları çekilir, konsolide değer öncelikli (TS mergeOutputs).
+  - Sonuç mevcut dokümana yerinde birleştirilir: dolu gelen değer yazılır, boş gelen
+    değer mevcut veriyi silmez. Hiçbir değer değişmediyse dosya yeniden yazılmaz
+    (fetchedAt dahil), aşağı akış aşamaları da tetiklenmez.
+  - Tickerlar eşzamanlı işlenir (CONCURRENCY iş parçacığı, ortak keep-alive Session);
+    istekler süreç genelinde MIN_INTERVAL aralıkla sıralanır. İlerleme jobqueue'da
+    (aşama "bilanco", günlük run-key): yarıda kalan çalıştırma kaldığı yerden devam eder.
+
+Yerel sahte sunucu (ağsız deneme; bir veri kökünün bilanco_json'unu API gibi sunar):
+  python3 scripts/bilanco_fetch.py --serve-stub 8765 --stub-root .cache/bench/n50
+  ISYATIRIM_API=http://127.0.0.1:8765/MaliTablo python3 scripts/bilanco_fetch.py
+
+Kullanım:
+  python3 scripts/bilanco_fetch.py                  # public/tickers.txt, artımlı
+  python3 scripts/bilanco_fetch.py ARCLK SASA --full
+  python3 scripts/bilanco_fetch.py --window 8 --concurrency 8
+ENV:
+  ISYATIRIM_API, BILANCO_CONCURRENCY (4), BILANCO_REVISION_WINDOW (4), BILANCO_MIN_INTERVAL (0.15 sn)
+"""
+
+import os, json, time, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from jobqueue import JobQueue, default_worker, work
+from merge_kap_bilanco import BILANCO_DIR, ensure_dir, load_json_safe, read_tickers_from_first_existing
+
+API_URL = os.environ.get("ISYATIRIM_API",
+                         "https://www.isyatirim.com.tr/_layouts/15/IsYatirim.Website/Common/Data.aspx/MaliTablo")
+GROUPS = ["CONSOL", "XI_29"]          # AUTO: soldaki öncelikli
+EXCHANGE = "TRY"
+START = (2008, 3)
+REVISION_WINDOW = int(os.environ.get("BILANCO_REVISION_WINDOW", "4"))
+CONCURRENCY = int(os.environ.get("BILANCO_CONCURRENCY", "4"))
+MIN_INTERVAL = float(os.environ.get("BILANCO_MIN_INTERVAL", "0.15"))
+PER_REQUEST = 4                       # API istek başına en çok 4 dönem alır
+RETRIES = 3
+BACKOFF = 0.6                         # sn; deneme başına artar (TS: SLEEP_MS * i)
+TIMEOUT = (5, 30)
+
+Period = Tuple[int, int]
+
+def pk(p: Period) -> str:
+    return f"{p[0]}/{p[1]}"
+
+def parse_pk(s: str) -> Period:
+    y, _, m = s.partition("/")
+    return int(y), int(m)
+
+def next_period(p: Period) -> Period:
+    return (p[0] + 1, 3) if p[1] == 12 else (p[0], p[1] + 3)
+
+def prev_period(p: Period) -> Period:
+    return (p[0] - 1, 12) if p[1] == 3 else (p[0], p[1] - 3)
+
+def current_period(now: Optional[datetime] = None) -> Period:
+    now = now or datetime.now()
+    return now.year, (now.month + 2) // 3 * 3
+
+def period_range(start: Period, end: Period) -> List[Period]:
+    out, p = [], start
+    while p <= end:
+        out.append(p)
+        p = next_period(p)
+    return out
+
+def iso_now() -> str:
+    # JS Date.toISOString biçimi (milisaniye + Z)
+    now = datetime.now(timezone.utc)
+    return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+
+def to_number(v: Any) -> Optional[float]:
+    if v is None or v == "":
+        return None
+    try:
+        x = float(v)
+    except (TypeError, ValueError):
+        return None
+    return int(x) if x.is_integer() else x
+
+# ---------- HTTP ----------
+_session = None
+_throttle_lock = threading.Lock()
+_next_at = 0.0
+
+def get_session():
+    """Keep-alive bağlantı havuzlu tek Session; iş parçacıkları paylaşır."""
+    global _session
+    if _session is None:
+        s = requests.Session()
+        s.headers.update({"User-Agent": "Mozilla/5.0"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(CONCURRENCY, 1))
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        _session = s
+    return _session
+
+def _throttle():
+    """Süreç genelinde istekler arası en az MIN_INTERVAL (kaynak siteye nazik)."""
+    global _next_at
+    with _throttle_lock:
+        now = time.monotonic()
+        wait = _next_at - now
+        _next_at = max(now, _next_at) + MIN_INTERVAL
+    if wait > 0:
+        time.sleep(wait)
+
+def fetch_quad(ticker: str, group: str, quad: List[Period], exchange: str = EXCHANGE) -> List[Dict[str, Any]]:
+    params = {"companyCode": ticker, "exchange": exchange, "financialGroup": group}
+    for i, (y, m) in enumerate(quad, 1):
+        params[f"year{i}"], params[f"period{i}"] = y, m
+    err = None
+    for attempt in range(1, RETRIES + 1):
+        _throttle()
+        t0 = time.perf_counter()
+        try:
+            r = get_session().get(API_URL, params=params, timeout=TIMEOUT)
+            r.raise_for_status()
+            rows = (r.json() or {}).get("value") or []
+            metrics.inc("api_calls", api="isyatirim", result="ok")
+            metrics.observe("api_seconds", time.perf_counter() - t0, api="isyatirim")
+            return rows
+        except Exception as e:
+            metrics.inc("api_calls", api="isyatirim", result="error")
+            err = e
+            if attempt < RETRIES:
+                time.sleep(BACKOFF * attempt)
+    raise RuntimeError(f"{group} [{', '.join(map(pk, quad))}]: {err}")
+
+def fetch_periods(ticker: str, periods: List[Period], groups: List[str] = GROUPS) -> Dict[str, Dict[str, Any]]:
+    """key -> {code, tr, en, values{pk: v}}; gruplar arasında soldaki dolu değer kazanır."""
+    items: Dict[str, Dict[str, Any]] = {}
+    for group in groups:
+        for i in range(0, len(periods), PER_REQUEST):
+            quad = periods[i:i + PER_REQUEST]
+            for row in fetch_quad(ticker, group, quad):
+                key = str(row.get("itemCode") or row.get("itemDescTr") or row.get("itemDescEng") or "")
+                node = items.get(key)
+                if node is None:
+                    node = items[key] = {"code": row.get("itemCode"), "tr": row.get("itemDescTr"),
+                                         "en": row.get("itemDescEng"), "values": {}}
+                for j, p in enumerate(quad, 1):
+                    v = to_number(row.get(f"value{j}"))
+                    if node["values"].get(pk(p)) is None:
+                        node["values"][pk(p)] = v
+    return items
+
+# ---------- birleştirme ----------
+def last_data_period(doc: Dict[str, Any]) -> Optional[Period]:
+    keys = (doc.get("meta") or {}).get("periodKeys") or []
+    have = {p for node in (doc.get("items") or {}).values()
+            for p, v in (node.get("values") or {}).items() if v is not None}
+    for k in reversed(keys):
+        if k in have:
+            return parse_pk(k)
+    return None
+
+def plan_periods(doc: Optional[Dict[str, Any]], window: int = REVISION_WINDOW, full: bool = False,
+                 now: Optional[datetime] = None) -> List[Period]:
+    end = current_period(now)
+    last = None if (doc is None or full) else last_data_period(doc)
+    if last is None:
+        return period_range(START, end)
+    start = last
+    for _ in range(max(window, 1) - 1):
+        start = prev_period(start)
+    return period_range(max(start, START), end)
+
+def merge_into(doc: Optional[Dict[str, Any]], ticker: str, fetched: Dict[str, Dict[str, Any]],
+               periods: List[Period]) -> Tuple[Dict[str, Any], int]:
+    """fetched'i dokümana yazar; (doküman, değişen değer sayısı)."""
+    doc = doc or {"meta": {"ticker": ticker, "group": "+".join(GROUPS), "currency": EXCHANGE,
+                           "fetchedAt": None, "periodKeys": []}, "items": {}}
+    meta = doc.setdefault("meta", {})
+    items = doc.setdefault("items", {})
+    keys = sorted(set(meta.get("periodKeys") or []) | {pk(p) for p in periods}, key=parse_pk)
+    changed = 0
+    for key, node in fetched.items():
+        cur = items.get(key)
+        if cur is None:
+            cur = items[key] = {k: node[k] for k in ("code", "tr", "en") if node.get(k) is not None}
+            cur["values"] = {}
+        vals = cur.setdefault("values", {})
+        for p, v in node["values"].items():
+            if v is not None and vals.get(p) != v:
+                vals[p] = v
+                changed += 1
+    # her kalemde tüm dönem anahtarları, sıralı (TS çıktısıyla aynı yerleşim)
+    for node in items.values():
+        old = node.get("values") or {}
+        node["values"] = {k: old.get(k) for k in keys}
+    meta["periodKeys"] = keys
+    return doc, changed
+
+def write_doc(path: str, doc: Dict[str, Any]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    metrics.bytes_written(path)
+
+def update_ticker(ticker: str, out_dir: str = BILANCO_DIR, window: int = REVISION_WINDOW,
+                  full: bool = False) -> Dict[str, Any]:
+    path = os.path.join(out_dir, f"{ticker}.json")
+    doc = load_json_safe(path)
+    periods = plan_periods(doc, window, full)
+    fetched = fetch_periods(ticker, periods)
+    if not fetched:
+        raise RuntimeError("API boş döndü")
+    if full:
+        # dosyadaki veri yok sayılır; değişiklik sayısı yine eskiye göre
+        old = {(k, p): v for k, node in ((doc or {}).get("items") or {}).items()
+               for p, v in (node.get("values") or {}).items() if v is not None}
+        doc, _ = merge_into(None, ticker, fetched, periods)
+        new = {(k, p): v for k, node in doc["items"].items() for p, v in node["values"].items() if v is not None}
+        changed = len(set(old.items()) ^ set(new.items()))
+    else:
+        doc, changed = merge_into(doc, ticker, fetched, periods)
+    if changed or not os.path.exists(path):
+        doc["meta"]["fetchedAt"] = iso_now()
+        write_doc(path, doc)
+    metrics.inc("bilanco_values_changed", changed)
+    return {"periods": len(periods), "changed": changed}
+
+def run(tickers: List[str], out_dir: str = BILANCO_DIR, window: int = REVISION_WINDOW, full: bool = False,
+        concurrency: int = CONCURRENCY, run_key: Optional[str] = None, fresh: bool = False) -> Dict[str, int]:
+    ensure_dir(out_dir)
+    run_key = run_key or time.strftime("%Y-%m-%d", time.gmtime())
+    q = JobQueue("bilanco")
+    todo = q.enqueue(tickers, {t: run_key for t in tickers}, fresh=fresh)
+    q.close()
+    print(f"→ {todo}/{len(tickers)} ticker kuyrukta (bilanco, eşzamanlılık={concurrency})")
+
+    def one(t):
+        t0 = time.perf_counter()
+        r = update_ticker(t, out_dir, window, full)
+        note = f"{r['changed']} değer değişti" if r["changed"] else "değişiklik yok"
+        print(f"✓ {t}: {r['periods']} dönem istendi, {note} ({time.perf_counter() - t0:.1f} s)")
+
+    def worker(i):
+        # her iş parçacığının kendi SQLite bağlantısı; kiralama kuyruk üzerinden
+        wq = JobQueue("bilanco", worker=f"{default_worker()}:{i}")
+        try:
+            return work(wq, one, tickers=tickers)
+        finally:
+            wq.close()
+
+    stats = {"done": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+        for s in ex.map(worker, range(max(1, concurrency))):
+            for k in stats:
+                stats[k] += s[k]
+    print(f"Bitti. {stats['done']} tamam, {stats['failed']} hata")
+    return stats
+
+# ---------- yerel sahte API ----------
+def serve_stub(port: int, root: str, block: bool = True):
+    """root/bilanco_json/<T>.json'u MaliTablo gibi sunar (CONSOL; XI_29 boş döner)."""
+    cache: Dict[str, Optional[Dict[str, Any]]] = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            t = (q.get("companyCode") or "").upper()
+            with lock:
+                if t not in cache:
+                    cache[t] = load_json_safe(os.path.join(root, BILANCO_DIR, f"{t}.json"))
+            doc = cache[t]
+            rows = []
+            if doc is not None and q.get("financialGroup") == GROUPS[0]:
+                quad = [f"{q[f'year{i}']}/{q[f'period{i}']}" for i in range(1, 5) if f"year{i}" in q]
+                for key, node in (doc.get("items") or {}).items():
+                    row = {"itemCode": node.get("code", key), "itemDescTr": node.get("tr"), "itemDescEng": node.get("en")}
+                    for i, p in enumerate(quad, 1):
+                        row[f"value{i}"] = (node.get("values") or {}).get(p)
+                    rows.append(row)
+            body = json.dumps({"value": rows, "ok": True}, ensure_ascii=False).encode()
+            self.send_response(200 if doc is not None else 404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Sahte MaliTablo: http://127.0.0.1:{srv.server_address[1]}/MaliTablo (kök: {root})")
+    if block:
+        srv.serve_forever()
+    else:
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def main():
+    global CONCURRENCY
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--full", action="store_true", help="tüm tarihçeyi yeniden çek (dosyadaki veriyi yok say)")
+    ap.add_argument("--window", type=int, default=REVISION_WINDOW, help="yeniden istenecek son dolu çeyrek sayısı")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--out", default=BILANCO_DIR)
+    ap.add_argument("--run-key", default=None, help="jobqueue run-key (varsayılan: bugünün tarihi)")
+    ap.add_argument("--fresh", action="store_true", help="bu run-key'de tamamlananları da yeniden çek")
+    ap.add_argument("--serve-stub", type=int, metavar="PORT", help="yerel sahte API başlat (çekme yapmaz)")
+    ap.add_argument("--stub-root", default=".", help="sahte API'nin sunacağı veri kökü")
+    args = ap.parse_args()
+
+    if args.serve_stub is not None:
+        serve_stub(args.serve_stub, args.stub_root)
+        return
+    CONCURRENCY = max(1, args.concurrency)
+    tickers = [t.strip().upper() for t in args.tickers if t.strip()] or read_tickers_from_first_existing()
+    run(tickers, args.out, args.window, args.full, CONCURRENCY, args.run_key, args.fresh)
+
+if __name__ == "__main__":
+    main()
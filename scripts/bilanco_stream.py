@@ -0,0 +1,200 @@
+# scripts/bilanco_stream.py
+# -*- coding: utf-8 -*-
+"""
+bilanco_json dosyalarını bütün dokümanı belleğe almadan okuma.
+
+  for code, period, value in BilancoStream("bilanco_json/ARCLK.json"): ...
+
+Dosya parça parça (64 KB) okunur; items altındaki her kalemin values nesnesi
+çift çift çözülür, yani bellek kullanımı kod sayısından ve dönem geçmişinden
+bağımsızdır. Üçlüler dosya sırasıyla gelir (kod, sonra dönem); null değerler
+atlanır.
+
+  - .meta   : "meta" nesnesi (eski düz formatta üst düzey alanlar). bilanco_json'da
+              meta items'tan önce gelir; ilk üçlü geldiğinde doludur.
+  - .labels : kod -> (tr, en); kalemde values'tan önce gelen tr/en alanlarından.
+
+open_values(src) aynı arayüzü bellekteki dokümanlar (dict) için de sağlar;
+satır üreticileri (sheets fin_rows, merge financial_rows) ikisiyle de çalışır.
+"""
+
+import re, json
+from typing import Any, Dict, Iterator, Tuple, Union
+
+CHUNK = 1 << 16
+_WS = " \t\r\n"
+_decoder = json.JSONDecoder()
+# values içindeki tipik çift: "2008/3": 4330001000 (hızlı yol; diğerleri raw_decode ile)
+_PAIR = re.compile(r'\s*"([^"\\]*)"\s*:\s*(null|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)\s*([,}])')
+
+class _Scanner:
+    """Tamponlu JSON tarayıcı: değerleri raw_decode ile tek tek çözer."""
+    def __init__(self, f, chunk: int = CHUNK):
+        self.f, self.chunk = f, chunk
+        self.buf, self.pos, self.eof = "", 0, False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(self.chunk)
+        if not data:
+            self.eof = True
+            return False
+        if self.pos > self.chunk:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        self.buf += data
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str):
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f"beklenen {ch!r}, gelen {got!r} (konum {self.pos})")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # tampon sonuna yakın biten sayı eksik okunmuş olabilir ("1." + "5e3"): devamını oku
+            if len(self.buf) - end < 64 and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def members(self) -> Iterator[str]:
+        """Nesne anahtarlarını sırayla verir; çağıran her anahtarın değerini tüketmelidir."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"beklenen ',' ya da '}}', gelen {ch!r}")
+
+    def pairs(self) -> Iterator[Tuple[str, Any]]:
+        """Nesnenin (anahtar, değer) çiftleri; skaler değerler için hızlı yol."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        match = _PAIR.match
+        buf, n = self.buf, len(self.buf)
+        while True:
+            if n - self.pos < 256 and not self.eof:
+                while len(self.buf) - self.pos < 256 and self._fill():
+                    pass
+                buf, n = self.buf, len(self.buf)
+            m = match(buf, self.pos)
+            if m is not None and (m.end() < n or self.eof):
+                key, raw, sep = m.groups()
+                self.pos = m.end()
+                yield key, (None if raw == "null" else float(raw) if ("." in raw or "e" in raw or "E" in raw) else int(raw))
+                if sep == "}":
+                    return
+                continue
+            key = self.value()
+            self.expect(":")
+            yield key, self.value()
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"beklenen ',' ya da '}}', gelen {ch!r}")
+            buf, n = self.buf, len(self.buf)
+
+class BilancoStream:
+    def __init__(self, path: str, chunk: int = CHUNK):
+        self.path, self.chunk = path, chunk
+        self.top: Dict[str, Any] = {}
+        self.labels: Dict[str, Tuple[str, str]] = {}
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.top.get("meta") or self.top
+
+    def __iter__(self) -> Iterator[Tuple[str, str, Any]]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            sc = _Scanner(f, self.chunk)
+            for key in sc.members():
+                if key != "items":
+                    self.top[key] = sc.value()
+                    continue
+                if sc.peek() != "{":
+                    sc.value()
+                    continue
+                for code in sc.members():
+                    if sc.peek() != "{":
+                        sc.value()
+                        continue
+                    tr = en = ""
+                    for k in sc.members():
+                        if k == "values" and sc.peek() == "{":
+                            for pk, v in sc.pairs():
+                                if v is not None:
+                                    yield code, pk, v
+                        elif k in ("tr", "name_tr", "en", "name_en"):
+                            v = sc.value() or ""
+                            if k.endswith("tr"):
+                                tr = v
+                            else:
+                                en = v
+                            self.labels[code] = (tr, en)
+                        else:
+                            sc.value()
+
+class DocValues:
+    """Bellekteki doküman için BilancoStream ile aynı arayüz."""
+    def __init__(self, doc: Dict[str, Any]):
+        self.top = doc or {}
+        items = self.top.get("items") or {}
+        self.labels = {code: (node.get("tr") or node.get("name_tr") or "", node.get("en") or node.get("name_en") or "")
+                       for code, node in items.items() if isinstance(node, dict)}
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.top.get("meta") or self.top
+
+    def __iter__(self) -> Iterator[Tuple[str, str, Any]]:
+        for code, node in (self.top.get("items") or {}).items():
+            if not isinstance(node, dict):
+                continue
+            for pk, v in (node.get("values") or {}).items():
+                if v is not None:
+                    yield code, pk, v
+
+def open_values(src: Union[str, Dict[str, Any]]):
+    """Dosya yolu -> BilancoStream, dict -> DocValues."""
+    return DocValues(src) if isinstance(src, dict) else BilancoStream(str(src))
+
+def read_meta(path: str) -> Dict[str, Any]:
+    """Yalnızca meta: items'a gelmeden durur."""
+    with open(path, "r", encoding="utf-8") as f:
+        sc = _Scanner(f)
+        top: Dict[str, Any] = {}
+        for key in sc.members():
+            if key == "items":
+                break
+            top[key] = sc.value()
+    return top.get("meta") or top
@@ -0,0 +1,140 @@
+# scripts/bist_calendar.py
+# -*- coding: utf-8 -*-
+"""
+Borsa İstanbul pay piyasası seans takvimi (Europe/Istanbul).
+
+  - Hafta içi 10:00–18:10 (18:00–18:10 kapanış seansı)
+  - Arife / yarım günler 10:00–12:40
+  - Resmi ve dini bayramlarda kapalı
+Dini bayram tarihleri her yıl değişir; HOLIDAYS / HALF_DAYS yıllık güncellenmeli
+(tanımlı son yılın ötesinde sorgu yapılırsa bir kez uyarı basılır). Ek tarihler
+BIST_HOLIDAYS_FILE (satır başına YYYY-MM-DD, "YYYY-MM-DD half" yarım gün) ile verilebilir.
+
+Kullanım:
+  from bist_calendar import is_open
+  if not is_open(): ...
+  python3 scripts/bist_calendar.py            # şu an açık mı?
+"""
+
+import os, sys
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional, Set, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+    TZ = ZoneInfo("Europe/Istanbul")
+except Exception:  # tzdata yoksa: Türkiye 2016'dan beri sabit UTC+3
+    TZ = timezone(timedelta(hours=3))
+
+OPEN = time(10, 0)
+CLOSE = time(18, 10)
+HALF_DAY_CLOSE = time(12, 40)
+# Kapanıştan sonra son fiyatın yakalanması için kısa tolerans (5 dk'lık cron için)
+GRACE = timedelta(minutes=int(os.environ.get("BIST_CLOSE_GRACE_MIN", "10")))
+
+# Her yıl tekrarlayan resmi tatiller (ay, gün)
+FIXED_HOLIDAYS = {(1, 1), (4, 23), (5, 1), (5, 19), (7, 15), (8, 30), (10, 29)}
+FIXED_HALF_DAYS = {(10, 28)}
+
+# Dini bayramlar (Ramazan / Kurban) ve arifeleri
+HOLIDAYS: Set[date] = {
+    # 2025
+    date(2025, 3, 31), date(2025, 4, 1),
+    date(2025, 6, 6), date(2025, 6, 9),
+    # 2026
+    date(2026, 3, 20),
+    date(2026, 5, 27), date(2026, 5, 28), date(2026, 5, 29),
+    # 2027 (Diyanet takvimi; BIST duyurusuyla teyit edilmeli)
+    date(2027, 3, 9), date(2027, 3, 10), date(2027, 3, 11),
+    date(2027, 5, 17), date(2027, 5, 18), date(2027, 5, 19),
+    # 2028 (Diyanet takvimi; BIST duyurusuyla teyit edilmeli)
+    date(2028, 2, 28),
+    date(2028, 5, 5), date(2028, 5, 8),
+}
+HALF_DAYS: Set[date] = {
+    date(2025, 6, 5),
+    date(2026, 3, 19), date(2026, 5, 26),
+    date(2027, 3, 8),                       # Kurban arifesi 15.05.2027 Cumartesi
+    date(2028, 2, 25), date(2028, 5, 4),
+}
+
+def _load_extra(path: Optional[str]) -> Tuple[Set[date], Set[date]]:
+    full, half = set(), set()
+    if not path or not os.path.isfile(path):
+        return full, half
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            parts = ln.split("#", 1)[0].split()
+            if not parts:
+                continue
+            try:
+                d = date.fromisoformat(parts[0])
+            except ValueError:
+                continue
+            (half if len(parts) > 1 and parts[1].lower() == "half" else full).add(d)
+    return full, half
+
+_EXTRA_FULL, _EXTRA_HALF = _load_extra(os.environ.get("BIST_HOLIDAYS_FILE"))
+# dini bayram tarihlerinin tanımlı olduğu son yıl
+LAST_COVERED_YEAR = max(d.year for d in HOLIDAYS | HALF_DAYS | _EXTRA_FULL | _EXTRA_HALF)
+_warned: Set[int] = set()
+
+def _check_coverage(d: date):
+    if d.year > LAST_COVERED_YEAR and d.year not in _warned:
+        _warned.add(d.year)
+        print(f"[WARN] bist_calendar: {d.year} dini bayram tarihleri tanımlı değil (son yıl "
+              f"{LAST_COVERED_YEAR}); HOLIDAYS / HALF_DAYS ya da BIST_HOLIDAYS_FILE güncellenmeli",
+              file=sys.stderr)
+
+def is_holiday(d: date) -> bool:
+    return (d.month, d.day) in FIXED_HOLIDAYS or d in HOLIDAYS or d in _EXTRA_FULL
+
+def is_half_day(d: date) -> bool:
+    return (d.month, d.day) in FIXED_HALF_DAYS or d in HALF_DAYS or d in _EXTRA_HALF
+
+def is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and not is_holiday(d)
+
+def session(d: date) -> Optional[Tuple[datetime, datetime]]:
+    """O günün (açılış, kapanış) anları; işlem günü değilse None."""
+    if not is_trading_day(d):
+        return None
+    close = HALF_DAY_CLOSE if is_half_day(d) else CLOSE
+    return datetime.combine(d, OPEN, TZ), datetime.combine(d, close, TZ)
+
+def is_open(now: Optional[datetime] = None, grace: timedelta = GRACE) -> bool:
+    """Seans açık mı (kapanıştan sonra `grace` kadar tolerans dahil)?"""
+    now = (now or datetime.now(timezone.utc)).astimezone(TZ)
+    _check_coverage(now.date())
+    s = session(now.date())
+    return s is not None and s[0] <= now <= s[1] + grace
+
+def next_open(now: Optional[datetime] = None) -> datetime:
+    """Şu andan sonraki ilk seans açılışı (açıksa bugünkü açılış)."""
+    now = (now or datetime.now(timezone.utc)).astimezone(TZ)
+    d = now.date()
+    _check_coverage(d)
+    for _ in range(30):
+        s = session(d)
+        if s is not None and now <= s[1] + GRACE:
+            return s[0]
+        d += timedelta(days=1)
+    raise RuntimeError("30 gün içinde seans bulunamadı (takvimi kontrol et)")
+
+def last_closed_session(now: Optional[datetime] = None) -> date:
+    """Kapanışı geçmiş son seansın günü (günlük barı kesinleşmiş son gün)."""
+    now = (now or datetime.now(timezone.utc)).astimezone(TZ)
+    d = now.date()
+    _check_coverage(d)
+    for _ in range(30):
+        s = session(d)
+        if s is not None and s[1] <= now:
+            return d
+        d -= timedelta(days=1)
+    raise RuntimeError("son 30 günde seans bulunamadı (takvimi kontrol et)")
+
+if __name__ == "__main__":
+    now = datetime.now(timezone.utc)
+    state = "AÇIK" if is_open(now) else "KAPALI"
+    print(f"{now.astimezone(TZ):%Y-%m-%d %H:%M %Z}: {state} (sonraki açılış {next_open(now):%Y-%m-%d %H:%M})")
+    sys.exit(0 if state == "AÇIK" else 1)
@@ -4,48 +4,80 @@ import json
 import shutil
 import datetime
 
+import metrics
+import search_index
+
 ROOT = Path(__file__).resolve().parents[1]
 FINAL = ROOT / "final"
+RATIOS = ROOT / "ratios"   # scripts/ratios.py çıktısı
 DOCS = ROOT / "docs"
 OUT_FINAL = DOCS / "final"
+OUT_RATIOS = DOCS / "ratios"
+
+# index.json'daki her kayda eklenen son dönem oranları
+INDEX_RATIO_FIELDS = ["period", "revenue_ttm", "net_income_ttm", "net_margin", "roe",
+                      "debt_to_equity", "market_cap", "pe", "pb", "ev_ebitda"]
 
 DOCS.mkdir(exist_ok=True)
 OUT_FINAL.mkdir(parents=True, exist_ok=True)
+OUT_RATIOS.mkdir(parents=True, exist_ok=True)
 (DOCS / ".nojekyll").touch()
 
 items = []
+search_rows = []   # (ticker, kap, unvan) -> docs/search.json
 for p in sorted(FINAL.glob("*.json")):
-try:
-with p.open("r", encoding="utf-8") as f:
-data = json.load(f)
-except Exception:
-data = {}
-
-ticker = p.stem.upper()
-entry = {
-"ticker": ticker,
-"unvan": data.get("unvan") or data.get("unvanı") or data.get("title"),
-"sektor": data.get("sektor") or data.get("sector"),
-"son_bilanco_tarihi": data.get("son_bilanco_tarihi") or data.get("last_balance_date"),
-"son_guncelleme": data.get("son_guncelleme"),
-}
-items.append(entry)
+    try:
+        with p.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        data = {}
 
-# final/*.json -> docs/final/*.json
-shutil.copy2(p, OUT_FINAL / p.name)
+    ticker = p.stem.upper()
+    kap = data.get("kap") or {}
+    entry = {
+        "ticker": ticker,
+        # ünvan KAP şirket listesinden kazıma anında alınır (kap.summary.unvan)
+        "unvan": (kap.get("summary") or {}).get("unvan") or data.get("unvan") or data.get("title"),
+        "sektor": data.get("sektor") or data.get("sector"),
+        "son_bilanco_tarihi": data.get("son_bilanco_tarihi") or data.get("last_balance_date"),
+        "son_guncelleme": data.get("son_guncelleme"),
+    }
+
+    # ratios/<T>.json -> docs/ratios/<T>.json (+ son dönem özet index'e)
+    rp = RATIOS / p.name
+    if rp.exists():
+        try:
+            with rp.open("r", encoding="utf-8") as f:
+                latest = json.load(f).get("latest") or {}
+            entry["ratios"] = {k: latest.get(k) for k in INDEX_RATIO_FIELDS}
+            shutil.copy2(rp, OUT_RATIOS / p.name)
+            metrics.bytes_written(str(OUT_RATIOS / p.name))
+        except Exception:
+            pass
+    items.append(entry)
+    search_rows.append((ticker, kap, entry["unvan"]))
+
+    # final/*.json -> docs/final/*.json
+    shutil.copy2(p, OUT_FINAL / p.name)
+    metrics.bytes_written(str(OUT_FINAL / p.name))
 
 now = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 for it in items:
-if not it["son_guncelleme"]:
-it["son_guncelleme"] = now
+    if not it["son_guncelleme"]:
+        it["son_guncelleme"] = now
 
 index = {
-"generated_at": now,
-"count": len(items),
-"items": items,
+    "generated_at": now,
+    "count": len(items),
+    "items": items,
 }
 
 with (DOCS / "index.json").open("w", encoding="utf-8") as f:
-json.dump(index, f, ensure_ascii=False, indent=2)
+    json.dump(index, f, ensure_ascii=False, indent=2)
+metrics.bytes_written(str(DOCS / "index.json"))
+
+# arama indeksi: istemci şirket dokümanlarını indirmeden typeahead yapar (scripts/search_index.py)
+search_index.write(str(DOCS / "search.json"), search_index.build(search_rows, now))
+metrics.bytes_written(str(DOCS / "search.json"))
 
-print(f"Wrote {DOCS/'index.json'} with {len(items)} tickers.")
+print(f"Wrote {DOCS/'index.json'} with {len(items)} tickers (+ {DOCS/'search.json'}).")
@@ -0,0 +1,297 @@
+# scripts/changefeed.py
+# -*- coding: utf-8 -*-
+"""
+Çalıştırma başına değişiklik akışı: merge adımı her ticker için eski ve yeni
+final/<T>.json'u karşılaştırır, yalnızca gerçekten değişenleri kaydeder.
+
+Ticker başına değişiklik (boş alanlar yazılmaz; fetchedAt gibi alanlar yok sayılır):
+  added            : ilk kez birleştirildi (önceki final yok)
+  new_periods      : yeni gelen dönemler ["2025/9", ...]
+  revised          : mevcut dönemlerde değişen değerler [{code, period, old, new}]
+  removed_periods  : artık gelmeyen dönemler
+  board            : yönetim kurulu {added, removed, changed: [{name, old, new}]} (Görevi)
+  ownership        : %5 üstü ortaklar {added, removed, changed: [{holder, old, new}]} (Sermayedeki Payı %)
+  summary          : sektör / pazar / endeks alanları {alan: {old, new}}
+  kap              : KAP dokümanında yukarıdakiler dışında değişiklik var (True)
+
+Dosyalar:
+  changes/pending/<T>.json   merge sırasında (yarıda kalan çalıştırma kaybolmaz)
+  changes/<run_id>.json      merge sonunda pending'lerden: {run_id, created_at, counts, tickers}
+  changes/cursors.json       tüketici -> işlediği son run_id
+
+Tüketiciler (db_import, sheets, ...) pending(consumer) ile son onaylarından bu yana
+değişen tickerları alır, işler ve ack(consumer, run_id) ile ilerler. İmleci olmayan
+tüketici için pending() None döner: her şeyi işlemeli (ilk çalıştırma).
+
+Kullanım:
+  python3 scripts/changefeed.py runs
+  python3 scripts/changefeed.py show [RUN_ID]        # varsayılan: son çalıştırma
+  python3 scripts/changefeed.py pending sheets [--kinds new_periods revised]
+  python3 scripts/changefeed.py ack sheets [RUN_ID]
+"""
+
+import os, sys, json, glob, time, argparse
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from merge_kap_bilanco import ensure_dir, load_json_safe, turkish_to_number
+from bilanco_stream import open_values
+
+CHANGES_DIR = "changes"
+PENDING_DIR = os.path.join(CHANGES_DIR, "pending")
+CURSORS_FILE = os.path.join(CHANGES_DIR, "cursors.json")
+
+KINDS = ["added", "new_periods", "revised", "removed_periods", "board", "ownership", "summary", "kap"]
+SUMMARY_FIELDS = ["sektor_ana", "sektor_alt", "sektor_alt_list", "islem_gordugu_pazar", "dahil_oldugu_endeksler"]
+HOLDER_KEY = "Ortağın Adı-Soyadı/Ticaret Ünvanı"
+SHARE_KEY = "Sermayedeki Payı(%)"
+MEMBER_KEY = "Adı-Soyadı"
+ROLE_KEY = "Görevi"
+
+def _write(path: str, obj: Any):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+# ---------- fark ----------
+def _keyed(rows: Iterable[Dict[str, Any]], key: str, field: str, num: bool = False) -> Dict[str, Any]:
+    out = {}
+    for r in rows or []:
+        if not isinstance(r, dict):
+            continue
+        k = str(r.get(key) or "").strip()
+        if not k or k.upper() == "TOPLAM":
+            continue
+        v = r.get(field)
+        out[k] = turkish_to_number(v) if num else (str(v).strip() if v is not None else None)
+    return out
+
+def _diff_keyed(old: Dict[str, Any], new: Dict[str, Any], name: str) -> Optional[Dict[str, Any]]:
+    d = {"added": sorted(set(new) - set(old)), "removed": sorted(set(old) - set(new)),
+         "changed": [{name: k, "old": old[k], "new": new[k]} for k in sorted(set(old) & set(new)) if old[k] != new[k]]}
+    d = {k: v for k, v in d.items() if v}
+    return d or None
+
+def diff_kap(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    old, new = old or {}, new or {}
+    out: Dict[str, Any] = {}
+    board = _diff_keyed(_keyed(old.get("board_members"), MEMBER_KEY, ROLE_KEY),
+                        _keyed(new.get("board_members"), MEMBER_KEY, ROLE_KEY), "name")
+    if board:
+        out["board"] = board
+    own = _diff_keyed(_keyed((old.get("ownership") or {}).get("sermaye_5ustu"), HOLDER_KEY, SHARE_KEY, num=True),
+                      _keyed((new.get("ownership") or {}).get("sermaye_5ustu"), HOLDER_KEY, SHARE_KEY, num=True), "holder")
+    if own:
+        out["ownership"] = own
+    os_, ns = old.get("summary") or {}, new.get("summary") or {}
+    summ = {f: {"old": os_.get(f), "new": ns.get(f)} for f in SUMMARY_FIELDS if os_.get(f) != ns.get(f)}
+    if summ:
+        out["summary"] = summ
+    if not out and old != new:
+        out["kap"] = True
+    return out
+
+class TickerDiff:
+    """Eski final'e karşı yeni bilanco değerlerini akışla karşılaştırır.
+
+      d = TickerDiff(t, old_final)
+      for code, pk, v in ...: d.value(code, pk, v)
+      change = d.finish(kap_doc)        # None = değişiklik yok
+    """
+    def __init__(self, ticker: str, old: Optional[Dict[str, Any]]):
+        self.ticker = ticker
+        self.first = old is None
+        self.old_kap = (old or {}).get("kap")
+        self.old: Dict[Tuple[str, str], Any] = {}
+        for code, pk, v in open_values((old or {}).get("bilanco") or {}):
+            self.old[(code, pk)] = v
+        self.old_periods = {pk for _, pk in self.old}
+        self.new_periods: set = set()
+        self.revised: List[Dict[str, Any]] = []
+
+    def value(self, code: str, pk: str, v: Any):
+        self.new_periods.add(pk)
+        ov = self.old.pop((code, pk), None)
+        if pk in self.old_periods and ov != v:
+            self.revised.append({"code": code, "period": pk, "old": ov, "new": v})
+
+    def feed(self, src) -> "TickerDiff":
+        """src: bilanco dosya yolu ya da dokümanı."""
+        for code, pk, v in open_values(src):
+            self.value(code, pk, v)
+        return self
+
+    def finish(self, kap_new: Optional[Dict[str, Any]], bilanco_ok: bool = True) -> Optional[Dict[str, Any]]:
+        if self.first:
+            return {"added": True, "new_periods": sorted(self.new_periods, key=_period_order)}
+        out: Dict[str, Any] = {}
+        if bilanco_ok:   # okunamayan bilanco bir sonraki çalıştırmada düzelir; silme sayılmaz
+            # eski dönemlerde olup artık gelmeyen değerler
+            for (code, pk), ov in self.old.items():
+                if pk in self.new_periods:
+                    self.revised.append({"code": code, "period": pk, "old": ov, "new": None})
+            new_p = sorted(self.new_periods - self.old_periods, key=_period_order)
+            gone = sorted(self.old_periods - self.new_periods, key=_period_order)
+            if new_p:
+                out["new_periods"] = new_p
+            if self.revised:
+                out["revised"] = sorted(self.revised, key=lambda r: (_period_order(r["period"]), r["code"]))
+            if gone:
+                out["removed_periods"] = gone
+        out.update(diff_kap(self.old_kap, kap_new))
+        return out or None
+
+def _period_order(pk: str) -> Tuple[int, int]:
+    y, _, m = str(pk).partition("/")
+    try:
+        return int(y), int(m)
+    except ValueError:
+        return 0, 0
+
+def kinds_of(change: Dict[str, Any]) -> List[str]:
+    return [k for k in KINDS if change.get(k)]
+
+# ---------- kayıt ----------
+def _combine(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Aynı ticker için commit edilmemiş iki değişikliği birleştirir (b daha yeni)."""
+    out = {**a, **b}
+    if a.get("added") or b.get("added"):
+        out["added"] = True
+    periods = set(a.get("new_periods") or []) | set(b.get("new_periods") or [])
+    if periods:
+        out["new_periods"] = sorted(periods, key=_period_order)
+    gone = (set(a.get("removed_periods") or []) | set(b.get("removed_periods") or [])) - periods
+    out.pop("removed_periods", None)
+    if gone:
+        out["removed_periods"] = sorted(gone, key=_period_order)
+    if a.get("revised") or b.get("revised"):
+        out["revised"] = (a.get("revised") or []) + (b.get("revised") or [])
+    return out
+
+def record(ticker: str, change: Optional[Dict[str, Any]], pending_dir: str = PENDING_DIR):
+    """Ticker değişikliğini pending'e yazar; commit edilmemiş önceki kayıtla birleştirir
+    (yarıda kalan çalıştırmadan sonra ticker yeniden değiştiyse)."""
+    if change is None:
+        return
+    ensure_dir(pending_dir)
+    path = os.path.join(pending_dir, f"{ticker}.json")
+    prev = load_json_safe(path)
+    if prev:
+        prev.pop("ticker", None)
+        change = _combine(prev, change)
+    _write(path, {"ticker": ticker, **change})
+    for k in kinds_of(change):
+        metrics.inc("changes", kind=k)
+
+def new_run_id() -> str:
+    rid = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    n = 0
+    while os.path.exists(os.path.join(CHANGES_DIR, f"{rid}{f'-{n}' if n else ''}.json")):
+        n += 1
+    return f"{rid}-{n}" if n else rid
+
+def commit_run(run_id: Optional[str] = None) -> Optional[str]:
+    """pending/*.json -> changes/<run_id>.json; değişiklik yoksa dosya yazılmaz."""
+    paths = sorted(glob.glob(os.path.join(PENDING_DIR, "*.json")))
+    if not paths:
+        return None
+    tickers: Dict[str, Any] = {}
+    for p in paths:
+        c = load_json_safe(p)
+        if c and c.get("ticker"):
+            tickers[c.pop("ticker")] = c
+    counts = {k: sum(1 for c in tickers.values() if c.get(k)) for k in KINDS}
+    run_id = run_id or new_run_id()
+    path = os.path.join(CHANGES_DIR, f"{run_id}.json")
+    _write(path, {"run_id": run_id, "created_at": time.time(), "counts": {k: v for k, v in counts.items() if v},
+                  "tickers": tickers})
+    metrics.bytes_written(path)
+    for p in paths:
+        os.remove(p)
+    return path
+
+# ---------- okuma / tüketiciler ----------
+def runs() -> List[str]:
+    return sorted(os.path.basename(p)[:-5] for p in glob.glob(os.path.join(CHANGES_DIR, "*.json"))
+                  if os.path.basename(p) != os.path.basename(CURSORS_FILE))
+
+def load_run(run_id: str) -> Dict[str, Any]:
+    return load_json_safe(os.path.join(CHANGES_DIR, f"{run_id}.json")) or {"run_id": run_id, "tickers": {}}
+
+def cursors() -> Dict[str, str]:
+    return load_json_safe(CURSORS_FILE) or {}
+
+def pending(consumer: str, kinds: Optional[Iterable[str]] = None) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """Tüketicinin son ack'inden bu yana değişen tickerlar: ticker -> [değişiklik (run sırasıyla)].
+    kinds verilirse yalnız o türde değişikliği olanlar. İmleç yoksa None (hepsini işle)."""
+    cur = cursors().get(consumer)
+    if cur is None:
+        return None
+    want = set(kinds or KINDS)
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for rid in runs():
+        if rid <= cur:
+            continue
+        for t, c in (load_run(rid).get("tickers") or {}).items():
+            if want & set(kinds_of(c)):
+                out.setdefault(t, []).append({"run_id": rid, **c})
+    return out
+
+def head() -> str:
+    """Son run_id ("" = henüz yok)."""
+    r = runs()
+    return r[-1] if r else ""
+
+def ack(consumer: str, run_id: Optional[str] = None):
+    """Tüketici run_id'ye (varsayılan: son run) kadar olanları işledi."""
+    ensure_dir(CHANGES_DIR)
+    c = cursors()
+    c[consumer] = run_id if run_id is not None else head()
+    _write(CURSORS_FILE, c)
+
+def filter_tickers(consumer: str, tickers: List[str], kinds: Optional[Iterable[str]] = None) -> Tuple[List[str], str]:
+    """Tüketici kolaylığı: tickers'ı akıştaki değişenlerle sınırlar; (liste, ack'lenecek run_id)."""
+    upto = head()
+    changed = pending(consumer, kinds)
+    if changed is None:
+        print(f"→ değişiklik akışı: '{consumer}' için imleç yok, tümü işlenecek")
+        return tickers, upto
+    out = [t for t in tickers if t in changed]
+    print(f"→ değişiklik akışı: {len(out)}/{len(tickers)} ticker değişmiş ('{consumer}')")
+    return out, upto
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["runs", "show", "pending", "ack"])
+    ap.add_argument("args", nargs="*")
+    ap.add_argument("--kinds", nargs="+", choices=KINDS)
+    a = ap.parse_args()
+    if a.cmd == "runs":
+        for rid in runs():
+            r = load_run(rid)
+            print(f"{rid}  {len(r.get('tickers') or {}):5d} ticker  " +
+                  " ".join(f"{k}={v}" for k, v in (r.get("counts") or {}).items()))
+        return
+    if a.cmd == "show":
+        rid = a.args[0] if a.args else head()
+        if not rid:
+            print("değişiklik kaydı yok"); return
+        print(json.dumps(load_run(rid), ensure_ascii=False, indent=2))
+        return
+    if not a.args:
+        print("tüketici adı gerekli", file=sys.stderr); sys.exit(1)
+    if a.cmd == "pending":
+        p = pending(a.args[0], a.kinds)
+        if p is None:
+            print(f"'{a.args[0]}' için imleç yok (tümü işlenmeli)")
+            return
+        for t, cs in sorted(p.items()):
+            print(f"{t:8s} " + ", ".join(sorted({k for c in cs for k in kinds_of(c)}, key=KINDS.index)))
+        print(f"{len(p)} ticker")
+        return
+    ack(a.args[0], a.args[1] if len(a.args) > 1 else None)
+    print(f"✓ {a.args[0]} → {cursors()[a.args[0]] or '(boş)'}")
+
+if __name__ == "__main__":
+    main()
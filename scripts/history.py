@@ -0,0 +1,345 @@
+# scripts/history.py
+# -*- coding: utf-8 -*-
+"""
+Sürümlü geçmiş deposu: kap_json / bilanco_json dokümanlarının her değişen sürümü,
+bir öncekine göre fark (delta) olarak; belirli aralıklarla tam kopya (checkpoint).
+
+history/<tür>/<T>.log   : sürümler art arda, her biri zlib ile sıkıştırılmış JSON
+    doküman                                        checkpoint
+    [["s", yol, değer], ["d", yol], ...]           önceki sürüme göre fark
+history/<tür>/<T>.idx   : {"hash", "stat", "end", "v": [[ts, ofset, checkpoint mi], ...]}
+                          (kaydın boyu = sonraki ofset - ofset)
+
+  - Yol anahtar listesidir (["items", "1BL", "values", "2023/12"], ["board_members", 0,
+    "Görevi"]); sözlükler ve boyu değişmeyen listeler özyinelemeli karşılaştırılır, boyu
+    değişen liste (ör. yeni YK üyesi) bütün olarak yazılır.
+  - Değişmeyen doküman yeni sürüm üretmez (VOLATILE alanlar, ör. meta.fetchedAt,
+    karşılaştırmaya girmez). Her CHECKPOINT_EVERY sürümde bir ya da fark tam kopyadan
+    büyükse checkpoint yazılır; bir okuma en çok CHECKPOINT_EVERY - 1 fark uygular.
+  - ts: sürümün bilindiği an (bilanco: meta.fetchedAt, kap: dosya mtime; git'ten
+    aktarımda commit tarihi), UTC "YYYY-MM-DDTHH:MM:SSZ"; sürümler içinde artan.
+  - Nokta-zaman okuması: .idx'te ikili arama -> checkpoint ofsetinden hedef sürümün
+    sonuna kadar tek okuma -> açılıp farklar uygulanır.
+  - .idx'e girmemiş (yazım sırasında yarım kalmış) kuyruk bir sonraki kayıtta kesilir.
+  - CI'da history/ actions/cache'te değil 'history-data' git dalında kalıcı tutulur
+    (.github/workflows/pipeline.yml: çalıştırma başında açılır, sonunda ileri sarılır).
+
+Kullanım:
+  python3 scripts/history.py record                      # mevcut kap_json + bilanco_json'u kaydet
+  python3 scripts/history.py record ARCLK TUPRS
+  python3 scripts/history.py backfill-git                # data dizinlerinin git geçmişini aktar
+  python3 scripts/history.py log ARCLK --kind kap
+  python3 scripts/history.py show ARCLK --at 2024-03-01 --board --period 2023/12
+  python3 scripts/history.py show ARCLK --kind bilanco --at 2024-03-01 --path items.1BL.values.2023/12
+  python3 scripts/history.py stats
+API:
+  h = HistoryStore()
+  h.as_of("kap", "ARCLK", "2024-03-01")["board_members"]
+  h.as_of("bilanco", "ARCLK", "2024-03-01")["items"]["1BL"]["values"]["2023/12"]
+"""
+
+import os, sys, json, time, zlib, bisect, hashlib, argparse, subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from merge_kap_bilanco import KAP_DIR, BILANCO_DIR, ensure_dir, load_json_safe
+import metrics
+from quarterly import read_tickers
+
+HISTORY_DIR = "history"
+KINDS = {"kap": KAP_DIR, "bilanco": BILANCO_DIR}
+# Her sürümde değişen, içerik sayılmayan alanlar (tür -> yollar)
+VOLATILE = {"kap": [], "bilanco": [["meta", "fetchedAt"]]}
+CHECKPOINT_EVERY = 16
+
+# ---------- fark ----------
+def diff(old: Any, new: Any, path: Optional[list] = None) -> List[list]:
+    """old -> new için işlem listesi: ["s", yol, değer] / ["d", yol]."""
+    path = path or []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for k in old:
+            if k not in new:
+                ops.append(["d", path + [k]])
+        for k, v in new.items():
+            if k not in old:
+                ops.append(["s", path + [k], v])
+            elif old[k] != v:
+                ops += diff(old[k], v, path + [k])
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                ops += diff(a, b, path + [i])
+        return ops
+    return [] if old == new else [["s", path, new]]
+
+def apply(doc: Any, ops: List[list]) -> Any:
+    """diff çıktısını doc üzerine uygular (yerinde; kök değişirse yeni kökü döner)."""
+    for op in ops:
+        path = op[1]
+        if not path:
+            doc = op[2] if op[0] == "s" else None
+            continue
+        node = doc
+        for k in path[:-1]:
+            node = node[k]
+        if op[0] == "s":
+            node[path[-1]] = op[2]
+        elif isinstance(node, dict):
+            node.pop(path[-1], None)
+    return doc
+
+def _strip(kind: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Karşılaştırma için VOLATILE alanları atılmış sığ kopya."""
+    if not VOLATILE.get(kind):
+        return doc
+    doc = dict(doc)
+    for path in VOLATILE[kind]:
+        node = doc
+        for k in path[:-1]:
+            if not isinstance(node.get(k), dict):
+                node = None
+                break
+            child = dict(node[k])
+            node[k] = child
+            node = child
+        if node is not None:
+            node.pop(path[-1], None)
+    return doc
+
+def content_hash(kind: str, doc: Dict[str, Any]) -> str:
+    raw = json.dumps(_strip(kind, doc), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def norm_ts(ts: str) -> str:
+    """'2025-08-25T19:31:28.913Z' / '2025-08-25' -> '2025-08-25T19:31:28Z' / '2025-08-25T23:59:59Z'."""
+    ts = ts.strip().replace(" ", "T")
+    if len(ts) == 10:
+        return ts + "T23:59:59Z"
+    return ts[:19] + "Z"
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+def _unpack(raw: bytes) -> Any:
+    return json.loads(zlib.decompress(raw))
+
+def _utc(sec: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(sec))
+
+def _stat(path: str) -> List[int]:
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except FileNotFoundError:
+        return [-1, -1]
+
+# ---------- depo ----------
+class HistoryStore:
+    def __init__(self, root: str = HISTORY_DIR):
+        self.root = root
+        self._idx: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def _paths(self, kind: str, ticker: str) -> Tuple[str, str]:
+        base = os.path.join(self.root, kind, ticker)
+        return base + ".log", base + ".idx"
+
+    def index(self, kind: str, ticker: str) -> Dict[str, Any]:
+        key = (kind, ticker)
+        if key not in self._idx:
+            self._idx[key] = load_json_safe(self._paths(kind, ticker)[1]) or {"hash": None, "stat": None, "end": 0, "v": []}
+        return self._idx[key]
+
+    def versions(self, kind: str, ticker: str) -> List[str]:
+        return [e[0] for e in self.index(kind, ticker)["v"]]
+
+    def _read(self, kind: str, ticker: str, upto: int) -> Optional[Dict[str, Any]]:
+        """upto. sürümü (0 tabanlı) kurar: son checkpoint + farklar."""
+        entries = self.index(kind, ticker)["v"]
+        if not 0 <= upto < len(entries):
+            return None
+        base = upto
+        while not entries[base][2]:
+            base -= 1
+        end = entries[upto + 1][1] if upto + 1 < len(entries) else self.index(kind, ticker)["end"]
+        start = entries[base][1]
+        with open(self._paths(kind, ticker)[0], "rb") as f:
+            f.seek(start)
+            buf = f.read(end - start)
+        bounds = [e[1] - start for e in entries[base:upto + 1]] + [end - start]
+        doc = _unpack(buf[bounds[0]:bounds[1]])
+        for a, b in zip(bounds[1:], bounds[2:]):
+            doc = apply(doc, _unpack(buf[a:b]))
+        return doc
+
+    def get(self, kind: str, ticker: str, version: int = -1) -> Optional[Dict[str, Any]]:
+        n = len(self.index(kind, ticker)["v"])
+        return self._read(kind, ticker, version if version >= 0 else n + version)
+
+    def as_of(self, kind: str, ticker: str, when: str) -> Optional[Dict[str, Any]]:
+        """when anında bilinen sürüm (o ana kadar kaydedilmiş son sürüm); yoksa None."""
+        i = bisect.bisect_right(self.versions(kind, ticker), norm_ts(when)) - 1
+        return self._read(kind, ticker, i) if i >= 0 else None
+
+    def record(self, kind: str, ticker: str, doc: Dict[str, Any], ts: str,
+               stat: Optional[List[int]] = None) -> Optional[int]:
+        """Doküman öncekinden farklıysa yeni sürüm ekler; sürüm no (yoksa None)."""
+        idx = self.index(kind, ticker)
+        h = content_hash(kind, doc)
+        if h == idx["hash"]:
+            if stat is not None and idx["stat"] != stat:
+                idx["stat"] = stat
+                self._save_idx(kind, ticker)
+            return None
+        entries = idx["v"]
+        ts = norm_ts(ts)
+        if entries and ts < entries[-1][0]:
+            ts = entries[-1][0]
+        data = _pack(doc)
+        full = True
+        if entries and len(entries) % CHECKPOINT_EVERY:
+            delta = _pack(diff(self.get(kind, ticker), doc))
+            if len(delta) <= len(data) // 2:
+                data, full = delta, False
+        log_path = self._paths(kind, ticker)[0]
+        ensure_dir(os.path.dirname(log_path))
+        with open(log_path, "ab") as f:
+            f.truncate(idx["end"])
+            f.write(data)
+        entries.append([ts, idx["end"], full])
+        idx.update(hash=h, stat=stat, end=idx["end"] + len(data))
+        self._save_idx(kind, ticker)
+        metrics.inc("history_versions", 1, kind=kind, type="full" if full else "delta")
+        return len(entries) - 1
+
+    def _save_idx(self, kind: str, ticker: str):
+        path = self._paths(kind, ticker)[1]
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index(kind, ticker), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def record_files(self, tickers: List[str], kinds: List[str] = list(KINDS)) -> Dict[str, int]:
+        """kap_json / bilanco_json'daki güncel dosyaları kaydeder; tür -> yeni sürüm sayısı."""
+        out = {k: 0 for k in kinds}
+        for kind in kinds:
+            for t in tickers:
+                path = os.path.join(KINDS[kind], f"{t}.json")
+                st = _stat(path)
+                if st[0] < 0 or self.index(kind, t)["stat"] == st:
+                    continue
+                doc = load_json_safe(path)
+                if doc is None:
+                    continue
+                ts = ((doc.get("meta") or {}).get("fetchedAt") if kind == "bilanco" else None) or _utc(st[1] / 1e9)
+                if self.record(kind, t, doc, ts, stat=st) is not None:
+                    out[kind] += 1
+        return out
+
+    def backfill_git(self, tickers: List[str], kinds: List[str] = list(KINDS)) -> Dict[str, int]:
+        """Data dizinlerinin git geçmişindeki sürümleri (eskiden yeniye) aktarır."""
+        out = {k: 0 for k in kinds}
+        for kind in kinds:
+            for t in tickers:
+                if self.index(kind, t)["v"]:
+                    continue          # zaten kayıtlı; geçmiş ancak boş depoya aktarılır
+                path = f"{KINDS[kind]}/{t}.json"
+                log = subprocess.run(["git", "log", "--reverse", "--format=%H %cI", "--", path],
+                                     capture_output=True, text=True).stdout.split()
+                for sha, date in zip(log[0::2], log[1::2]):
+                    raw = subprocess.run(["git", "show", f"{sha}:{path}"], capture_output=True).stdout
+                    try:
+                        doc = json.loads(raw)
+                    except ValueError:
+                        continue
+                    ts = datetime.fromisoformat(date).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    if self.record(kind, t, doc, ts) is not None:
+                        out[kind] += 1
+        return out
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        out = {}
+        for kind in KINDS:
+            d = os.path.join(self.root, kind)
+            files = os.listdir(d) if os.path.isdir(d) else []
+            logs = [f for f in files if f.endswith(".log")]
+            s = {"tickers": len(logs), "versions": 0, "checkpoints": 0, "bytes": 0}
+            for f in logs:
+                idx = self.index(kind, f[:-4])
+                s["versions"] += len(idx["v"])
+                s["checkpoints"] += sum(1 for e in idx["v"] if e[2])
+                s["bytes"] += idx["end"]
+            out[kind] = s
+        return out
+
+def _at_path(doc: Any, path: str) -> Any:
+    """'items.1BL.values.2023/12' / 'board_members.0' -> değer (yoksa None)."""
+    for k in [p for p in path.split(".") if p]:
+        if isinstance(doc, list) and k.isdigit():
+            doc = doc[int(k)] if int(k) < len(doc) else None
+        else:
+            doc = doc.get(k) if isinstance(doc, dict) else None
+    return doc
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["record", "backfill-git", "log", "show", "stats"])
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--kind", choices=list(KINDS), help="yalnızca bu tür (varsayılan: ikisi)")
+    ap.add_argument("--at", help="show: bu an itibarıyla (YYYY-MM-DD ya da ISO); yoksa son sürüm")
+    ap.add_argument("--path", help="show: doküman içi yol, '.' ayraçlı (ör. items.1BL.values)")
+    ap.add_argument("--board", action="store_true", help="show: yönetim kurulu")
+    ap.add_argument("--period", help="show: bilanco kalemlerinin bu dönemdeki değerleri (ör. 2023/12)")
+    ap.add_argument("--root", default=HISTORY_DIR)
+    args = ap.parse_args()
+    h = HistoryStore(args.root)
+    kinds = [args.kind] if args.kind else list(KINDS)
+
+    if args.cmd in ("record", "backfill-git"):
+        t0 = time.perf_counter()
+        tickers = read_tickers(args.tickers)
+        fn = h.record_files if args.cmd == "record" else h.backfill_git
+        n = fn(tickers, kinds)
+        print(f"✓ history: {len(tickers)} ticker, yeni sürüm: "
+              + ", ".join(f"{k}={v}" for k, v in n.items()) + f" → {args.root}/ ({time.perf_counter() - t0:.2f} s)")
+        return
+    if args.cmd == "stats":
+        for kind, s in h.stats().items():
+            print(f"{kind:8s} {s['tickers']} ticker, {s['versions']} sürüm ({s['checkpoints']} checkpoint), "
+                  f"{s['bytes'] / 1e6:.1f} MB")
+        return
+    if len(args.tickers) != 1:
+        ap.error("tek ticker gerekli")
+    t = args.tickers[0].upper()
+    if args.cmd == "log":
+        for kind in kinds:
+            idx = h.index(kind, t)
+            for i, (ts, off, full) in enumerate(idx["v"]):
+                nxt = idx["v"][i + 1][1] if i + 1 < len(idx["v"]) else idx["end"]
+                print(f"{kind:8s} v{i:<4d} {ts}  {'checkpoint' if full else 'delta':10s} {nxt - off} B")
+        return
+
+    for kind in kinds:
+        t0 = time.perf_counter()
+        doc = h.as_of(kind, t, args.at) if args.at else h.get(kind, t)
+        dt = (time.perf_counter() - t0) * 1000
+        if doc is None:
+            print(f"⚠ {kind}: {t} için {'o tarihte ' if args.at else ''}sürüm yok", file=sys.stderr)
+            continue
+        if args.path:
+            out: Any = _at_path(doc, args.path)
+        elif kind == "kap" and args.board:
+            out = doc.get("board_members")
+        elif kind == "bilanco" and args.period:
+            out = {c: it.get("values", {}).get(args.period) for c, it in (doc.get("items") or {}).items()}
+        elif args.board or args.period:
+            continue
+        else:
+            out = doc
+        print(json.dumps({kind: out}, ensure_ascii=False, indent=2))
+        print(f"({kind}: {dt:.2f} ms)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# scripts/interlock.py
+# -*- coding: utf-8 -*-
+"""
+Ortaklık ve yönetim kurulu ters indeksi: kişi / kurum adı -> tickerlar.
+
+kap_json/<T>.json'dan:
+  - ownership.sermaye_5ustu      : ortak -> ticker (pay %, TL)
+  - ownership.bagli_ortakliklar  : ticker -> bağlı ortaklık (pay %)
+  - board_members                : kişi -> ticker (görev, icrada mı); tüzel kişi üye
+                                   adına hareket eden kişi de ayrıca indekslenir
+Adlar name_key ile normalize edilir (Türkçe büyük harf, ASCII katlama, noktalama,
+A.Ş. / TİC. / SAN. gibi kısaltmalar); aynı kişi / kurumun farklı yazımları tek
+anahtarda toplanır.
+
+interlock/index.json:
+  tickers  : ticker -> {stat: [boyut, mtime_ns], holders, subsidiaries, board}  (ticker başına kayıtlar)
+  entities : anahtar -> {name, holdings{T: pct}, boards{T: görev}, subsidiary_of{T: pct}}  (ters indeks)
+Yalnızca kap_json dosyası değişen (boyut / mtime) tickerlar yeniden okunur; eski
+katkıları ters indeksten çıkarılıp yenileri eklenir.
+
+Kullanım:
+  python3 scripts/interlock.py --build
+  python3 scripts/interlock.py holder "anadolu grubu holding"      # %5 üstü pay sahibi olduğu şirketler
+  python3 scripts/interlock.py person "Kamilhan Süleyman Yazıcı"   # oturduğu yönetim kurulları
+  python3 scripts/interlock.py interlocks AEFES                    # ortak YK üyesi olan şirketler
+  python3 scripts/interlock.py group "anadolu grubu holding" --depth 4
+  python3 scripts/interlock.py owners AEFES
+  python3 scripts/interlock.py find anadolu
+API:
+  ix = InterlockIndex.load_or_build()
+  ix.holdings("..."); ix.boards("..."); ix.interlocks("AEFES"); ix.group("...")
+"""
+
+import os, re, json, time, argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from merge_kap_bilanco import KAP_DIR, ensure_dir, load_json_safe, turkish_to_number
+import metrics
+from quarterly import read_tickers
+from kap_types import fold
+
+INTERLOCK_DIR = "interlock"
+INDEX_PATH = os.path.join(INTERLOCK_DIR, "index.json")
+VERSION = 1
+
+HOLDER_KEY = "Ortağın Adı-Soyadı/Ticaret Ünvanı"
+SUB_KEY = "Ticaret Ünvanı"
+MEMBER_KEY = "Adı-Soyadı"
+REP_KEY = "Tüzel Kişi Üye Adına Hareket Eden Kişi"
+SKIP_HOLDERS = {"TOPLAM", "DIGER", "DIGER ORTAKLAR", "HALKA ACIK", "HALKA ACIK KISIM"}
+
+_ABBR = [(re.compile(p), r) for p, r in [
+    (r"\bANONIM SIRKETI\b", "AS"), (r"\bA S\b", "AS"),
+    (r"\bLIMITED SIRKETI\b", "LTD STI"), (r"\bLIMITED\b", "LTD"), (r"\bSIRKETI\b", "STI"),
+    (r"\bSANAYII\b", "SANAYI"), (r"\bSAN\b", "SANAYI"), (r"\bTIC\b", "TICARET"),
+]]
+
+def name_key(s: Optional[str]) -> str:
+    """Ad -> eşleştirme anahtarı ('Efes Pazarlama ve Dağıtım Tic. A.Ş.' -> 'EFES PAZARLAMA VE DAGITIM TICARET AS')."""
+    s = fold(s)
+    for pat, rep in _ABBR:
+        s = pat.sub(rep, s)
+    return s
+
+def _stat(path: str) -> List[int]:
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except FileNotFoundError:
+        return [-1, -1]
+
+def extract(kap: Dict[str, Any]) -> Dict[str, List[List[Any]]]:
+    """kap_json -> ticker kayıtları (anahtar, görünen ad, ...)."""
+    own = kap.get("ownership") or {}
+    holders, subs, board = [], [], []
+    for r in own.get("sermaye_5ustu") or []:
+        name = str((r or {}).get(HOLDER_KEY) or "").strip()
+        key = name_key(name)
+        if key and key not in SKIP_HOLDERS:
+            holders.append([key, name, turkish_to_number(r.get("Sermayedeki Payı(%)")),
+                            turkish_to_number(r.get("Sermayedeki Payı(TL)"))])
+    for r in own.get("bagli_ortakliklar") or []:
+        name = str((r or {}).get(SUB_KEY) or "").strip()
+        if name_key(name):
+            subs.append([name_key(name), name, turkish_to_number(r.get("Şirketin Sermayedeki Payı(%)"))])
+    for r in kap.get("board_members") or []:
+        r = r or {}
+        name = str(r.get(MEMBER_KEY) or "").strip()
+        if not name_key(name):
+            continue
+        role = str(r.get("Görevi") or "").strip()
+        execu = fold(r.get("İcrada Görevli Olup Olmadığı")) == "ICRADA GOREVLI"   # "... Değil" değil
+        board.append([name_key(name), name, role, execu])
+        rep = str(r.get(REP_KEY) or "").strip()
+        if name_key(rep):
+            board.append([name_key(rep), rep, f"{role} ({name} adına)", execu])
+    return {"holders": holders, "subsidiaries": subs, "board": board}
+
+class InterlockIndex:
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.tickers: Dict[str, Dict[str, Any]] = data.get("tickers") or {}
+        self.entities: Dict[str, Dict[str, Any]] = data.get("entities") or {}
+        self._words: Optional[Dict[str, set]] = None    # kelime -> anahtarlar (find için, ilk sorguda)
+
+    # --- artımlı güncelleme ---
+    def _entity(self, key: str, name: str) -> Dict[str, Any]:
+        e = self.entities.get(key)
+        if e is None:
+            e = self.entities[key] = {"name": name, "holdings": {}, "boards": {}, "subsidiary_of": {}}
+        return e
+
+    def remove(self, ticker: str):
+        self._words = None
+        rec = self.tickers.pop(ticker, None)
+        if not rec:
+            return
+        for field, kind in (("holders", "holdings"), ("subsidiaries", "subsidiary_of"), ("board", "boards")):
+            for row in rec.get(field) or []:
+                e = self.entities.get(row[0])
+                if e is None:
+                    continue
+                e[kind].pop(ticker, None)
+                if not (e["holdings"] or e["boards"] or e["subsidiary_of"]):
+                    del self.entities[row[0]]
+
+    def add(self, ticker: str, rec: Dict[str, Any]):
+        self.remove(ticker)
+        self._words = None
+        self.tickers[ticker] = rec
+        for key, name, pct, tl in rec["holders"]:
+            self._entity(key, name)["holdings"][ticker] = {"pct": pct, "tl": tl}
+        for key, name, pct in rec["subsidiaries"]:
+            self._entity(key, name)["subsidiary_of"][ticker] = pct
+        for key, name, role, execu in rec["board"]:
+            boards = self._entity(key, name)["boards"]
+            # aynı kişi aynı YK'da iki satırda (üye + temsilci) olabilir
+            boards[ticker] = f"{boards[ticker]}; {role}" if ticker in boards else role
+
+    def update(self, tickers: List[str], force: bool = False) -> Tuple[int, int]:
+        """Değişen kap_json'ları yeniden okur; (güncellenen, silinen)."""
+        changed = removed = 0
+        want = set(tickers)
+        for t in list(self.tickers):
+            if t not in want:
+                self.remove(t)
+                removed += 1
+        for t in tickers:
+            path = os.path.join(KAP_DIR, f"{t}.json")
+            st = _stat(path)
+            if not force and t in self.tickers and self.tickers[t].get("stat") == st:
+                continue
+            kap = load_json_safe(path)
+            if kap is None:
+                if t in self.tickers:
+                    self.remove(t)
+                    removed += 1
+                continue
+            self.add(t, {"stat": st, **extract(kap)})
+            changed += 1
+        metrics.inc("interlock_tickers", changed, result="updated")
+        return changed, removed
+
+    # --- kalıcılık ---
+    def save(self, path: str = INDEX_PATH):
+        ensure_dir(os.path.dirname(path) or ".")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION, "tickers": self.tickers, "entities": self.entities},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        metrics.bytes_written(path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> Optional["InterlockIndex"]:
+        data = load_json_safe(path)
+        if not data or data.get("version") != VERSION:
+            return None
+        return cls(data)
+
+    @classmethod
+    def load_or_build(cls, tickers: Optional[List[str]] = None, path: str = INDEX_PATH,
+                      force: bool = False) -> "InterlockIndex":
+        ix = (None if force else cls.load(path)) or cls()
+        changed, removed = ix.update(tickers or read_tickers([]), force=force)
+        if changed or removed or not os.path.exists(path):
+            ix.save(path)
+        return ix
+
+    # --- sorgular ---
+    def resolve(self, name: str) -> Optional[str]:
+        """Ad -> anahtar: tam eşleşme, yoksa tek aday içeren eşleşme."""
+        key = name_key(name)
+        if key in self.entities:
+            return key
+        cands = self.find(name, limit=2)
+        return cands[0][0] if len(cands) == 1 else None
+
+    def find(self, q: str, limit: int = 20) -> List[Tuple[str, str]]:
+        """Her kelimesi q'nun bir kelimesiyle başlayan varlıklar: [(anahtar, ad)]."""
+        if self._words is None:
+            self._words = {}
+            for key in self.entities:
+                for w in key.split():
+                    self._words.setdefault(w, set()).add(key)
+        hits = None
+        for w in name_key(q).split():
+            keys = set().union(*(v for k, v in self._words.items() if k.startswith(w)))
+            hits = keys if hits is None else hits & keys
+            if not hits:
+                return []
+        return [(k, self.entities[k]["name"]) for k in sorted(hits or [])[:limit]]
+
+    def holdings(self, name: str, min_pct: float = 0.0) -> List[Dict[str, Any]]:
+        key = self.resolve(name)
+        if key is None:
+            return []
+        rows = [{"ticker": t, **h} for t, h in self.entities[key]["holdings"].items()
+                if (h.get("pct") or 0) >= min_pct]
+        return sorted(rows, key=lambda r: -(r.get("pct") or 0))
+
+    def boards(self, name: str) -> List[Dict[str, Any]]:
+        key = self.resolve(name)
+        if key is None:
+            return []
+        return [{"ticker": t, "role": r} for t, r in sorted(self.entities[key]["boards"].items())]
+
+    def interlocks(self, ticker: str) -> Dict[str, List[str]]:
+        """ticker ile ortak yönetim kurulu üyesi olan şirketler: diğer ticker -> kişiler."""
+        out: Dict[str, List[str]] = {}
+        for key, _name, _role, _ex in (self.tickers.get(ticker) or {}).get("board") or []:
+            e = self.entities.get(key) or {}
+            for other in e.get("boards") or {}:
+                if other != ticker and e["name"] not in out.setdefault(other, []):
+                    out[other].append(e["name"])
+        return dict(sorted(out.items(), key=lambda kv: (-len(kv[1]), kv[0])))
+
+    def group(self, name: str, depth: int = 3, min_pct: float = 0.0) -> List[Dict[str, Any]]:
+        """Grup yapısı (aşağı yönlü): varlığın pay sahibi olduğu tickerlar, onların bağlı
+        ortaklıkları, bunlar da başka şirketlerde ortaksa o şirketler ... Dolaylı pay
+        yol boyunca payların çarpımı (birden çok yolda en büyüğü)."""
+        start = self.resolve(name)
+        if start is None:
+            return []
+        best: Dict[str, Dict[str, Any]] = {}
+        frontier = [(start, 100.0, [self.entities[start]["name"]])]
+        for level in range(1, depth + 1):
+            nxt = []
+            for key, eff, path in frontier:
+                e = self.entities.get(key) or {}
+                for t, h in (e.get("holdings") or {}).items():
+                    pct = h.get("pct") or 0.0
+                    share = eff * pct / 100
+                    if share < min_pct or (t in best and best[t]["effective_pct"] >= share):
+                        continue
+                    best[t] = {"ticker": t, "effective_pct": round(share, 4), "depth": level, "path": path + [t]}
+                    # ticker'ın bağlı ortaklıkları da başka şirketlerde ortak olabilir
+                    for skey, _sname, spct in (self.tickers.get(t) or {}).get("subsidiaries") or []:
+                        if skey != key:
+                            nxt.append((skey, share * (spct or 0.0) / 100, path + [t, self.entities[skey]["name"]]))
+            frontier = nxt
+            if not frontier:
+                break
+        return sorted(best.values(), key=lambda r: (-r["effective_pct"], r["ticker"]))
+
+    def owners(self, ticker: str, depth: int = 3) -> List[Dict[str, Any]]:
+        """Yukarı yönlü: ticker'ın %5 üstü ortakları; ortak başka bir tickerın bağlı
+        ortaklığıysa o ticker (ortağın üstündeki pay kadar) ve onun ortakları ...
+        Dolaylı pay yol boyunca payların çarpımı."""
+        out, seen = [], {ticker}
+        frontier = [(ticker, 100.0, [ticker])]
+        for level in range(1, depth + 1):
+            nxt = []
+            for t, eff, path in frontier:
+                for key, name, pct, _tl in (self.tickers.get(t) or {}).get("holders") or []:
+                    share = eff * (pct or 0.0) / 100
+                    out.append({"owner": name, "effective_pct": round(share, 4), "depth": level, "path": path + [name]})
+                    for parent, spct in (self.entities.get(key) or {}).get("subsidiary_of", {}).items():
+                        if parent not in seen:
+                            seen.add(parent)
+                            up = share * (spct or 0.0) / 100
+                            out.append({"owner": parent, "effective_pct": round(up, 4), "depth": level + 1,
+                                        "path": path + [name, parent]})
+                            nxt.append((parent, up, path + [name, parent]))
+            frontier = nxt
+            if not frontier:
+                break
+        return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", nargs="?", choices=["holder", "person", "interlocks", "group", "owners", "find"])
+    ap.add_argument("arg", nargs="?")
+    ap.add_argument("--build", action="store_true", help="indeksi (artımlı) güncelle")
+    ap.add_argument("--force", action="store_true", help="tüm tickerları yeniden oku")
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--min-pct", type=float, default=0.0)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.build or args.force:
+        ix = InterlockIndex.load(INDEX_PATH) if not args.force else None
+        ix = ix or InterlockIndex()
+        changed, removed = ix.update(read_tickers([]), force=args.force)
+        if changed or removed or not os.path.exists(INDEX_PATH):
+            ix.save(INDEX_PATH)
+        print(f"✓ interlock: {len(ix.tickers)} ticker, {len(ix.entities)} kişi/kurum "
+              f"({changed} güncellendi, {removed} silindi) → {INDEX_PATH} ({time.perf_counter() - t0:.2f} s)")
+        if not args.cmd:
+            return
+    else:
+        ix = InterlockIndex.load_or_build()
+    if not args.cmd or not args.arg:
+        ap.error("sorgu ve argüman gerekli")
+
+    t1 = time.perf_counter()
+    if args.cmd == "holder":
+        res: Any = ix.holdings(args.arg, args.min_pct)
+    elif args.cmd == "person":
+        res = ix.boards(args.arg)
+    elif args.cmd == "interlocks":
+        res = ix.interlocks(args.arg.upper())
+    elif args.cmd == "group":
+        res = ix.group(args.arg, args.depth, args.min_pct)
+    elif args.cmd == "owners":
+        res = ix.owners(args.arg.upper(), args.depth)
+    else:
+        res = ix.find(args.arg)
+    dt = (time.perf_counter() - t1) * 1000
+    if args.json:
+        print(json.dumps(res, ensure_ascii=False, indent=2))
+        return
+    if isinstance(res, dict):
+        for k, v in res.items():
+            print(f"{k:8s} {', '.join(v)}")
+    else:
+        for r in res:
+            print("  ".join(str(x) if not isinstance(x, list) else " → ".join(map(str, x))
+                            for x in (r.values() if isinstance(r, dict) else r)))
+    print(f"({len(res)} sonuç, sorgu {dt:.2f} ms)")
+
+if __name__ == "__main__":
+    main()
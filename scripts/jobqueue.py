@@ -0,0 +1,243 @@
+# scripts/jobqueue.py
+# -*- coding: utf-8 -*-
+"""
+Ticker başına iş kuyruğu (SQLite): aşamalar arası ortak ilerleme kaydı.
+
+Tablo jobs (stage, ticker) başına: status (pending|leased|done|failed), attempts,
+last_error, duration, input_hash, lease_owner, lease_until, updated_at.
+
+  - enqueue: girdi hash'i aynı ve 'done' olan iş yeniden kuyruğa girmez (resume);
+    hash değiştiyse iş sıfırlanır.
+  - lease: BEGIN IMMEDIATE ile atomik; süresi dolan kiralar (çöken worker) geri alınır.
+    Aynı kuyruğu birden çok süreç eşzamanlı tüketebilir (WAL + busy_timeout).
+    tickers verilirse yalnızca o tickerlar kiralanır (CLI listesi / pipeline todo'su;
+    aşamada önceki çalıştırmalardan kalan başka işler dokunulmadan bekler).
+  - fail: attempts < max_attempts ise tekrar 'pending', değilse 'failed'.
+
+Kullanım:
+  from jobqueue import JobQueue, work
+  q = JobQueue("merge"); q.enqueue(tickers, hashes)
+  work(q, process_one, tickers=tickers)   # birden çok süreçte aynı anda çalıştırılabilir
+  python3 scripts/jobqueue.py status [STAGE]
+  python3 scripts/jobqueue.py retry STAGE        # failed -> pending
+  python3 scripts/jobqueue.py reset STAGE        # aşamanın tüm kayıtlarını sil
+ENV:
+  JOBS_DB (.cache/jobs.sqlite), JOBS_LEASE_SEC (900), JOBS_MAX_ATTEMPTS (3)
+"""
+
+import os, sys, json, time, socket, sqlite3, argparse, hashlib
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import metrics
+
+JOBS_DB = os.environ.get("JOBS_DB", os.path.join(".cache", "jobs.sqlite"))
+LEASE_SEC = float(os.environ.get("JOBS_LEASE_SEC", "900"))
+MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    stage       TEXT NOT NULL,
+    ticker      TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    last_error  TEXT,
+    duration    REAL,
+    input_hash  TEXT,
+    lease_owner TEXT,
+    lease_until REAL,
+    updated_at  REAL,
+    PRIMARY KEY (stage, ticker)
+);
+CREATE INDEX IF NOT EXISTS jobs_stage_status ON jobs (stage, status);
+"""
+
+def files_hash(paths: Iterable[str]) -> Optional[str]:
+    """Dosya içeriklerinden girdi hash'i; hiçbiri yoksa None."""
+    h, seen = hashlib.sha1(), False
+    for p in paths:
+        try:
+            with open(p, "rb") as f:
+                h.update(f.read()); seen = True
+        except FileNotFoundError:
+            h.update(b"-")
+        h.update(b"\0")
+    return h.hexdigest() if seen else None
+
+def default_worker() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueue:
+    def __init__(self, stage: str, path: str = JOBS_DB, lease_sec: float = LEASE_SEC,
+                 max_attempts: int = MAX_ATTEMPTS, worker: Optional[str] = None):
+        self.stage, self.path = stage, path
+        self.lease_sec, self.max_attempts = lease_sec, max_attempts
+        self.worker = worker or default_worker()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA busy_timeout=30000")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def enqueue(self, tickers: Iterable[str], hashes: Optional[Dict[str, Optional[str]]] = None,
+                fresh: bool = False) -> int:
+        """İşleri kuyruğa ekler; bu tickerlardan kuyrukta bekleyen (done olmayan) iş
+        sayısı döner. fresh=True: done olanlar da yeniden kuyruğa alınır."""
+        hashes = hashes or {}
+        tickers = list(tickers)
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for t in tickers:
+                h = hashes.get(t)
+                row = self.db.execute("SELECT status, input_hash FROM jobs WHERE stage=? AND ticker=?",
+                                      (self.stage, t)).fetchone()
+                if row is None:
+                    self.db.execute("INSERT INTO jobs (stage, ticker, input_hash, updated_at) VALUES (?,?,?,?)",
+                                    (self.stage, t, h, now))
+                elif fresh or row[1] != h or row[0] == "failed":
+                    # girdi değişti / yeniden denenecek: sıfırla (kiralı iş kirasını korur)
+                    if row[0] != "leased":
+                        self.db.execute("UPDATE jobs SET status='pending', attempts=0, last_error=NULL, "
+                                        "input_hash=?, updated_at=? WHERE stage=? AND ticker=?",
+                                        (h, now, self.stage, t))
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE stage=? AND status!='done' AND "
+                               "ticker IN (SELECT value FROM json_each(?))",
+                               (self.stage, json.dumps(tickers))).fetchone()[0]
+
+    def lease(self, n: int = 1, tickers: Optional[Iterable[str]] = None) -> List[str]:
+        """n işi kiralar (pending ya da kirası dolmuş); attempts artar.
+        tickers: yalnızca bu tickerlardan kirala (None = aşamadaki tüm işler)."""
+        now = time.time()
+        only, params = "", [self.stage, self.max_attempts, now]
+        if tickers is not None:
+            # tek parametre (JSON dizi): SQLite değişken sınırına takılmaz
+            only = "AND ticker IN (SELECT value FROM json_each(?)) "
+            params.append(json.dumps(list(tickers)))
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.db.execute(
+                "SELECT ticker FROM jobs WHERE stage=? AND attempts < ? AND "
+                "(status='pending' OR (status='leased' AND lease_until < ?)) " + only +
+                "ORDER BY attempts, ticker LIMIT ?", (*params, n)).fetchall()
+            out = [r[0] for r in rows]
+            for t in out:
+                self.db.execute("UPDATE jobs SET status='leased', attempts=attempts+1, lease_owner=?, "
+                                "lease_until=?, updated_at=? WHERE stage=? AND ticker=?",
+                                (self.worker, now + self.lease_sec, now, self.stage, t))
+            # kirası dolmuş ve deneme hakkı bitmiş işler
+            self.db.execute("UPDATE jobs SET status='failed', last_error=COALESCE(last_error, 'lease expired'), "
+                            "updated_at=? WHERE stage=? AND status='leased' AND lease_until < ? AND attempts >= ?",
+                            (now, self.stage, now, self.max_attempts))
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return out
+
+    def _finish(self, ticker: str, status: str, duration: float, error: Optional[str]):
+        self.db.execute("UPDATE jobs SET status=?, duration=?, last_error=?, lease_owner=NULL, lease_until=NULL, "
+                        "updated_at=? WHERE stage=? AND ticker=? AND lease_owner=?",
+                        (status, duration, error, time.time(), self.stage, ticker, self.worker))
+
+    def done(self, ticker: str, duration: float):
+        self._finish(ticker, "done", duration, None)
+
+    def fail(self, ticker: str, error: str, duration: float):
+        att = self.db.execute("SELECT attempts FROM jobs WHERE stage=? AND ticker=?",
+                              (self.stage, ticker)).fetchone()
+        retry = att is not None and att[0] < self.max_attempts
+        self._finish(ticker, "pending" if retry else "failed", duration, error[:2000])
+
+    def release(self, ticker: str):
+        """Kirayı bırak (deneme sayılmaz): ör. kullanıcı iptali."""
+        self.db.execute("UPDATE jobs SET status='pending', attempts=MAX(attempts-1, 0), lease_owner=NULL, "
+                        "lease_until=NULL, updated_at=? WHERE stage=? AND ticker=? AND lease_owner=?",
+                        (time.time(), self.stage, ticker, self.worker))
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.db.execute("SELECT status, COUNT(*) FROM jobs WHERE stage=? GROUP BY status",
+                               (self.stage,)).fetchall()
+        return dict(rows)
+
+def work(q: JobQueue, fn: Callable[[str], None], batch: int = 1, pause: float = 0.0,
+         defer: bool = False, tickers: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Kuyruk boşalana kadar iş kiralayıp fn(ticker) çalıştırır.
+    tickers: yalnızca bu tickerların işleri (None = aşamadaki tüm bekleyenler).
+    defer=True: başarılı işler 'done' işaretlenmez, kirada kalır ve stats["deferred"]
+    [(ticker, süre)] olarak döner; çağıran kalıcı yazımdan (ör. transaction commit)
+    sonra q.done, hata olursa q.fail ile kapatır. Süreç arada ölürse kira dolunca
+    iş yeniden kiralanır."""
+    stats: Dict[str, Any] = {"done": 0, "failed": 0, "deferred": []}
+    only = list(tickers) if tickers is not None else None
+    while True:
+        leased = q.lease(batch, only)
+        if not leased:
+            break
+        for i, t in enumerate(leased):
+            t0 = time.perf_counter()
+            try:
+                fn(t)
+            except KeyboardInterrupt:
+                for rest in leased[i:]:
+                    q.release(rest)
+                raise
+            except Exception as e:
+                dt, result = time.perf_counter() - t0, "failed"
+                q.fail(t, f"{type(e).__name__}: {e}", dt)
+                stats["failed"] += 1
+                print(f"✗ {t}: {e}")
+            else:
+                dt, result = time.perf_counter() - t0, "done"
+                if defer:
+                    stats["deferred"].append((t, dt))
+                else:
+                    q.done(t, dt)
+                stats["done"] += 1
+            metrics.ticker_time(t, dt)
+            metrics.observe("ticker_seconds", dt, queue=q.stage, result=result)
+            metrics.inc("tickers", queue=q.stage, result=result)
+            if pause:
+                time.sleep(pause)
+    return stats
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["status", "retry", "reset", "errors"])
+    ap.add_argument("stage", nargs="?")
+    ap.add_argument("--db", default=JOBS_DB)
+    args = ap.parse_args()
+    if not os.path.isfile(args.db):
+        print(f"Kuyruk yok: {args.db}"); return
+    db = sqlite3.connect(args.db, timeout=30)
+    where, params = ("WHERE stage=?", (args.stage,)) if args.stage else ("", ())
+    if args.cmd == "status":
+        rows = db.execute(f"SELECT stage, status, COUNT(*), ROUND(AVG(duration), 2), MAX(attempts) FROM jobs {where} "
+                          "GROUP BY stage, status ORDER BY stage, status", params).fetchall()
+        print(f"{'stage':12s} {'status':8s} {'n':>6s} {'avg s':>7s} {'max att':>7s}")
+        for st, status, n, avg, att in rows:
+            print(f"{st:12s} {status:8s} {n:6d} {avg if avg is not None else '-':>7} {att:7d}")
+    elif args.cmd == "errors":
+        for st, t, att, err in db.execute(f"SELECT stage, ticker, attempts, last_error FROM jobs {where} "
+                                          f"{'AND' if where else 'WHERE'} last_error IS NOT NULL ORDER BY stage, ticker",
+                                          params):
+            print(f"{st}/{t} (deneme {att}): {err}")
+    else:
+        if not args.stage:
+            print("STAGE gerekli", file=sys.stderr); sys.exit(1)
+        if args.cmd == "retry":
+            n = db.execute("UPDATE jobs SET status='pending', attempts=0 WHERE stage=? AND status='failed'",
+                           (args.stage,)).rowcount
+        else:
+            n = db.execute("DELETE FROM jobs WHERE stage=?", (args.stage,)).rowcount
+        db.commit()
+        print(f"✓ {args.stage}: {n} kayıt ({args.cmd})")
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,11 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+import kap_types
+import metrics
+from jobqueue import JobQueue, work
+from kap_types import tr_upper
+
 PAGELOAD_TIMEOUT = 25
 WAIT_SEC = 15
 OUTPUT_DIR = "kap_json"
@@ -59,12 +64,6 @@ def textify(el) -> str:
     except Exception:
         return ""
 
-def tr_upper(s: Optional[str]) -> Optional[str]:
-    """Türkçe uyumlu büyük harf (i→İ, ı→I, vb.)."""
-    if s is None: return None
-    s = s.replace("i", "İ").replace("ı", "I")
-    return s.upper()
-
 def make_headers_unique(headers: List[str]) -> List[str]:
     seen, out = {}, []
     for h in headers:
@@ -119,10 +118,19 @@ def make_driver() -> webdriver.Chrome:
         })
     except Exception:
         pass
+
+    # sayfa yüklemelerini ölç (metrics: api_calls / api_seconds, api=kap_page)
+    _get = driver.get
+    def get(url):
+        metrics.inc("api_calls", api="kap_page")
+        with metrics.timer("api_seconds", api="kap_page"):
+            return _get(url)
+    driver.get = get
     return driver
 
 # ---------- navigasyon ----------
-def open_company_from_ticker(driver, wait, ticker: str) -> Optional[str]:
+def open_company_from_ticker(driver, wait, ticker: str) -> Tuple[Optional[str], Optional[str]]:
+    """(şirket sayfası linki, ünvan); ünvan liste satırının 2. hücresinden."""
     driver.get("https://www.kap.org.tr/tr/bist-sirketler")
     # çerez
     try:
@@ -164,15 +172,22 @@ def open_company_from_ticker(driver, wait, ticker: str) -> Optional[str]:
         except Exception:
             return False
 
+    def row_title(r) -> Optional[str]:
+        try:
+            return textify(r.find_element(By.XPATH, ".//td[2]")) or None
+        except Exception:
+            return None
+
     for r in rows:
         if row_has_ticker(r):
             try:
                 a = r.find_element(By.XPATH, ".//td[1]//a")
                 href = a.get_attribute("href")
+                title = row_title(r)
                 if href:
-                    return href
+                    return href, title
                 safe_click(driver, a)
-                return driver.current_url
+                return driver.current_url, title
             except Exception:
                 continue
 
@@ -183,10 +198,10 @@ def open_company_from_ticker(driver, wait, ticker: str) -> Optional[str]:
                 a = r.find_element(By.XPATH, ".//td[1]//a")
                 href = a.get_attribute("href")
                 if href:
-                    return href
+                    return href, row_title(r)
             except Exception:
                 continue
-    return None
+    return None, None
 
 def goto_tab(driver, wait, tab_id: str, hint: str):
     try:
@@ -539,6 +554,7 @@ def save_json(ticker: str, data: Dict[str, Any]):
         json.dump(data, f, ensure_ascii=False, indent=2)
 
     os.replace(tmp_path, out_path)
+    metrics.bytes_written(out_path)
     print(f"✓ {ticker}: {out_path}")
 
 # ---------- tek şirketi aynı düzenle işle ----------
@@ -547,14 +563,14 @@ def process_one_ticker(driver, wait, ticker: str):
     TICKER = ticker  # fiili dolaşım tablosu için
 
     print(f"\n[{ticker}] [1/7] link bulunuyor...")
-    link = open_company_from_ticker(driver, wait, ticker)
+    link, unvan = open_company_from_ticker(driver, wait, ticker)
     if not link:
         raise RuntimeError(f"{ticker}: şirket sayfası bulunamadı.")
     print("   →", link)
 
     print(f"[{ticker}] [2/7] Özet...")
     driver.get(link)
-    summary = extract_summary(driver)
+    summary = {"unvan": unvan, **extract_summary(driver)}
 
     print(f"[{ticker}] [3/7] Genel...")
     goto_tab(driver, wait, "general-tab", "/sirket-bilgileri/genel/")
@@ -593,6 +609,12 @@ def process_one_ticker(driver, wait, ticker: str):
         "oy_haklari": oy_haklari,
         "katilim_4_7": katilim,
     }
+    # importer'ın (merge_kap_bilanco) okuyamayacağı sayı / tarih hücreleri şimdiden görünsün
+    problems = kap_types.parse(data, ticker).problems
+    if problems:
+        print(f"⚠ {ticker}: {len(problems)} hücre sayı/tarih olarak okunamadı: "
+              + ", ".join(f"{f}={v!r}" for f, v in problems[:5]))
+        metrics.inc("kap_unparsed_cells", len(problems))
     save_json(ticker, data)
 
 # ---------- main ----------
@@ -600,6 +622,9 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-f", "--file", help="Ticker dosyası yolu (varsayılan public/tickers.txt)", default=DEFAULT_TICKER_FILE)
     parser.add_argument("-t", "--tickers", help="Virgülle ayrılmış semboller (dosyayı bypass eder). Örn: -t ARCLK,ASELS")
+    parser.add_argument("--run-key", default=time.strftime("%Y-%m-%d", time.gmtime()),
+                        help="Aynı anahtarla tekrar çalıştırma kaldığı yerden devam eder (varsayılan: bugünün tarihi, UTC)")
+    parser.add_argument("--fresh", action="store_true", help="Tamamlananlar dahil hepsini yeniden çek")
     args = parser.parse_args()
 
     ensure_dir(OUTPUT_DIR)
@@ -613,23 +638,29 @@ def main():
         print("⚠ Hiç sembol bulunamadı. -t ile ver veya ticker dosyasını yerleştir.")
         return
 
+    # İş kuyruğu: aynı run-key ile yeniden çalıştırma tamamlananları atlar; birden çok
+    # süreç aynı kuyruğu paylaşabilir (her biri kendi tarayıcısıyla).
+    queue = JobQueue("kap")
+    todo = queue.enqueue(tickers, {t: args.run_key for t in tickers}, fresh=args.fresh)
+    print(f"\nToplam {len(tickers)} sembol bulundu, {todo} tanesi kuyrukta.\n")
+    if not todo:
+        return
+
     driver = make_driver()
     wait = WebDriverWait(driver, WAIT_SEC)
 
+    def one(t):
+        print(f"\n=== {t} işleniyor ===")
+        process_one_ticker(driver, wait, t)
+
     try:
-        print(f"\nToplam {len(tickers)} sembol bulundu.\n")
-        for i, t in enumerate(tickers, 1):
-            try:
-                print(f"\n=== ({i}/{len(tickers)}) {t} işleniyor ===")
-                process_one_ticker(driver, wait, t)
-            except KeyboardInterrupt:
-                print("\n↩ Kullanıcı iptal etti.")
-                break
-            except Exception as e:
-                print(f"✗ {t}: {e}")
-            time.sleep(0.2)
+        stats = work(queue, one, pause=0.2, tickers=tickers)
+        print(f"\n✓ {stats['done']} tamam, {stats['failed']} hata; kuyruk: {queue.counts()}")
+    except KeyboardInterrupt:
+        print("\n↩ Kullanıcı iptal etti.")
     finally:
         driver.quit()
+        queue.close()
         print("\nBitti.")
 
 if __name__ == "__main__":
@@ -0,0 +1,358 @@
+# scripts/kap_types.py
+# -*- coding: utf-8 -*-
+"""
+KAP değerlerinin normalizasyonu: Türkçe biçimli sayı / tarih / evet-hayır hücreleri ve
+kap_json dokümanının tek geçişte tipli kayıtlara dönüşümü.
+
+Dönüştürücüler (merge_kap_bilanco bunları yeniden dışa verir; eski davranışla birebir):
+  turkish_to_number("279.928.625,03") -> 279928625.03   ("1.000" -> 1000, "%41,43" -> None)
+  parse_date_ddmmyyyy("21/01/1986")  -> "1986-01-21"    (başka biçimler: dateutil, varsa)
+  tr_upper("Şişecam")                -> "ŞİŞECAM"
+  norm(" Şişecam  A.Ş.")             -> "ŞİŞECAM A.Ş."     (görüntü / gruplama anahtarı)
+  fold("Şişecam A.Ş.")               -> "SISECAM A S"      (arama / eşleştirme anahtarı)
+  yes_no("Evet") -> True, yes_no(None) -> None
+  executive("İcrada Görevli") -> True, executive("İcrada Görevli Değil") -> False
+  - Sayı / tarih hücreleri doğrudan float / int / split ile çözülür (regex yok);
+    tutmayanlar eski (replace + try/except) yoldan geçer.
+  - Aynı literaller ("Evet", "100,00", yinelenen tarihler) şirketler arasında tekrar
+    ettiği için sonuçlar sınırlı LRU önbellekte tutulur (CACHE_SIZE; cache_info()).
+
+Kayıtlar: Company, BoardMember, Holder, Subsidiary (tuple tabanlı, __slots__ = (); alanlar
+salt okunur özellik) ve KapRecord. Alan eşlemeleri (SPEC) sınıf tanımında bir kez anahtar
+listesine ve yalnızca dönüştürülen alanların tablosuna çözülür; from_raw / row bunların
+üzerinden döner. Dolu metin hücreleri doğrudan önbellekli çözücüye gider; hücre fonksiyonu
+yalnızca boş / metin olmayan değerlerde çağrılır.
+  rec = parse(kap, "ARCLK")
+  rec.board[0].first_elected; rec.company.shares_outstanding
+  rec.rows()      -> {tablo: satırlar}  (companies, kap_board_members, kap_ownership,
+                                          kap_subsidiaries, kap_vote_rights, kap_katilim_4_7)
+  rec.problems    -> [(alan, ham değer)]  sayı / tarih olarak okunamayan dolu hücreler
+Kullananlar: merge_kap_bilanco.db_rows (importer) ve kap_batch_from_tickerfile (scraper:
+kaydetmeden önce okunamayan hücreleri uyarır).
+
+Kullanım:
+  python3 scripts/kap_types.py ARCLK            # kap_json/ARCLK.json -> tipli kayıt (JSON)
+  python3 scripts/kap_types.py --check          # tüm kap_json: okunamayan hücreler
+  python3 scripts/bench.py --cases kap_norm     # eski hücre başına dönüşüme karşı mikro-benchmark
+"""
+
+import os, re, sys, json, argparse, unicodedata
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from dateutil import parser as dtparser
+except Exception:
+    dtparser = None
+
+CACHE_SIZE = int(os.environ.get("KAP_NORM_CACHE", "65536"))
+
+_WS = re.compile(r"\s+")
+
+# ---------- dönüştürücüler ----------
+def _slow_number(s: str):
+    s = s.replace(".", "").replace("\u00A0", " ")
+    s = s.replace(",", ".")
+    s = _WS.sub("", s)
+    try:
+        if "." in s:
+            return float(s)
+        return int(s)
+    except Exception:
+        try:
+            return float(s)
+        except Exception:
+            return None
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _number(s: str):
+    # int() / float() baş-son boşluğu zaten yok sayar; iç boşluk, % vb. yavaş yola düşer
+    t = s.replace(".", "").replace(",", ".")
+    try:
+        return float(t) if "." in t else int(t)
+    except ValueError:
+        return _slow_number(s) if s.strip() else None
+
+def turkish_to_number(s):
+    if s is None:
+        return None
+    if isinstance(s, (int, float)):
+        return s
+    return _number(s if isinstance(s, str) else str(s))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _date(s: str) -> Optional[str]:
+    try:
+        d, mo, y = s.split("/")
+        return f"{int(y):04d}-{int(mo):02d}-{int(d):02d}"
+    except Exception:
+        if dtparser:
+            try:
+                return dtparser.parse(s.strip()).date().isoformat()
+            except Exception:
+                return None
+        return None
+
+def parse_date_ddmmyyyy(s):
+    if not s:
+        return None
+    return _date(s if isinstance(s, str) else str(s))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _upper(s: str) -> str:
+    return s.replace("i", "İ").replace("ı", "I").upper()
+
+def tr_upper(s: Optional[str]) -> Optional[str]:
+    """Türkçe uyumlu büyük harf (i→İ, ı→I, vb.)."""
+    if s is None: return None
+    return _upper(s)
+
+def norm(s: Optional[str]) -> str:
+    return _WS.sub(" ", tr_upper(s or "") or "").strip()
+
+def fold(s: Optional[str]) -> str:
+    """Arama / eşleştirme anahtarı: Türkçe büyük harf, aksan ve noktalar atılır,
+    harf-rakam dışı her şey tek boşluk ('Şişecam A.Ş.' -> 'SISECAM A S')."""
+    s = "".join(ch for ch in unicodedata.normalize("NFKD", tr_upper(s or "") or "")
+                if not unicodedata.combining(ch))
+    return re.sub(r"[\W_]+", " ", s).strip()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _yes(s: str) -> bool:
+    return s.strip().lower() == "evet"
+
+def yes_no(s) -> Optional[bool]:
+    """'Evet' -> True, başka her şey -> False, None -> None."""
+    if s is None:
+        return None
+    return _yes(s if isinstance(s, str) else str(s))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _executive(s: str) -> bool:
+    return fold(s) == "ICRADA GOREVLI"   # "İcrada Görevli Değil" değil
+
+def executive(s) -> Optional[bool]:
+    """YK üyesinin 'İcrada Görevli Olup Olmadığı' hücresi: 'İcrada Görevli' -> True."""
+    if s is None:
+        return None
+    return _executive(s if isinstance(s, str) else str(s))
+
+_CACHED = (_number, _date, _upper, _yes, _executive)
+
+def cache_info() -> Dict[str, Any]:
+    return {f.__name__.lstrip("_"): f.cache_info()._asdict() for f in _CACHED}
+
+def cache_clear():
+    for f in _CACHED:
+        f.cache_clear()
+
+# ---------- kayıtlar ----------
+NUM, DATE, YES, YES_FILLED, EXECUTIVE = "num", "date", "yes", "yes_filled", "executive"
+
+def _num_cell(v: Any, field: str, problems: List[Tuple[str, Any]]) -> Any:
+    if v.__class__ is not str:
+        return turkish_to_number(v)
+    out = _number(v)
+    if out is None and v.strip() not in ("", "-"):
+        problems.append((field, v))
+    return out
+
+def _date_cell(v: Any, field: str, problems: List[Tuple[str, Any]]) -> Optional[str]:
+    if not v:
+        return None
+    out = _date(v if v.__class__ is str else str(v))
+    if out is None and isinstance(v, str) and v.strip() != "-":
+        problems.append((field, v))
+    return out
+
+def _yes_cell(v: Any, field: str, problems: List[Tuple[str, Any]]) -> bool:
+    return _yes(v if v.__class__ is str else str(v))
+
+def _yes_filled(v: Any, field: str, problems: List[Tuple[str, Any]]) -> Optional[bool]:
+    return yes_no(v or None)
+
+def _executive_cell(v: Any, field: str, problems: List[Tuple[str, Any]]) -> bool:
+    return _executive(v if v.__class__ is str else str(v))
+
+# dönüştürücü türü -> (dolu metin için önbellekli çözücü, sorun sayılmayan ham değerler
+# (None: hiç sorun yazılmaz), diğer değerler için hücre fonksiyonu). Boş (None) hücre her
+# türde None kalır; from_raw dönüştürücüyü çağırmaz.
+_CONVERT = {
+    NUM: (_number, ("", "-"), _num_cell),
+    DATE: (_date, ("-",), _date_cell),
+    YES: (_yes, None, _yes_cell),
+    YES_FILLED: (_yes, None, _yes_filled),
+    EXECUTIVE: (_executive, None, _executive_cell),
+}
+
+class _Record(tuple):
+    """Değerleri alan sırasıyla tutan değişmez kayıt (namedtuple gibi); alanlar özellik."""
+    __slots__ = ()
+    SPEC: List[Tuple[str, str, Optional[str]]] = []   # (alan, kaynak anahtar, dönüştürücü)
+    FIELDS: Tuple[str, ...] = ()                       # alan adları (SPEC varsa ondan)
+    _KEYS: Tuple[str, ...] = ()                        # SPEC sırasıyla kaynak anahtarlar
+    _CONV: Tuple[Tuple[int, str, Any, Any, Any], ...] = ()  # yalnızca dönüştürülen alanlar
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        if cls.SPEC:
+            cls.FIELDS = tuple(attr for attr, _, _ in cls.SPEC)
+        cls._KEYS = tuple(key for _, key, _ in cls.SPEC)
+        cls._CONV = tuple((i, attr, *_CONVERT[kind]) for i, (attr, _, kind) in enumerate(cls.SPEC)
+                          if kind is not None)
+        for i, attr in enumerate(cls.FIELDS):
+            setattr(cls, attr, property(itemgetter(i)))
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], problems: List[Tuple[str, Any]]):
+        """Ham KAP satırı -> kayıt; okunamayan dolu hücreler problems'e eklenir."""
+        get = raw.get
+        vals = [get(key) for key in cls._KEYS]
+        for i, attr, fast, quiet, cell in cls._CONV:
+            v = vals[i]
+            if v is None:
+                continue
+            if v.__class__ is str and v:
+                out = vals[i] = fast(v)
+                if out is None and quiet is not None and v.strip() not in quiet:
+                    problems.append((attr, v))
+            else:
+                vals[i] = cell(v, attr, problems)
+        return tuple.__new__(cls, vals)
+
+    def row(self, ticker: str) -> Dict[str, Any]:
+        out = {"ticker": ticker}
+        out.update(zip(self.FIELDS, self))
+        return out
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.FIELDS, self))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{a}={v!r}' for a, v in zip(self.FIELDS, self))})"
+
+class BoardMember(_Record):
+    SPEC = [
+        ("name", "Adı-Soyadı", None),
+        ("gender", "Cinsiyeti", None),
+        ("role", "Görevi", None),
+        ("profession", "Mesleği", None),
+        ("first_elected", "Yönetim Kuruluna İlk Seçilme Tarihi", DATE),
+        ("is_executive", "İcrada Görevli Olup Olmadığı", EXECUTIVE),
+        ("duties_last5y", "Son 5 Yılda Ortaklıkta Üstlendiği Görevler", None),
+        ("outside_roles", "Son Durum itibariyle Ortaklık Dışında Aldığı Görevler", None),
+        ("has_fin_exp", "Denetim, Muhasebe ve/veya Finans Alanında En Az 5 Yıllık Deneyime Sahip Olup Olmadığı", YES_FILLED),
+        ("equity_pct", "Sermayedeki Payı (%)", NUM),
+        ("represented_share_group", "Temsil Ettiği Pay Grubu", None),
+    ]
+    __slots__ = ()
+
+class Holder(_Record):
+    SPEC = [
+        ("holder", "Ortağın Adı-Soyadı/Ticaret Ünvanı", None),
+        ("paid_in_tl", "Sermayedeki Payı(TL)", NUM),
+        ("pct", "Sermayedeki Payı(%)", NUM),
+        ("voting_pct", "Oy Hakkı Oranı(%)", NUM),
+    ]
+    __slots__ = ()
+
+class Subsidiary(_Record):
+    SPEC = [
+        ("company", "Ticaret Ünvanı", None),
+        ("activity", "Şirketin Faaliyet Konusu", None),
+        ("paid_in_capital", "Ödenmiş/Çıkarılmış Sermayesi", NUM),
+        ("share_amount", "Şirketin Sermayedeki Payı", NUM),
+        ("currency", "Para Birimi", None),
+        ("share_pct", "Şirketin Sermayedeki Payı(%)", NUM),
+        ("relation", "Şirket ile Olan İlişkinin Niteliği", None),
+    ]
+    __slots__ = ()
+
+class Company(_Record):
+    __slots__ = ()
+    FIELDS = ("website", "sector_main", "sector_sub", "market", "indices", "address", "listing_date",
+              "free_float_ratio", "free_float_mcap", "shares_outstanding")
+
+class KapRecord:
+    __slots__ = ("ticker", "company", "board", "holders", "subsidiaries", "vote_rights", "katilim", "problems")
+
+    def rows(self) -> Dict[str, List[Dict[str, Any]]]:
+        """merge_kap_bilanco.db_rows'un KAP tabloları."""
+        t = self.ticker
+        out = {
+            "companies": [self.company.row(t)],
+            "kap_board_members": [m.row(t) for m in self.board],
+            "kap_ownership": [h.row(t) for h in self.holders],
+            "kap_subsidiaries": [s.row(t) for s in self.subsidiaries],
+            "kap_vote_rights": [{"ticker": t, "field": f, "value": v} for f, v in self.vote_rights],
+        }
+        if self.katilim is not None:
+            out["kap_katilim_4_7"] = [{"ticker": t, **self.katilim}]
+        return out
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"ticker": self.ticker, "company": self.company.as_dict(),
+                "board": [m.as_dict() for m in self.board], "holders": [h.as_dict() for h in self.holders],
+                "subsidiaries": [s.as_dict() for s in self.subsidiaries],
+                "vote_rights": self.vote_rights, "katilim": self.katilim, "problems": self.problems}
+
+def parse(kap: Optional[Dict[str, Any]], ticker: Optional[str] = None) -> KapRecord:
+    """kap_json dokümanı -> KapRecord (tek geçiş)."""
+    kap = kap or {}
+    summary = kap.get("summary") or {}
+    general = kap.get("general") or {}
+    ownership = kap.get("ownership") or {}
+    problems: List[Tuple[str, Any]] = []
+
+    rec = KapRecord()
+    rec.ticker = ticker or kap.get("ticker")
+    rec.problems = problems
+    rec.holders = [Holder.from_raw(o, problems) for o in ownership.get("sermaye_5ustu") or []]
+    rec.board = [BoardMember.from_raw(m, problems) for m in kap.get("board_members") or []]
+    rec.subsidiaries = [Subsidiary.from_raw(s, problems) for s in ownership.get("bagli_ortakliklar") or []]
+    rec.vote_rights = [(p.get("alan"), p.get("deger")) for p in (kap.get("oy_haklari") or {}).get("pairs") or []]
+    k47 = kap.get("katilim_4_7")
+    rec.katilim = {k: (turkish_to_number(v) if isinstance(v, str) else v) for k, v in k47.items()} if k47 else None
+
+    shares = None
+    for raw, h in zip(ownership.get("sermaye_5ustu") or [], rec.holders):
+        if str(raw.get("Ortağın Adı-Soyadı/Ticaret Ünvanı", "")).strip().upper() == "TOPLAM":
+            shares = h.paid_in_tl
+            break
+    rec.company = tuple.__new__(Company, (
+        summary.get("internet_adresi"),
+        summary.get("sektor_ana"),
+        summary.get("sektor_alt"),
+        summary.get("islem_gordugu_pazar"),
+        summary.get("dahil_oldugu_endeksler") or [],
+        general.get("merkez_adresi"),
+        _date_cell(general.get("kotasyon_tarihi"), "listing_date", problems),
+        _num_cell(ownership.get("fiili_dolasim_oran"), "free_float_ratio", problems),
+        _num_cell(ownership.get("fiili_dolasim_tutar_tl"), "free_float_mcap", problems),
+        shares,
+    ))
+    return rec
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--dir", default="kap_json")
+    ap.add_argument("--check", action="store_true", help="okunamayan sayı / tarih hücrelerini listele")
+    a = ap.parse_args()
+    names = [f"{t.upper()}.json" for t in a.tickers] or sorted(n for n in os.listdir(a.dir) if n.endswith(".json"))
+    bad = 0
+    for name in names:
+        with open(os.path.join(a.dir, name), "r", encoding="utf-8") as f:
+            rec = parse(json.load(f), name[:-5])
+        if a.check:
+            for field, raw in rec.problems:
+                print(f"⚠ {rec.ticker}: {field} = {raw!r}")
+            bad += len(rec.problems)
+        else:
+            print(json.dumps(rec.as_dict(), ensure_ascii=False, indent=2))
+    if a.check:
+        print(f"{'✓' if not bad else '⚠'} {len(names)} doküman, {bad} okunamayan hücre", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
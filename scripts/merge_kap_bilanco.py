@@ -7,19 +7,26 @@ Tek dosya:
 Kullanım:
   python3 scripts/merge_kap_bilanco.py          # tickers.txt'den okur
   python3 scripts/merge_kap_bilanco.py TUPRS    # komut satırından tek/çok sembol
+  python3 scripts/merge_kap_bilanco.py --no-db        # sadece final/*.json
+  python3 scripts/merge_kap_bilanco.py --import-only  # final/*.json -> Supabase
+  python3 scripts/merge_kap_bilanco.py --pg           # Supabase yerine Postgres COPY (scripts/pg_bulk.py)
+  python3 scripts/merge_kap_bilanco.py --import-only --changes db_import   # yalnız değişenler
+Her birleştirme çalıştırması changes/<run_id>.json değişiklik akışı yazar (scripts/changefeed.py).
 Gereken ENV (DB yazmak için):
-  SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+  SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY  (--pg: PG_DSN)
 Bağımlılıklar:
   pip install "supabase==2.*" python-dateutil
 """
 
-import os, sys, json, re, hashlib
+import os, sys, json, hashlib, argparse
 from typing import List, Dict, Any, Optional
 
-try:
-    from dateutil import parser as dtparser
-except Exception:
-    dtparser = None
+import metrics
+from bilanco_stream import BilancoStream, open_values
+from jobqueue import JobQueue, files_hash, work
+import kap_types
+# Türkçe biçimli hücre dönüştürücüleri kap_types'ta (derlenmiş + önbellekli); buradan da dışa verilir.
+from kap_types import parse_date_ddmmyyyy, turkish_to_number
 
 # ---------- KLASÖRLER ----------
 KAP_DIR     = "kap_json"
@@ -42,7 +49,7 @@ def supabase_client_or_none():
         return None
     try:
         from supabase import create_client
-        return create_client(SUPABASE_URL, SUPABASE_KEY)
+        return metrics.wrap_supabase(create_client(SUPABASE_URL, SUPABASE_KEY))
     except Exception as e:
         print(f"⚠ Supabase client yüklenemedi: {e}")
         return None
@@ -69,47 +76,48 @@ def load_json_safe(path) -> Optional[Dict[str, Any]]:
         print(f"⚠ JSON okunamadı: {path} -> {e}")
         return None
 
+def write_final_stream(path, ticker: str, kap_doc: Optional[Dict[str, Any]], bil_path: str,
+                       on_value=None) -> bool:
+    """final/<T>.json'u bilanco dokümanını belleğe almadan yazar: bilanco_json metni
+    girintilenerek kopyalanır (json.dump(indent=2) çıktısıyla aynı yerleşim).
+    Bozuk/eksik bilanco -> null (load_json_safe davranışı). on_value(code, period, value)
+    doğrulama geçişinde her değer için çağrılır (değişiklik akışı). Bilanco yazıldıysa True."""
+    bil_ok = os.path.isfile(bil_path)
+    if bil_ok:
+        try:
+            for code, pk, v in BilancoStream(bil_path):   # doğrulama (sabit bellek)
+                if on_value is not None:
+                    on_value(code, pk, v)
+        except Exception as e:
+            print(f"⚠ JSON okunamadı: {bil_path} -> {e}")
+            bil_ok = False
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('{\n  "ticker": ' + json.dumps(ticker, ensure_ascii=False) + ',\n  "kap": ')
+        f.write(json.dumps(kap_doc, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        f.write(',\n  "bilanco": ')
+        if bil_ok:
+            with open(bil_path, "r", encoding="utf-8") as src:
+                first = True
+                for line in src:
+                    line = line.rstrip("\r\n")
+                    if not line.strip():
+                        continue
+                    f.write(line if first else "\n  " + line)
+                    first = False
+        else:
+            f.write("null")
+        f.write("\n}")
+    os.replace(tmp, path)
+    metrics.bytes_written(path)
+    return bil_ok
+
 def atomic_write_json(path, obj):
     tmp = path + ".tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
     os.replace(tmp, path)
-
-def turkish_to_number(s):
-    if s is None:
-        return None
-    if isinstance(s, (int, float)):
-        return s
-    s = str(s).strip()
-    if not s:
-        return None
-    s = s.replace(".", "").replace("\u00A0"," ")
-    s = s.replace(",", ".")
-    s = re.sub(r"\s+", "", s)
-    try:
-        if "." in s:
-            return float(s)
-        return int(s)
-    except Exception:
-        try:
-            return float(s)
-        except Exception:
-            return None
-
-def parse_date_ddmmyyyy(s):
-    if not s:
-        return None
-    s = str(s).strip()
-    try:
-        d, m, y = s.split("/")
-        return f"{int(y):04d}-{int(m):02d}-{int(d):02d}"
-    except Exception:
-        if dtparser:
-            try:
-                return dtparser.parse(s).date().isoformat()
-            except Exception:
-                return None
-        return None
+    metrics.bytes_written(path)
 
 def period_to_date(period_key: str) -> str:
     # '2025/6' -> '2025-06-30'
@@ -123,12 +131,39 @@ def upsert(sb, table: str, rows: List[Dict[str, Any]], on_conflict: str):
     if sb is None or not rows:
         return
     sb.table(table).upsert(rows, on_conflict=on_conflict).execute()
+    metrics.inc("db_rows", len(rows), table=table)
+
+# Yazım sırası ve çakışma anahtarları. REPLACE_TABLES: ticker'ın eski satırları
+# silinip yenileri yazılır (yeni satır yoksa eskiler korunur).
+DB_TABLES = [
+    ("raw_company_json",  "ticker"),
+    ("companies",         "ticker"),
+    ("kap_board_members", "ticker,name"),
+    ("kap_ownership",     "ticker,holder"),
+    ("kap_subsidiaries",  "ticker,company"),
+    ("kap_vote_rights",   "ticker,field"),
+    ("kap_katilim_4_7",   "ticker"),
+    ("financial_labels",  "code"),
+    ("financials",        "ticker,period,freq,statement"),
+]
+REPLACE_TABLES = {"kap_board_members", "kap_ownership", "kap_subsidiaries", "kap_vote_rights"}
 
 def import_merged_to_db(sb, merged: Dict[str, Any]):
     """final/<T>.json yapısındaki objeyi Supabase'e yazar."""
     if sb is None:
         return
+    ticker = merged.get("ticker")
+    rows = db_rows(merged)
+    for table, on_conflict in DB_TABLES:
+        if not rows.get(table):
+            continue
+        if table in REPLACE_TABLES:
+            sb.table(table).delete().eq("ticker", ticker).execute()
+        upsert(sb, table, rows[table], on_conflict=on_conflict)
 
+def db_rows(merged: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """final/<T>.json -> {tablo: satırlar} (DB_TABLES tabloları; DB bağımsız)."""
+    out: Dict[str, List[Dict[str, Any]]] = {}
     ticker = merged.get("ticker")
     kap    = merged.get("kap") or {}
     bil    = merged.get("bilanco") or {}
@@ -137,189 +172,192 @@ def import_merged_to_db(sb, merged: Dict[str, Any]):
     payload = {"ticker": ticker, "kap": kap, "bilanco": bil}
     jhash = hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
     fetched_at = (bil.get("meta") or {}).get("fetchedAt")
-    upsert(sb, "raw_company_json", [{
+    out["raw_company_json"] = [{
         "ticker": ticker,
         "source": "kap",
         "payload": payload,
         "fetched_at": fetched_at,
         "json_hash": jhash,
-    }], on_conflict="ticker")
-
-    # 2) companies (özet)
-    summary   = (kap.get("summary") or {})
-    general   = (kap.get("general") or {})
-    ownership = (kap.get("ownership") or {})
-
-    indices           = summary.get("dahil_oldugu_endeksler") or []
-    free_float_ratio  = turkish_to_number(ownership.get("fiili_dolasim_oran"))
-    free_float_mcap   = turkish_to_number(ownership.get("fiili_dolasim_tutar_tl"))
-    website           = summary.get("internet_adresi")
-    market            = summary.get("islem_gordugu_pazar")
-    sector_main       = summary.get("sektor_ana")
-    sector_sub        = summary.get("sektor_alt")
-    address           = general.get("merkez_adresi")
-    listing_date      = parse_date_ddmmyyyy(general.get("kotasyon_tarihi"))
-
-    shares_outstanding = None
-    for row in (ownership.get("sermaye_5ustu") or []):
-        if str(row.get("Ortağın Adı-Soyadı/Ticaret Ünvanı","")).strip().upper() == "TOPLAM":
-            shares_outstanding = turkish_to_number(row.get("Sermayedeki Payı(TL)"))
-            break
-
-    upsert(sb, "companies", [{
-        "ticker": ticker,
-        "website": website,
-        "sector_main": sector_main,
-        "sector_sub": sector_sub,
-        "market": market,
-        "indices": indices,
-        "address": address,
-        "listing_date": listing_date,
-        "free_float_ratio": free_float_ratio,
-        "free_float_mcap": free_float_mcap,
-        "shares_outstanding": shares_outstanding
-    }], on_conflict="ticker")
-
-    # 3) board_members
-    bm_rows = []
-    for m in kap.get("board_members", []) or []:
-        bm_rows.append({
-            "ticker": ticker,
-            "name": m.get("Adı-Soyadı"),
-            "gender": m.get("Cinsiyeti"),
-            "role": m.get("Görevi"),
-            "profession": m.get("Mesleği"),
-            "first_elected": parse_date_ddmmyyyy(m.get("Yönetim Kuruluna İlk Seçilme Tarihi")),
-            "is_executive": None if m.get("İcrada Görevli Olup Olmadığı") is None else (str(m.get("İcrada Görevli Olup Olmadığı")).strip().lower() == "evet"),
-            "duties_last5y": m.get("Son 5 Yılda Ortaklıkta Üstlendiği Görevler"),
-            "outside_roles": m.get("Son Durum itibariyle Ortaklık Dışında Aldığı Görevler"),
-            "has_fin_exp": None if not m.get("Denetim, Muhasebe ve/veya Finans Alanında En Az 5 Yıllık Deneyime Sahip Olup Olmadığı") else (str(m.get("Denetim, Muhasebe ve/veya Finans Alanında En Az 5 Yıllık Deneyime Sahip Olup Olmadığı")).strip().lower() == "evet"),
-            "equity_pct": turkish_to_number(m.get("Sermayedeki Payı (%)")),
-            "represented_share_group": m.get("Temsil Ettiği Pay Grubu"),
-        })
-    if bm_rows:
-        sb.table("kap_board_members").delete().eq("ticker", ticker).execute()
-        upsert(sb, "kap_board_members", bm_rows, on_conflict="ticker,name")
-
-    # 4) ownership (>=5%)
-    own_rows = []
-    for o in ownership.get("sermaye_5ustu") or []:
-        own_rows.append({
-            "ticker": ticker,
-            "holder": o.get("Ortağın Adı-Soyadı/Ticaret Ünvanı"),
-            "paid_in_tl": turkish_to_number(o.get("Sermayedeki Payı(TL)")),
-            "pct": turkish_to_number(o.get("Sermayedeki Payı(%)")),
-            "voting_pct": turkish_to_number(o.get("Oy Hakkı Oranı(%)")),
-        })
-    if own_rows:
-        sb.table("kap_ownership").delete().eq("ticker", ticker).execute()
-        upsert(sb, "kap_ownership", own_rows, on_conflict="ticker,holder")
-
-    # 5) subsidiaries
-    sub_rows = []
-    for s in ownership.get("bagli_ortakliklar") or []:
-        sub_rows.append({
-            "ticker": ticker,
-            "company": s.get("Ticaret Ünvanı"),
-            "activity": s.get("Şirketin Faaliyet Konusu"),
-            "paid_in_capital": turkish_to_number(s.get("Ödenmiş/Çıkarılmış Sermayesi")),
-            "share_amount": turkish_to_number(s.get("Şirketin Sermayedeki Payı")),
-            "currency": s.get("Para Birimi"),
-            "share_pct": turkish_to_number(s.get("Şirketin Sermayedeki Payı(%)")),
-            "relation": s.get("Şirket ile Olan İlişkinin Niteliği"),
-        })
-    if sub_rows:
-        sb.table("kap_subsidiaries").delete().eq("ticker", ticker).execute()
-        upsert(sb, "kap_subsidiaries", sub_rows, on_conflict="ticker,company")
-
-    # 6) vote rights
-    vr_pairs = (kap.get("oy_haklari") or {}).get("pairs") or []
-    vr_rows = [{"ticker": ticker, "field": p.get("alan"), "value": p.get("deger")} for p in vr_pairs]
-    if vr_rows:
-        sb.table("kap_vote_rights").delete().eq("ticker", ticker).execute()
-        upsert(sb, "kap_vote_rights", vr_rows, on_conflict="ticker,field")
-
-    # 7) katilim 4.7
-    k47 = kap.get("katilim_4_7")
-    if k47:
-        row = {"ticker": ticker}
-        for k, v in k47.items():
-            row[k] = turkish_to_number(v) if isinstance(v, str) else v
-        upsert(sb, "kap_katilim_4_7", [row], on_conflict="ticker")
+    }]
 
-    # 8) financials (bilanco)
-    bil_meta  = (bil.get("meta") or {})
-    currency  = bil_meta.get("currency")
-    period_keys = bil_meta.get("periodKeys") or []
-    items = bil.get("items") or {}
+    # 2-7) companies, board_members, ownership, subsidiaries, vote rights, katilim 4.7
+    out.update(kap_types.parse(kap, ticker).rows())
 
-    # labels
+    # 8) financials (bilanco)
     labels = []
-    for code, node in items.items():
+    for code, node in (bil.get("items") or {}).items():
         labels.append({
             "code": code,
             "tr": node.get("tr"),
             "en": node.get("en"),
             "statement": "bilanco",
         })
-    if labels:
-        upsert(sb, "financial_labels", labels, on_conflict="code")
-
-    # rows by period
-    fin_rows = []
-    for pk in period_keys:
-        data = {}
-        for code, node in items.items():
-            v = (node.get("values") or {}).get(pk)
-            if v is not None:
-                data[code] = v
+    out["financial_labels"] = labels
+    out["financials"] = financial_rows(ticker, bil)
+    return out
+
+def financial_rows(ticker: str, bil) -> List[Dict[str, Any]]:
+    """bilanco dokümanı (dict) ya da bilanco_json yolu -> dönem başına financials satırı.
+    (kod, dönem, değer) üçlüleri bilanco_stream ile tüketilir; yol verilirse doküman belleğe alınmaz."""
+    src = open_values(bil)
+    by_period: Dict[str, Dict[str, Any]] = {}
+    for code, pk, v in src:
+        by_period.setdefault(pk, {})[code] = v
+    meta = src.meta
+    rows = []
+    for pk in meta.get("periodKeys") or []:
+        data = by_period.get(pk)
         if not data:
             continue
-        fin_rows.append({
+        rows.append({
             "ticker": ticker,
             "period": period_to_date(pk),
             "freq": "Q",
             "statement": "bilanco",
-            "currency": currency,
+            "currency": meta.get("currency"),
             "data": data,
         })
-    if fin_rows:
-        upsert(sb, "financials", fin_rows, on_conflict="ticker,period,freq,statement")
+    return rows
+
+def import_final(sb, tickers: List[str], fresh: bool = False):
+    """final/<T>.json -> Supabase (birleştirme adımı ayrı koştuysa)."""
+    queue = JobQueue("db_import")
+    hashes = {t: files_hash([os.path.join(OUT_DIR, f"{t}.json")]) for t in tickers}
+    have = [t for t in tickers if hashes[t]]
+    todo = queue.enqueue(have, hashes, fresh=fresh)
+    print(f"→ {todo} ticker kuyrukta (db_import)")
+
+    def one(t):
+        merged = load_json_safe(os.path.join(OUT_DIR, f"{t}.json"))
+        if merged is None:
+            raise RuntimeError("final okunamadı")
+        import_merged_to_db(sb, merged)
+        print(f"✓ {t} → Supabase")
+
+    stats = work(queue, one, tickers=have)
+    print(f"Bitti. {stats['done']} tamam, {stats['failed']} hata")
+    queue.close()
+    return stats
+
+def import_final_pg(tickers: List[str]):
+    """final/<T>.json -> Postgres, tek transaction'da COPY ile (toplu yeniden yükleme)."""
+    from pg_bulk import PgBulkLoader
+    loader = PgBulkLoader()
+    for t in tickers:
+        merged = load_json_safe(os.path.join(OUT_DIR, f"{t}.json"))
+        if merged is None:
+            print(f"• {t}: final yok (atlandı).")
+            continue
+        loader.add(merged)
+    counts = loader.commit()
+    print(f"✓ Postgres: {len(loader.tickers)} ticker, " + ", ".join(f"{k}={v}" for k, v in counts.items()))
 
 def main():
+    import changefeed
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--no-db", action="store_true", help="sadece final/*.json üret, Supabase'e yazma")
+    ap.add_argument("--import-only", action="store_true", help="birleştirme yapma; mevcut final/*.json'u Supabase'e yaz")
+    ap.add_argument("--fresh", action="store_true", help="iş kuyruğunda tamamlananları da yeniden işle")
+    ap.add_argument("--pg", action="store_true", help="Supabase yerine doğrudan Postgres'e COPY ile yükle (PG_DSN)")
+    ap.add_argument("--changes", metavar="CONSUMER",
+                    help="--import-only: yalnızca değişiklik akışında (scripts/changefeed.py) değişen tickerlar")
+    args = ap.parse_args()
+
     ensure_dir(OUT_DIR)
     # semboller
-    if len(sys.argv) > 1:
-        tickers = [a.strip().upper() for a in sys.argv[1:] if a.strip()]
+    if args.tickers:
+        tickers = [a.strip().upper() for a in args.tickers if a.strip()]
         print(f"→ Ticker kaynağı: komut satırı ({len(tickers)} adet)")
     else:
         tickers = read_tickers_from_first_existing()
 
-    sb = supabase_client_or_none()
-    if sb is None:
+    feed_upto = None
+    if args.import_only and args.changes:
+        tickers, feed_upto = changefeed.filter_tickers(args.changes, tickers)
+
+    if args.pg and args.import_only:
+        import_final_pg(tickers)
+        if feed_upto is not None:
+            changefeed.ack(args.changes, feed_upto)
+        return
+    pg = None
+    if args.pg and not args.no_db:
+        from pg_bulk import PgBulkLoader
+        pg = PgBulkLoader()
+
+    sb = None if args.no_db or pg else supabase_client_or_none()
+    if args.import_only:
+        if sb is None:
+            print("✗ --import-only: Supabase ENV bulunamadı (ya da client açılamadı).", file=sys.stderr)
+            sys.exit(1)
+        stats = import_final(sb, tickers, fresh=args.fresh)
+        if feed_upto is not None and not stats["failed"]:
+            changefeed.ack(args.changes, feed_upto)
+        return
+    if sb is None and pg is None and not args.no_db:
         print("⚠ Supabase ENV bulunamadı (ya da client açılamadı). Sadece final/*.json üretilecek.")
 
-    total = len(tickers)
-    for i, t in enumerate(tickers, 1):
+    # İş kuyruğu: girdisi (kap + bilanco) değişmeyen ve tamamlanmış tickerlar atlanır;
+    # yarıda kalan çalıştırma kaldığı yerden devam eder.
+    queue = JobQueue("merge_pg" if pg else ("merge" if sb is None else "merge_db"))
+    hashes = {t: files_hash([os.path.join(KAP_DIR, f"{t}.json"), os.path.join(BILANCO_DIR, f"{t}.json")])
+              for t in tickers}
+    for t in tickers:
+        if hashes[t] is None:
+            print(f"• {t}: kaynak yok (atlandı).")
+    have = [t for t in tickers if hashes[t]]
+    missing_out = [t for t in have if not os.path.exists(os.path.join(OUT_DIR, f"{t}.json"))]
+    queue.enqueue(missing_out, hashes, fresh=True)
+    todo = queue.enqueue(have, hashes, fresh=args.fresh)
+    print(f"→ {todo}/{len(have)} ticker kuyrukta")
+
+    def one(t):
         kap_fp = os.path.join(KAP_DIR, f"{t}.json")
         bil_fp = os.path.join(BILANCO_DIR, f"{t}.json")
 
         kap_doc = load_json_safe(kap_fp)
-        bil_doc = load_json_safe(bil_fp)
-
-        if kap_doc is None and bil_doc is None:
-            print(f"• ({i}/{total}) {t}: kaynak yok (atlandı).")
-            continue
-
-        merged = {"ticker": t, "kap": kap_doc, "bilanco": bil_doc}
         out_fp = os.path.join(OUT_DIR, f"{t}.json")
+        # değişiklik akışı: eski final'e karşı fark; final yazılmadan önce pending'e kaydedilir
+        diff = changefeed.TickerDiff(t, load_json_safe(out_fp))
+        if sb is None and pg is None:
+            # yalnız dosya: bilanco akışla kopyalanır (kap + bil + merged kopyaları birlikte tutulmaz)
+            tmp = out_fp + ".new"
+            bil_ok = write_final_stream(tmp, t, kap_doc, bil_fp, on_value=diff.value)
+            changefeed.record(t, diff.finish(kap_doc, bil_ok))
+            os.replace(tmp, out_fp)
+            print(f"✓ {t} → {out_fp}")
+            return
+        merged = {"ticker": t, "kap": kap_doc, "bilanco": load_json_safe(bil_fp)}
+        changefeed.record(t, diff.feed(merged["bilanco"] or {}).finish(kap_doc, merged["bilanco"] is not None))
         atomic_write_json(out_fp, merged)
-        print(f"✓ ({i}/{total}) {t} → {out_fp}")
+        print(f"✓ {t} → {out_fp}")
 
         # DB'ye yaz
-        import_merged_to_db(sb, merged)
-
-    print("Bitti.")
+        if pg:
+            pg.add(merged)
+        else:
+            import_merged_to_db(sb, merged)
+
+    # --pg: işler commit'ten önce 'done' olmaz (kirada kalır); commit başarısızsa ya da
+    # süreç arada ölürse bir sonraki çalıştırmada yeniden işlenir
+    stats = work(queue, one, defer=pg is not None, tickers=have)
+    if pg:
+        try:
+            counts = pg.commit()
+        except Exception as e:
+            for t, dt in stats["deferred"]:
+                queue.fail(t, f"commit: {type(e).__name__}: {e}", dt)
+            raise
+        for t, dt in stats["deferred"]:
+            queue.done(t, dt)
+        print(f"✓ Postgres: {len(pg.tickers)} ticker, " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    queue.close()
+    feed = changefeed.commit_run()
+    if feed:
+        counts = (load_json_safe(feed) or {}).get("counts") or {}
+        print(f"✓ değişiklik akışı → {feed} (" + ", ".join(f"{k}={v}" for k, v in counts.items()) + ")")
+    print(f"Bitti. {stats['done']} tamam, {stats['failed']} hata")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,341 @@
+# scripts/metrics.py
+# -*- coding: utf-8 -*-
+"""
+Ortak ölçüm modülü: sayaçlar, histogramlar, zamanlayıcılar (aşama + ticker bazında).
+
+Her süreç çıkışta (atexit) METRICS_DIR altına kendi parçasını yazar
+(<stage>.<pid>.part.json) ve aynı çalıştırmaya (METRICS_RUN_ID) ait tüm parçaları
+birleştirip iki çıktı üretir:
+  - run_report.json : aşama süreleri, sayaçlar, histogramlar, ticker süreleri
+  - metrics.prom    : Prometheus textfile collector formatı
+Aşama adı METRICS_STAGE (pipeline.py verir) ya da script adıdır. Hiç ölçüm
+yapılmadıysa dosya yazılmaz.
+
+Kullanım:
+  import metrics
+  with metrics.timer("fetch_seconds", api="yahoo"): ...
+  metrics.inc("db_calls", table="companies", op="upsert")
+  metrics.observe("chunk_rows", len(rows))
+  metrics.ticker_time("ARCLK", 1.23)
+  sb = metrics.wrap_supabase(create_client(url, key))   # DB çağrılarını sayar
+  python3 scripts/metrics.py report [--compare .cache/metrics_last_run.json]
+ENV:
+  METRICS_DIR (metrics/), METRICS_RUN_ID, METRICS_STAGE, METRICS_DISABLE=1
+"""
+
+import os, sys, json, glob, time, atexit, argparse, threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+METRICS_DIR = os.environ.get("METRICS_DIR", "metrics")
+RUN_ID = os.environ.get("METRICS_RUN_ID") or f"adhoc-{os.getpid()}"
+STAGE = os.environ.get("METRICS_STAGE") or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+ENABLED = os.environ.get("METRICS_DISABLE") != "1"
+PREFIX = "data0825"
+# saniye cinsinden varsayılan histogram sınırları
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+REPORT_FILE = "run_report.json"
+PROM_FILE = "metrics.prom"
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+class Registry:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.counters: Dict[LabelKey, float] = {}
+        self.hists: Dict[LabelKey, Dict[str, Any]] = {}
+        self.tickers: Dict[str, float] = {}
+        self.touched = False
+
+    @staticmethod
+    def key(name: str, labels: Dict[str, Any]) -> LabelKey:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        k = self.key(name, labels)
+        with self.lock:
+            self.counters[k] = self.counters.get(k, 0) + value
+            self.touched = True
+
+    def observe(self, name: str, value: float, buckets=BUCKETS, **labels):
+        k = self.key(name, labels)
+        with self.lock:
+            h = self.hists.get(k)
+            if h is None:
+                h = self.hists[k] = {"buckets": list(buckets), "counts": [0] * len(buckets),
+                                     "count": 0, "sum": 0.0, "min": value, "max": value}
+            for i, le in enumerate(h["buckets"]):
+                if value <= le:
+                    h["counts"][i] += 1
+                    break
+            h["count"] += 1
+            h["sum"] += value
+            h["min"] = min(h["min"], value)
+            h["max"] = max(h["max"], value)
+            self.touched = True
+
+    def ticker_time(self, ticker: str, seconds: float):
+        with self.lock:
+            self.tickers[ticker] = self.tickers.get(ticker, 0.0) + seconds
+            self.touched = True
+
+    def part(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "run_id": RUN_ID, "stage": self.stage, "pid": os.getpid(),
+                "started_at": self.started, "finished_at": time.time(),
+                "counters": [[n, dict(l), v] for (n, l), v in self.counters.items()],
+                "histograms": [[n, dict(l), h] for (n, l), h in self.hists.items()],
+                "tickers": dict(self.tickers),
+            }
+
+_reg = Registry(STAGE)
+
+def inc(name: str, value: float = 1, **labels):
+    if ENABLED:
+        _reg.inc(name, value, **labels)
+
+def observe(name: str, value: float, **labels):
+    if ENABLED:
+        _reg.observe(name, value, **labels)
+
+def ticker_time(ticker: str, seconds: float):
+    if ENABLED:
+        _reg.ticker_time(ticker, seconds)
+
+@contextmanager
+def timer(name: str, **labels):
+    """Bloğun süresini `name` histogramına (sn) yazar."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+def bytes_written(path: str, n: Optional[int] = None):
+    """Yazılan bayt sayısını klasör etiketiyle sayar."""
+    if n is None:
+        try:
+            n = os.path.getsize(path)
+        except OSError:
+            return
+    inc("bytes_written", n, dir=os.path.basename(os.path.dirname(os.path.abspath(path))))
+
+# ---------- Supabase sarmalayıcı ----------
+_DB_OPS = {"select", "insert", "upsert", "update", "delete"}
+
+class _Query:
+    def __init__(self, q, table: str, op: str = "select"):
+        self._q, self._table, self._op = q, table, op
+
+    def __getattr__(self, name):
+        attr = getattr(self._q, name)
+        if not callable(attr):
+            return attr
+        def call(*a, **k):
+            r = attr(*a, **k)
+            return _Query(r, self._table, name if name in _DB_OPS else self._op) if hasattr(r, "execute") else r
+        return call
+
+    def execute(self):
+        t0 = time.perf_counter()
+        ok = "ok"
+        try:
+            return self._q.execute()
+        except Exception:
+            ok = "error"
+            raise
+        finally:
+            inc("db_calls", table=self._table, op=self._op, result=ok)
+            observe("db_seconds", time.perf_counter() - t0, table=self._table, op=self._op)
+
+class _Client:
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _Query(self._client.table(name), name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+def wrap_supabase(client):
+    """supabase client -> execute() çağrılarını tablo/işlem bazında sayan sarmalayıcı."""
+    return client if client is None or not ENABLED else _Client(client)
+
+# ---------- rapor ----------
+def _label_str(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in sorted(labels.items())) + "}"
+
+def merge_parts(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Süreç parçaları -> aşama bazında birleşik rapor."""
+    stages: Dict[str, Dict[str, Any]] = {}
+    for p in parts:
+        st = stages.setdefault(p["stage"], {"started_at": p["started_at"], "finished_at": p["finished_at"],
+                                            "processes": 0, "counters": {}, "histograms": {}, "tickers": {}})
+        st["processes"] += 1
+        st["started_at"] = min(st["started_at"], p["started_at"])
+        st["finished_at"] = max(st["finished_at"], p["finished_at"])
+        for n, l, v in p["counters"]:
+            k = n + _label_str(l)
+            st["counters"][k] = st["counters"].get(k, 0) + v
+        for n, l, h in p["histograms"]:
+            k = n + _label_str(l)
+            cur = st["histograms"].get(k)
+            if cur is None:
+                st["histograms"][k] = dict(h, counts=list(h["counts"]), name=n, labels=l)
+                continue
+            cur["counts"] = [a + b for a, b in zip(cur["counts"], h["counts"])]
+            cur["count"] += h["count"]; cur["sum"] += h["sum"]
+            cur["min"] = min(cur["min"], h["min"]); cur["max"] = max(cur["max"], h["max"])
+        for t, s in p["tickers"].items():
+            st["tickers"][t] = st["tickers"].get(t, 0.0) + s
+    for st in stages.values():
+        st["duration"] = round(st["finished_at"] - st["started_at"], 3)
+        for h in st["histograms"].values():
+            h.setdefault("name", None)
+            h["avg"] = h["sum"] / h["count"] if h["count"] else None
+        if st["tickers"]:
+            slow = sorted(st["tickers"].items(), key=lambda kv: -kv[1])[:10]
+            st["slowest_tickers"] = [[t, round(s, 3)] for t, s in slow]
+    return {"run_id": parts[0]["run_id"] if parts else RUN_ID, "generated_at": time.time(), "stages": stages}
+
+def to_prometheus(report: Dict[str, Any]) -> str:
+    lines = [f"# TYPE {PREFIX}_stage_duration_seconds gauge"]
+    for s, st in sorted(report["stages"].items()):
+        lines.append(f'{PREFIX}_stage_duration_seconds{{stage="{s}"}} {st["duration"]}')
+    lines.append(f"# TYPE {PREFIX}_ticker_duration_seconds gauge")
+    for s, st in sorted(report["stages"].items()):
+        for t, v in sorted(st["tickers"].items()):
+            lines.append(f'{PREFIX}_ticker_duration_seconds{{stage="{s}",ticker="{t}"}} {round(v, 6)}')
+    typed = set()
+    for s, st in sorted(report["stages"].items()):
+        for k, v in sorted(st["counters"].items()):
+            name, _, rest = k.partition("{")
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter"); typed.add(metric)
+            labels = f'stage="{s}"' + ("," + rest[:-1] if rest else "")
+            lines.append(f"{metric}{{{labels}}} {v}")
+        for h in st["histograms"].values():
+            metric = f"{PREFIX}_{h['name']}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram"); typed.add(metric)
+            base = dict(h["labels"], stage=s)
+            cum = 0
+            for le, c in zip(h["buckets"], h["counts"]):
+                cum += c
+                lines.append(f"{metric}_bucket{_label_str(dict(base, le=le))} {cum}")
+            lines.append(f"{metric}_bucket{_label_str(dict(base, le='+Inf'))} {h['count']}")
+            lines.append(f"{metric}_sum{_label_str(base)} {round(h['sum'], 6)}")
+            lines.append(f"{metric}_count{_label_str(base)} {h['count']}")
+    lines.append(f"# TYPE {PREFIX}_last_run_timestamp_seconds gauge")
+    lines.append(f"{PREFIX}_last_run_timestamp_seconds {int(report['generated_at'])}")
+    return "\n".join(lines) + "\n"
+
+def compare(prev: Optional[Dict[str, Any]], cur: Dict[str, Any], ratio: float = 1.5,
+            min_seconds: float = 5.0) -> List[Dict[str, Any]]:
+    """Önceki çalıştırmaya göre belirgin yavaşlayan aşamalar."""
+    out = []
+    for s, st in cur["stages"].items():
+        p = ((prev or {}).get("stages") or {}).get(s)
+        if not p or not p.get("duration"):
+            continue
+        if st["duration"] >= min_seconds and st["duration"] > p["duration"] * ratio:
+            out.append({"stage": s, "previous": p["duration"], "current": st["duration"],
+                        "ratio": round(st["duration"] / p["duration"], 2)})
+    return out
+
+def _atomic_write(path: str, text: str):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_report(out_dir: str = METRICS_DIR, run_id: str = RUN_ID,
+                 durations: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+    """Bu çalıştırmanın parçalarını birleştirip run_report.json + metrics.prom yazar.
+    durations: çalıştırıcının ölçtüğü aşama süreleri (ölçüm yazmayan aşamalar da rapora girer)."""
+    parts = []
+    for p in glob.glob(os.path.join(out_dir, "*.part.json")):
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                part = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if part.get("run_id") == run_id:
+            parts.append(part)
+    if not parts and not durations:
+        return None
+    report = merge_parts(parts)
+    for name, dt in (durations or {}).items():
+        st = report["stages"].setdefault(name, {"processes": 0, "counters": {}, "histograms": {}, "tickers": {}})
+        st["duration"] = round(dt, 3)
+    _atomic_write(os.path.join(out_dir, REPORT_FILE), json.dumps(report, ensure_ascii=False, indent=2))
+    _atomic_write(os.path.join(out_dir, PROM_FILE), to_prometheus(report))
+    return report
+
+def clean_parts(out_dir: str = METRICS_DIR):
+    """Önceki çalıştırmaların süreç parçalarını sil."""
+    for p in glob.glob(os.path.join(out_dir, "*.part.json")):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+def flush():
+    """Süreç parçasını yazar ve çalıştırma raporunu yeniler (atexit'te otomatik)."""
+    if not ENABLED or not _reg.touched:
+        return
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _atomic_write(os.path.join(METRICS_DIR, f"{_reg.stage}.{os.getpid()}.part.json"), json.dumps(_reg.part()))
+        write_report()
+        _reg.touched = False   # parça kümülatif; yeni ölçüm gelmedikçe tekrar yazma
+    except Exception as e:
+        print(f"[WARN] metrics yazılamadı: {e}", file=sys.stderr)
+
+atexit.register(flush)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["report", "clean"])
+    ap.add_argument("--dir", default=METRICS_DIR)
+    ap.add_argument("--run-id", default=os.environ.get("METRICS_RUN_ID"))
+    ap.add_argument("--compare", help="önceki run_report.json; yavaşlayan aşamaları işaretle")
+    args = ap.parse_args()
+    if args.cmd == "clean":
+        clean_parts(args.dir)
+        return
+    run_id = args.run_id
+    if not run_id:   # son yazılan parçanın çalıştırması
+        parts = sorted(glob.glob(os.path.join(args.dir, "*.part.json")), key=os.path.getmtime)
+        if not parts:
+            print("Ölçüm yok."); return
+        with open(parts[-1], "r", encoding="utf-8") as f:
+            run_id = json.load(f)["run_id"]
+    report = write_report(args.dir, run_id)
+    if report is None:
+        print("Ölçüm yok."); return
+    for s, st in sorted(report["stages"].items(), key=lambda kv: -kv[1]["duration"]):
+        calls = sum(v for k, v in st["counters"].items() if k.startswith("db_calls"))
+        written = sum(v for k, v in st["counters"].items() if k.startswith("bytes_written"))
+        print(f"{s:12s} {st['duration']:8.1f} s  db_calls={int(calls)}  bytes_written={int(written)}")
+    if args.compare:
+        try:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                prev = json.load(f)
+        except (OSError, ValueError):
+            prev = None
+        report["regressions"] = compare(prev, report)
+        for r in report["regressions"]:
+            print(f"[WARN] regression: {r['stage']} {r['previous']:.1f}s → {r['current']:.1f}s (x{r['ratio']})")
+        _atomic_write(os.path.join(args.dir, REPORT_FILE), json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# scripts/pg_bulk.py
+# -*- coding: utf-8 -*-
+"""
+Doğrudan Postgres'e toplu yükleme (COPY): büyük import / yeniden kurulum için.
+
+PostgREST üzerinden JSON upsert saniyede birkaç bin satırda tıkanır. Bu yol
+merge_kap_bilanco.db_rows çıktısını:
+  1) tablo başına geçici dosyaya (JSON satırları) biriktirir (bellek sabit),
+  2) tek transaction içinde tablo başına
+       CREATE TEMP TABLE _stg_<t> (LIKE <t>) ON COMMIT DROP
+       COPY _stg_<t> (...) FROM STDIN
+       DELETE FROM <t> WHERE ticker IN (stg)         -- REPLACE_TABLES
+       INSERT INTO <t> SELECT DISTINCT ON (anahtar) ... ON CONFLICT (anahtar) DO UPDATE
+     çalıştırır. Hata olursa hiçbir tablo değişmez.
+
+Hedef tablolar (Supabase şeması) önceden var olmalı; sütun tipleri
+information_schema'dan okunur (json/jsonb sütunlar Jsonb olarak yazılır).
+
+Yerel Postgres ile deneme:
+  docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=pg postgres:16
+  (şemayı Supabase'den pg_dump --schema-only ile al, uygula)
+  PG_DSN=postgresql://postgres:pg@localhost:5432/postgres \\
+    python3 scripts/merge_kap_bilanco.py --pg --import-only
+  PG_DSN=... python -m pytest -q tests/test_pg_bulk.py   # tabloları geçici şemada kurar
+ENV:
+  PG_DSN (ya da DATABASE_URL)
+Bağımlılık:
+  pip install "psycopg[binary]>=3.1"
+"""
+
+import os, json, time, tempfile
+from typing import Any, Dict, List, Optional
+
+import metrics
+from merge_kap_bilanco import DB_TABLES, REPLACE_TABLES, db_rows
+
+PG_DSN = os.environ.get("PG_DSN") or os.environ.get("DATABASE_URL")
+
+def _connect(dsn: str):
+    try:
+        import psycopg
+    except ImportError:
+        raise RuntimeError('psycopg yok: pip install "psycopg[binary]>=3.1"')
+    return psycopg.connect(dsn)
+
+class PgBulkLoader:
+    """add(merged) ile biriktir, commit() ile tek transaction'da yükle."""
+    def __init__(self, dsn: Optional[str] = PG_DSN, spool_dir: Optional[str] = None):
+        if not dsn:
+            raise RuntimeError("PG_DSN / DATABASE_URL tanımlı değil")
+        self.dsn = dsn
+        self.spool_dir = spool_dir
+        self.spools: Dict[str, Any] = {}
+        self.columns: Dict[str, List[str]] = {}
+        self.counts: Dict[str, int] = {}
+        self.tickers: List[str] = []
+
+    def add(self, merged: Dict[str, Any]):
+        for table, rows in db_rows(merged).items():
+            if not rows:
+                continue
+            f = self.spools.get(table)
+            if f is None:
+                f = self.spools[table] = tempfile.TemporaryFile("w+", encoding="utf-8", dir=self.spool_dir)
+                self.columns[table] = []
+            cols = self.columns[table]
+            for r in rows:
+                for k in r:
+                    if k not in cols:
+                        cols.append(k)
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            self.counts[table] = self.counts.get(table, 0) + len(rows)
+        self.tickers.append(merged.get("ticker"))
+
+    def close(self):
+        for f in self.spools.values():
+            f.close()
+        self.spools.clear()
+
+    def commit(self) -> Dict[str, int]:
+        """Tüm biriken satırları tek transaction'da yükler; tablo -> satır sayısı."""
+        if not self.spools:
+            return {}
+        conn = _connect(self.dsn)
+        try:
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    for table, on_conflict in DB_TABLES:
+                        if table in self.spools:
+                            t0 = time.perf_counter()
+                            self._load_table(cur, table, on_conflict.split(","))
+                            metrics.observe("pg_copy_seconds", time.perf_counter() - t0, table=table)
+                            metrics.inc("db_rows", self.counts[table], table=table)
+            return dict(self.counts)
+        finally:
+            conn.close()
+            self.close()
+
+    def _load_table(self, cur, table: str, keys: List[str]):
+        from psycopg import sql
+        from psycopg.types.json import Jsonb
+
+        cur.execute("SELECT column_name, data_type FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = %s", (table,))
+        types = dict(cur.fetchall())
+        if not types:
+            raise RuntimeError(f"tablo yok: {table}")
+        cols = [c for c in self.columns[table] if c in types]
+        skipped = [c for c in self.columns[table] if c not in types]
+        if skipped:
+            print(f"[WARN] {table}: tabloda olmayan sütunlar atlandı: {', '.join(skipped)}")
+        jsonish = {c for c in cols if types[c] in ("json", "jsonb")}
+
+        stg = sql.Identifier(f"_stg_{table}")
+        tgt = sql.Identifier(table)
+        ident = lambda names: sql.SQL(", ").join(map(sql.Identifier, names))
+        cur.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(stg, tgt))
+        # aynı anahtar birden çok kez gelirse (ör. financial_labels) son gelen kazanır
+        cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN _ord bigserial").format(stg))
+
+        f = self.spools[table]
+        f.seek(0)
+        with cur.copy(sql.SQL("COPY {} ({}) FROM STDIN").format(stg, ident(cols))) as cp:
+            for line in f:
+                r = json.loads(line)
+                cp.write_row([Jsonb(r.get(c)) if c in jsonish and r.get(c) is not None else r.get(c) for c in cols])
+
+        if table in REPLACE_TABLES:
+            cur.execute(sql.SQL("DELETE FROM {} WHERE ticker IN (SELECT DISTINCT ticker FROM {})").format(tgt, stg))
+        updates = [c for c in cols if c not in keys]
+        action = (sql.SQL("DO UPDATE SET ") + sql.SQL(", ").join(
+                      sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(c), sql.Identifier(c)) for c in updates)
+                  if updates else sql.SQL("DO NOTHING"))
+        cur.execute(sql.SQL("INSERT INTO {tgt} ({cols}) SELECT DISTINCT ON ({keys}) {cols} FROM {stg} "
+                            "ORDER BY {keys}, _ord DESC ON CONFLICT ({keys}) {action}").format(
+                        tgt=tgt, stg=stg, cols=ident(cols), keys=ident(keys), action=action))
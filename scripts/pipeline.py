@@ -1,39 +1,362 @@
 #!/usr/bin/env python3
-import subprocess, os, json
+# scripts/pipeline.py
+# -*- coding: utf-8 -*-
+"""
+Bağımlılık grafiği (DAG) ile veri hattı: tek komut, yalnızca gereken iş.
 
-TICKERS_FILE = "public/tickers.txt"
-RESULT_DIR   = "result"
+Aşamalar girdileri / çıktıları / bağımlılıkları ile STAGES'te tanımlıdır:
 
-def run(cmd, cwd=None):
-    print(f"\n> {cmd}")
-    subprocess.run(cmd, shell=True, check=True, cwd=cwd)
+  bilanco ─┐          ┌─ db_import ── universe
+           ├─ merge ──┤
+  kap ─────┘          ├─ index (docs/)
+                      ├─ sheets
+                      └─ snapshot ── quarterly ── ratios ──┬─ screen
+                         (ham değer tensörü snapshot'tan)  ├─ aggregates (sektör / pazar / endeks, docs/aggregates/)
+                                                           ├─ index
+                                                           └─ sheets
+  kap ── interlock (ortak / YK ters indeksi)
+  bilanco + kap ── history (sürümlü geçmiş: fark + checkpoint)
+  prices (bağımsız; seans dışında kendisi atlar; CI'da ayrı iş akışı: prices.yml)
 
-def main():
-    # 1) isyatirim verilerini çek (JSON olarak)
-    run("npx tsx scripts/isyatirim-batch-json.ts")
+  - Bağımsız aşamalar eşzamanlı koşar (ör. bilanco + kap, index + sheets + db_import).
+  - Her aşamanın girdi parmak izi (dosya içerik hash'leri) .cache/pipeline_state.json'da
+    tutulur; değişmediyse aşama atlanır. Hash'ler (boyut, mtime) ile önbelleklenir.
+  - per_ticker aşamalar (merge, db_import) yalnızca girdisi değişen tickerlarla çağrılır.
+  - Dış kaynaktan çeken aşamalar (bilanco, kap) `every` aralığında bir kez koşar.
+  - Gerekli ENV'i olmayan aşama (Supabase, Google) atlanır.
+  - merge, changes/<run_id>.json değişiklik akışını yazar (scripts/changefeed.py);
+    db_import yalnızca içeriği gerçekten değişen tickerları işler. sheets akışı
+    kullanmaz (RATIOS fiyatla değişir, akış yalnızca final/ farklarını kapsar);
+    kap/bilanco/ratios hash'iyle iş kuyruğu değişmeyenleri zaten atlar.
+  - Her aşama scripts/metrics.py ile ölçülür (METRICS_STAGE / METRICS_RUN_ID burada
+    verilir); sonunda metrics/run_report.json + metrics.prom yazılır ve önceki
+    çalıştırmaya (.cache/metrics_last_run.json) göre yavaşlayan aşamalar işaretlenir.
+
+Kullanım:
+  python3 scripts/pipeline.py                 # gerekeni çalıştır
+  python3 scripts/pipeline.py --plan          # çalışacak aşamaları yazdır (çalıştırmaz)
+  python3 scripts/pipeline.py --only prices
+  python3 scripts/pipeline.py --skip kap sheets --force
+  python3 scripts/pipeline.py --list
+"""
+
+import os, sys, json, glob, time, shutil, hashlib, argparse, threading, subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# alt aşamalar aynı çalıştırma kimliğiyle ölçülsün (metrics import edilmeden önce)
+os.environ.setdefault("METRICS_RUN_ID", time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + f"-{os.getpid()}")
+import metrics
+
+TICKERS_FILE = os.path.join("public", "tickers.txt")
+STATE_FILE = os.environ.get("PIPELINE_STATE", os.path.join(".cache", "pipeline_state.json"))
+LAST_REPORT_FILE = os.path.join(".cache", "metrics_last_run.json")
+DEFAULT_JOBS = int(os.environ.get("PIPELINE_JOBS", "4"))
+DAY = 86400
+PY = sys.executable or "python3"
+SUPABASE_ENV = ("SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY")
+
+class Stage:
+    def __init__(self, name: str, cmd: List[str], inputs: Sequence[str] = (), outputs: Sequence[str] = (),
+                 deps: Sequence[str] = (), env: Sequence[str] = (), per_ticker: Sequence[str] = (),
+                 every: Optional[int] = None, always: bool = False, xvfb: bool = False):
+        self.name = name
+        self.cmd = cmd
+        self.inputs = list(inputs)          # glob'lar
+        self.outputs = list(outputs)        # glob'lar; hiçbiri yoksa aşama zorla koşar
+        self.deps = list(deps)
+        self.env = list(env)                # zorunlu ENV (yoksa atlanır)
+        self.per_ticker = list(per_ticker)  # "{t}" içeren girdi kalıpları
+        self.every = every                  # sn; dış kaynak: bu aralıkta en fazla bir kez
+        self.always = always
+        self.xvfb = xvfb
 
-    # 2) KAP verilerini çek (JSON olarak)
-    run("python3 scripts/kap_batch_from_tickerfile.py")
+STAGES = [
+    Stage("bilanco", [PY, "scripts/bilanco_fetch.py"],
+          inputs=[TICKERS_FILE], outputs=["bilanco_json/*.json"], every=DAY),
+    Stage("kap", [PY, "scripts/kap_batch_from_tickerfile.py", "-f", TICKERS_FILE],
+          inputs=[TICKERS_FILE], outputs=["kap_json/*.json"], every=DAY, xvfb=True),
+    Stage("merge", [PY, "scripts/merge_kap_bilanco.py", "--no-db"],
+          per_ticker=["kap_json/{t}.json", "bilanco_json/{t}.json"], outputs=["final/*.json"],
+          deps=["bilanco", "kap"]),
+    Stage("snapshot", [PY, "scripts/snapshot.py", "build"],
+          inputs=["bilanco_json/*.json", "kap_json/*.json"], outputs=["snapshot/data.bin"], deps=["merge"]),
+    Stage("db_import", [PY, "scripts/merge_kap_bilanco.py", "--import-only", "--changes", "db_import"],
+          per_ticker=["final/{t}.json"], deps=["merge"], env=SUPABASE_ENV),
+    Stage("universe", [PY, "scripts/universe.py", "--refresh"],
+          inputs=["final/*.json"], deps=["db_import"], env=SUPABASE_ENV),
+    Stage("quarterly", [PY, "scripts/quarterly.py"],
+          inputs=["bilanco_json/*.json"], outputs=["quarterly_json/*.json"], deps=["bilanco", "snapshot"]),
+    Stage("ratios", [PY, "scripts/ratios.py"],
+          inputs=["bilanco_json/*.json", "kap_json/*.json", "quarterly_json/*.json"],
+          outputs=["ratios/*.json"], deps=["quarterly", "kap"]),
+    Stage("screen", [PY, "scripts/screen.py", "--build"],
+          inputs=["ratios/*.json", "kap_json/*.json"], outputs=["screen/index.npz"], deps=["ratios", "snapshot"]),
+    Stage("aggregates", [PY, "scripts/aggregates.py"],
+          inputs=["ratios/*.json", "kap_json/*.json"], outputs=["docs/aggregates/index.json"],
+          deps=["ratios", "kap"]),
+    Stage("interlock", [PY, "scripts/interlock.py", "--build"],
+          inputs=["kap_json/*.json"], outputs=["interlock/index.json"], deps=["kap"]),
+    Stage("history", [PY, "scripts/history.py", "record"],
+          inputs=["bilanco_json/*.json", "kap_json/*.json"], deps=["bilanco", "kap"]),
+    Stage("index", [PY, "scripts/build_index.py"],
+          inputs=["final/*.json", "ratios/*.json"], outputs=["docs/index.json"], deps=["merge", "ratios"]),
+    Stage("sheets", [PY, "scripts/sheets_upsert_from_data0825.py"],
+          inputs=["kap_json/*.json", "bilanco_json/*.json", "ratios/*.json"],
+          deps=["merge", "ratios"], env=["GOOGLE_CREDENTIALS"]),
+    Stage("prices", [PY, "scripts/prices_job.py"], env=SUPABASE_ENV, always=True),
+]
 
-    # 3) Birleştir ve result/ klasörüne yaz
-    os.makedirs(RESULT_DIR, exist_ok=True)
-    with open(TICKERS_FILE, "r", encoding="utf-8") as f:
-        tickers = [ln.strip().upper() for ln in f if ln.strip() and not ln.startswith("#")]
+# ---------- durum / parmak izleri ----------
+def load_state(path: str = STATE_FILE) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            st = json.load(f)
+        st.setdefault("files", {}); st.setdefault("stages", {})
+        return st
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] pipeline state okunamadı ({path}): {e}")
+    return {"files": {}, "stages": {}}
 
+def save_state(state: Dict, path: str = STATE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def file_hash(state: Dict, path: str) -> Optional[str]:
+    """İçerik hash'i; (boyut, mtime) değişmediyse önbellekten."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    cached = state["files"].get(path)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    state["files"][path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+    return h.hexdigest()
+
+def fingerprint(state: Dict, patterns: Sequence[str], extra: str = "") -> str:
+    h = hashlib.sha1(extra.encode())
+    for pat in patterns:
+        h.update(f"\0{pat}\0".encode())
+        for p in sorted(glob.glob(pat)):
+            h.update(f"{p}:{file_hash(state, p)}\n".encode())
+    return h.hexdigest()
+
+def read_tickers() -> List[str]:
+    from merge_kap_bilanco import CANDIDATE_TICKER_FILES
+    for path in [TICKERS_FILE] + CANDIDATE_TICKER_FILES:
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return [ln.strip().upper() for ln in f if ln.strip() and not ln.strip().startswith("#")]
+    return []
+
+def ticker_fingerprints(state: Dict, s: Stage, tickers: List[str]) -> Dict[str, str]:
+    out = {}
     for t in tickers:
-        bil_path = f"bilanco_json/{t}.json"
-        kap_path = f"kap_json/{t}.json"
-        out_path = f"{RESULT_DIR}/{t}.json"
+        hashes = [file_hash(state, pat.format(t=t)) for pat in s.per_ticker]
+        if any(hashes):
+            out[t] = hashlib.sha1("|".join(h or "-" for h in hashes).encode()).hexdigest()
+    return out
+
+def outputs_missing(s: Stage) -> bool:
+    return any(not glob.glob(pat) for pat in s.outputs)
 
-        bil = json.load(open(bil_path, encoding="utf-8")) if os.path.exists(bil_path) else None
-        kap = json.load(open(kap_path, encoding="utf-8")) if os.path.exists(kap_path) else None
+def decide(s: Stage, state: Dict, force: bool, tickers: List[str]) -> Tuple[bool, str, Dict]:
+    """(koşsun mu, gerekçe, kaydedilecek parmak izi bilgisi)"""
+    missing_env = [e for e in s.env if not os.environ.get(e)]
+    if missing_env:
+        return False, f"ENV yok ({', '.join(missing_env)})", {}
+    prev = state["stages"].get(s.name) or {}
+    if s.per_ticker:
+        fps = ticker_fingerprints(state, s, tickers)
+        old = prev.get("tickers") or {}
+        todo = sorted(fps) if force or outputs_missing(s) else sorted(t for t, h in fps.items() if old.get(t) != h)
+        if not todo:
+            return False, "girdiler değişmedi", {}
+        return True, f"{len(todo)}/{len(fps)} ticker değişti", {"tickers": fps, "todo": todo}
+    extra = f"every:{int(time.time() // s.every)}" if s.every else ""
+    fp = fingerprint(state, s.inputs, extra)
+    if s.always:
+        return True, "her çalıştırmada", {"fingerprint": fp}
+    if force:
+        return True, "--force", {"fingerprint": fp}
+    if outputs_missing(s):
+        return True, "çıktı yok", {"fingerprint": fp}
+    if prev.get("fingerprint") != fp:
+        return True, ("yeni dönem" if s.every and prev.get("fingerprint") else "girdiler değişti"), {"fingerprint": fp}
+    return False, "girdiler değişmedi", {}
+
+# ---------- çalıştırma ----------
+_print_lock = threading.Lock()
+
+def log(name: str, msg: str):
+    with _print_lock:
+        print(f"[{name}] {msg}", flush=True)
+
+def command(s: Stage, info: Dict) -> List[str]:
+    cmd = list(s.cmd) + list(info.get("todo") or [])
+    if s.xvfb and not os.environ.get("DISPLAY") and shutil.which("xvfb-run"):
+        cmd = ["xvfb-run", "-a"] + cmd
+    return cmd
+
+def execute(s: Stage, cmd: List[str]) -> Tuple[int, float]:
+    """Alt süreci çalıştırır, çıktısını aşama adıyla önekleyerek aktarır."""
+    t0 = time.perf_counter()
+    env = {**os.environ, "PYTHONUNBUFFERED": "1", "METRICS_STAGE": s.name}
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                encoding="utf-8", errors="replace", env=env)
+    except OSError as e:
+        log(s.name, f"✗ başlatılamadı: {e}")
+        return 127, time.perf_counter() - t0
+    for line in proc.stdout:
+        log(s.name, line.rstrip())
+    return proc.wait(), time.perf_counter() - t0
+
+def select(names: Optional[List[str]], skip: Optional[List[str]]) -> List[Stage]:
+    known = {s.name for s in STAGES}
+    for n in (names or []) + (skip or []):
+        if n not in known:
+            raise SystemExit(f"bilinmeyen aşama: {n} (mevcut: {', '.join(sorted(known))})")
+    return [s for s in STAGES if (not names or s.name in names) and s.name not in (skip or [])]
+
+def plan(stages: List[Stage], state: Dict, force: bool) -> List[str]:
+    """Çalışacak aşamalar: kendi girdisi değişen ya da bağımlılığı çalışacak olanlar."""
+    tickers = read_tickers()
+    selected = {s.name for s in stages}
+    will = []
+    for s in stages:   # STAGES topolojik sırada tanımlı
+        run, _, _ = decide(s, state, force, tickers)
+        upstream = any(d in will for d in s.deps if d in selected)
+        if run or (upstream and not [e for e in s.env if not os.environ.get(e)]):
+            will.append(s.name)
+    return will
+
+def run(stages: List[Stage], state: Dict, force: bool = False, jobs: int = DEFAULT_JOBS,
+        state_path: str = STATE_FILE) -> Dict[str, Tuple[str, float, str]]:
+    """DAG'ı çalıştırır. {aşama: (durum, süre sn, not)}; durum: ok|skipped|failed|blocked"""
+    selected = {s.name for s in stages}
+    pending = {s.name: s for s in stages}
+    result: Dict[str, Tuple[str, float, str]] = {}
+    running = {}
+    tickers = read_tickers()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as ex:
+        while pending or running:
+            progressed = True
+            while progressed:   # atlanan aşamalar yeni aşamaları hazır hale getirebilir
+                progressed = False
+                for name, s in list(pending.items()):
+                    deps = [d for d in s.deps if d in selected]
+                    if any(result.get(d, ("",))[0] in ("failed", "blocked") for d in deps):
+                        result[name] = ("blocked", 0.0, "bağımlılık başarısız")
+                        log(name, "⚠ atlandı: bağımlılık başarısız")
+                    elif all(d in result for d in deps):
+                        go, why, info = decide(s, state, force, tickers)
+                        if go:
+                            log(name, f"▶ başlıyor ({why})")
+                            running[ex.submit(execute, s, command(s, info))] = (s, info)
+                        else:
+                            result[name] = ("skipped", 0.0, why)
+                            log(name, f"• atlandı: {why}")
+                    else:
+                        continue
+                    del pending[name]
+                    progressed = True
+            if not running:
+                if pending:
+                    raise RuntimeError(f"çözülemeyen bağımlılık: {', '.join(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                s, info = running.pop(fut)
+                rc, dt = fut.result()
+                metrics.observe("stage_seconds", dt, step=s.name, result="ok" if rc == 0 else "failed")
+                if rc != 0:
+                    result[s.name] = ("failed", dt, f"exit {rc}")
+                    log(s.name, f"✗ başarısız (exit {rc}, {dt:.1f} s)")
+                    continue
+                rec = state["stages"].setdefault(s.name, {})
+                if "tickers" in info:
+                    rec.setdefault("tickers", {}).update({t: info["tickers"][t] for t in info["todo"]})
+                if "fingerprint" in info:
+                    rec["fingerprint"] = info["fingerprint"]
+                rec["finished_at"] = time.time()
+                rec["duration"] = round(dt, 1)
+                save_state(state, state_path)
+                result[s.name] = ("ok", dt, "")
+                log(s.name, f"✓ bitti ({dt:.1f} s)")
+    return result
+
+def report_regressions(result: Dict[str, Tuple[str, float, str]], last_path: str = LAST_REPORT_FILE):
+    """Çalıştırma raporunu yazar, önceki raporla karşılaştırır ve bir sonraki için saklar."""
+    metrics.flush()
+    report = metrics.write_report(durations={n: dt for n, (status, dt, _) in result.items() if status == "ok"})
+    if report is None:
+        return
+    try:
+        with open(last_path, "r", encoding="utf-8") as f:
+            prev = json.load(f)
+    except (OSError, ValueError):
+        prev = None
+    report["regressions"] = metrics.compare(prev, report)
+    for r in report["regressions"]:
+        print(f"[WARN] regression: {r['stage']} {r['previous']:.1f}s → {r['current']:.1f}s (x{r['ratio']})")
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    with open(os.path.join(metrics.METRICS_DIR, metrics.REPORT_FILE), "w", encoding="utf-8") as f:
+        f.write(text)
+    os.makedirs(os.path.dirname(last_path) or ".", exist_ok=True)
+    with open(last_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--only", nargs="+", metavar="STAGE", help="yalnızca bu aşamalar")
+    ap.add_argument("--skip", nargs="+", metavar="STAGE", help="bu aşamaları çıkar")
+    ap.add_argument("--force", action="store_true", help="parmak izlerini yok say, seçilenlerin hepsini koş")
+    ap.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="eşzamanlı aşama sayısı")
+    ap.add_argument("--plan", action="store_true", help="çalışacak aşamaları yazdır, çalıştırma")
+    ap.add_argument("--list", action="store_true", help="aşamaları ve bağımlılıklarını listele")
+    ap.add_argument("--state", default=STATE_FILE)
+    args = ap.parse_args()
 
-        merged = {"ticker": t, "bilanco": bil, "kap": kap}
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(merged, f, ensure_ascii=False, indent=2)
-        print(f"✓ {t} → {out_path}")
+    stages = select(args.only, args.skip)
+    if args.list:
+        for s in stages:
+            deps = ", ".join(s.deps) or "-"
+            print(f"{s.name:10s} deps: {deps:16s} cmd: {' '.join(s.cmd)}")
+        return
+    state = load_state(args.state)
+    if args.plan:
+        for name in plan(stages, state, args.force):
+            print(name)
+        save_state(state, args.state)   # hash önbelleği
+        return
 
-    print("\nBitti ✅ Tüm JSON dosyaları 'result/' klasöründe.")
+    t0 = time.perf_counter()
+    metrics.clean_parts()
+    result = run(stages, state, force=args.force, jobs=args.jobs, state_path=args.state)
+    save_state(state, args.state)
+    for status, _, _ in result.values():
+        metrics.inc("stages", result=status)
+    report_regressions(result)
+    print(f"\n{'aşama':10s} {'durum':8s} {'süre':>8s}  not")
+    for s in stages:
+        status, dt, note = result.get(s.name, ("-", 0.0, ""))
+        print(f"{s.name:10s} {status:8s} {dt:7.1f}s  {note}")
+    failed = [n for n, r in result.items() if r[0] == "failed"]
+    print(f"{'✓' if not failed else '✗'} pipeline: {time.perf_counter() - t0:.1f} s"
+          + (f", başarısız: {', '.join(failed)}" if failed else ""))
+    sys.exit(1 if failed else 0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,274 @@
+# scripts/price_store.py
+# -*- coding: utf-8 -*-
+"""
+Yerel, append-only fiyat zaman serisi deposu + OHLCV rollup'ları.
+
+Dizin yapısı (PRICE_STORE_DIR, varsayılan price_store/):
+  <TICKER>/snap.bin   anlık kotasyonlar  (ts int64 epoch sn, close f8, volume f8)
+  <TICKER>/1h.bin     saatlik barlar     (ts, open, high, low, close, volume)
+  <TICKER>/1d.bin     günlük barlar      (ts = İstanbul günü başlangıcı)
+Dosyalar sabit boyutlu kayıtlardır; okuma np.memmap ile sıfır kopya, aralık
+sorguları ts kolonunda ikili arama (searchsorted) ile yapılır.
+
+Rollup artımlıdır: her çözünürlükte son (açık) bar ve sonrası yeniden hesaplanıp
+dosyanın kuyruğu değiştirilir; eski barlara dokunulmaz.
+
+Hacim: Yahoo regularMarketVolume günlük kümülatif hacimdir. Bar hacmi, barın son
+kümülatif değeri ile aynı gün içindeki bir önceki kümülatif değerin farkıdır.
+
+Kullanım:
+  python3 scripts/price_store.py query ARCLK --res 1d --from 2025-01-01
+  python3 scripts/price_store.py rollup [TICKER ...]
+  python3 scripts/price_store.py compact --snap-days 30 --hour-days 400
+API:
+  store = PriceStore("price_store"); store.append(rows); store.rollup(tickers)
+  store.bars("ARCLK", "1h", start_ts, end_ts)
+"""
+
+import os, argparse
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+STORE_DIR = os.environ.get("PRICE_STORE_DIR", "price_store")
+
+SNAP_DTYPE = np.dtype([("ts", "<i8"), ("close", "<f8"), ("volume", "<f8")])
+BAR_DTYPE = np.dtype([("ts", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+                      ("close", "<f8"), ("volume", "<f8")])
+
+# İstanbul sabit UTC+3 (2016'dan beri yaz saati yok): gün sınırları buna göre
+TZ_OFFSET = 3 * 3600
+RESOLUTIONS = {"1h": 3600, "1d": 86400}
+
+# Varsayılan saklama süreleri (gün); 0 = sınırsız
+RETENTION_DAYS = {
+    "snap": int(os.environ.get("PRICE_STORE_SNAP_DAYS", "30")),
+    "1h": int(os.environ.get("PRICE_STORE_HOUR_DAYS", "400")),
+    "1d": int(os.environ.get("PRICE_STORE_DAY_DAYS", "0")),
+}
+
+def to_epoch(ts) -> int:
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    if isinstance(ts, datetime):
+        return int(ts.timestamp())
+    s = str(ts)
+    if len(s) == 10:  # YYYY-MM-DD -> İstanbul gün başı
+        return int(datetime.fromisoformat(s).replace(tzinfo=timezone.utc).timestamp()) - TZ_OFFSET
+    return int(datetime.fromisoformat(s.replace("Z", "+00:00")).timestamp())
+
+def bucket(ts: np.ndarray, res: str) -> np.ndarray:
+    """ts -> bar başlangıcı (İstanbul saatine göre hizalı)."""
+    step = RESOLUTIONS[res]
+    return (ts + TZ_OFFSET) // step * step - TZ_OFFSET
+
+def day_of(ts: np.ndarray) -> np.ndarray:
+    return (ts + TZ_OFFSET) // 86400
+
+def rollup_bars(snaps: np.ndarray, res: str, prev: Optional[np.void] = None) -> np.ndarray:
+    """Zaman sıralı snapshot'lardan OHLCV barları (vektörel, np.ufunc.reduceat).
+    prev: ilk snapshot'tan hemen önceki snapshot (aynı gün hacim farkı için)."""
+    if len(snaps) == 0:
+        return np.zeros(0, dtype=BAR_DTYPE)
+    ts, px, vol = snaps["ts"], snaps["close"], snaps["volume"]
+    b = bucket(ts, res)
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+
+    out = np.zeros(len(starts), dtype=BAR_DTYPE)
+    out["ts"] = b[starts]
+    out["open"] = px[starts]
+    out["high"] = np.maximum.reduceat(px, starts)
+    out["low"] = np.minimum.reduceat(px, starts)
+    out["close"] = px[ends]
+
+    # bar öncesindeki kümülatif hacim: aynı gündeyse önceki snapshot, değilse 0
+    before = np.empty(len(starts))
+    before_idx = starts - 1
+    has_prev = before_idx >= 0
+    before[has_prev] = np.where(day_of(ts[before_idx[has_prev]]) == day_of(ts[starts[has_prev]]),
+                                vol[before_idx[has_prev]], 0.0)
+    if not has_prev[0]:
+        before[0] = prev["volume"] if prev is not None and day_of(np.int64(prev["ts"])) == day_of(ts[0]) else 0.0
+    out["volume"] = np.maximum(np.maximum.reduceat(vol, starts) - before, 0.0)
+    return out
+
+class PriceStore:
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+
+    def _path(self, ticker: str, kind: str) -> str:
+        return os.path.join(self.root, ticker.upper(), f"{kind}.bin")
+
+    def _read(self, ticker: str, kind: str) -> np.ndarray:
+        path = self._path(ticker, kind)
+        dtype = SNAP_DTYPE if kind == "snap" else BAR_DTYPE
+        if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(os.path.getsize(path) // dtype.itemsize,))
+
+    def tickers(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    # --- yazma ---
+    def append(self, rows: Iterable[Dict]) -> int:
+        """[{ticker, ts, close, volume}] -> snap.bin sonuna ekler (ts'i son kayıttan
+        eski/eşit olanlar atlanır). Eklenen kayıt sayısı döner."""
+        by_t: Dict[str, List] = {}
+        for r in rows:
+            if r.get("close") is None:
+                continue
+            by_t.setdefault(r["ticker"].upper(), []).append((to_epoch(r["ts"]), float(r["close"]), float(r.get("volume") or 0)))
+        n = 0
+        for t, recs in by_t.items():
+            arr = np.array(sorted(recs), dtype=SNAP_DTYPE)
+            cur = self._read(t, "snap")
+            if len(cur):
+                arr = arr[arr["ts"] > cur["ts"][-1]]
+            if not len(arr):
+                continue
+            os.makedirs(os.path.dirname(self._path(t, "snap")), exist_ok=True)
+            with open(self._path(t, "snap"), "ab") as f:
+                f.write(arr.tobytes())
+            n += len(arr)
+        return n
+
+    def write_bars(self, ticker: str, res: str, bars: np.ndarray) -> int:
+        """Dışarıdan gelen barları (ör. geçmiş backfill) mevcut dosyayla birleştirir.
+        Aynı ts'de gelen bar kazanır; yalnızca mevcut son (açık, canlı) barla çakışan
+        gelen bar atlanır. Daha eski ve daha yeni barlar birleştirilir."""
+        if not len(bars):
+            return 0
+        bars = np.sort(np.asarray(bars, dtype=BAR_DTYPE), order="ts")
+        cur = np.array(self._read(ticker, res))
+        if len(cur):
+            bars = bars[bars["ts"] != cur["ts"][-1]]
+            cur = cur[~np.isin(cur["ts"], bars["ts"])]
+            merged = np.sort(np.concatenate([cur, bars]), order="ts", kind="stable")
+        else:
+            merged = bars
+        path = self._path(ticker, res)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        merged.tofile(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return len(bars)
+
+    def _replace_tail(self, ticker: str, kind: str, from_ts: int, bars: np.ndarray):
+        """kind dosyasında ts >= from_ts olan kuyruğu bars ile değiştirir."""
+        path = self._path(ticker, kind)
+        cur = self._read(ticker, kind)
+        keep = int(np.searchsorted(cur["ts"], from_ts, "left")) if len(cur) else 0
+        del cur
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            f.truncate(keep * BAR_DTYPE.itemsize)
+            f.seek(keep * BAR_DTYPE.itemsize)
+            f.write(bars.tobytes())
+
+    def rollup(self, tickers: Optional[Iterable[str]] = None) -> int:
+        """Son açık bardan itibaren 1h/1d barlarını artımlı günceller."""
+        n = 0
+        for t in (tickers or self.tickers()):
+            snaps = self._read(t, "snap")
+            if not len(snaps):
+                continue
+            for res in RESOLUTIONS:
+                bars = self._read(t, res)
+                last_bar = int(bars["ts"][-1]) if len(bars) else None
+                del bars
+                i = int(np.searchsorted(snaps["ts"], last_bar, "left")) if last_bar is not None else 0
+                if i >= len(snaps):
+                    continue
+                # kuyruk, snapshot'ı olan ilk bardan itibaren değişir (önceki barlar, ör.
+                # backfill ile gelen günlükler, korunur)
+                from_ts = int(bucket(snaps["ts"][i:i + 1], res)[0])
+                prev = snaps[i - 1] if i > 0 else None
+                new = rollup_bars(np.asarray(snaps[i:]), res, prev)
+                self._replace_tail(t, res, from_ts, new)
+                n += len(new)
+        return n
+
+    def compact(self, retention: Optional[Dict[str, int]] = None, now: Optional[int] = None) -> int:
+        """Saklama süresini aşan kayıtları dosya başından atar. Silinen kayıt sayısı."""
+        retention = retention or RETENTION_DAYS
+        now = now or int(datetime.now(timezone.utc).timestamp())
+        dropped = 0
+        for t in self.tickers():
+            for kind, days in retention.items():
+                if not days:
+                    continue
+                cur = self._read(t, kind)
+                cut = int(np.searchsorted(cur["ts"], now - days * 86400, "left")) if len(cur) else 0
+                if cut == 0:
+                    continue
+                keep = np.array(cur[cut:])
+                del cur
+                tmp = self._path(t, kind) + ".tmp"
+                keep.tofile(tmp)
+                os.replace(tmp, self._path(t, kind))
+                dropped += cut
+        return dropped
+
+    # --- okuma ---
+    def _range(self, arr: np.ndarray, start=None, end=None) -> np.ndarray:
+        lo = int(np.searchsorted(arr["ts"], to_epoch(start), "left")) if start is not None else 0
+        hi = int(np.searchsorted(arr["ts"], to_epoch(end), "right")) if end is not None else len(arr)
+        return arr[lo:hi]
+
+    def snapshots(self, ticker: str, start=None, end=None) -> np.ndarray:
+        return self._range(self._read(ticker, "snap"), start, end)
+
+    def bars(self, ticker: str, res: str = "1d", start=None, end=None) -> np.ndarray:
+        if res not in RESOLUTIONS:
+            raise ValueError(f"bilinmeyen çözünürlük: {res}")
+        return self._range(self._read(ticker, res), start, end)
+
+    def last(self, ticker: str) -> Optional[Dict]:
+        s = self._read(ticker, "snap")
+        if not len(s):
+            return None
+        r = s[-1]
+        return {"ticker": ticker, "ts": int(r["ts"]), "close": float(r["close"]), "volume": float(r["volume"])}
+
+def fmt_ts(ts: int) -> str:
+    return datetime.fromtimestamp(int(ts) + TZ_OFFSET, timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default=STORE_DIR, help="depo dizini (PRICE_STORE_DIR)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    q = sub.add_parser("query", help="bar / snapshot aralık sorgusu")
+    q.add_argument("ticker")
+    q.add_argument("--res", default="1d", choices=["snap"] + list(RESOLUTIONS))
+    q.add_argument("--from", dest="start")
+    q.add_argument("--to", dest="end")
+    r = sub.add_parser("rollup", help="1h/1d barlarını artımlı güncelle")
+    r.add_argument("tickers", nargs="*")
+    c = sub.add_parser("compact", help="saklama süresini aşanları sil")
+    c.add_argument("--snap-days", type=int, default=RETENTION_DAYS["snap"])
+    c.add_argument("--hour-days", type=int, default=RETENTION_DAYS["1h"])
+    c.add_argument("--day-days", type=int, default=RETENTION_DAYS["1d"])
+    args = ap.parse_args()
+
+    store = PriceStore(args.dir)
+    if args.cmd == "rollup":
+        n = store.rollup([t.upper() for t in args.tickers] or None)
+        print(f"✓ rollup: {n} bar yazıldı")
+    elif args.cmd == "compact":
+        n = store.compact({"snap": args.snap_days, "1h": args.hour_days, "1d": args.day_days})
+        print(f"✓ compact: {n} kayıt silindi")
+    else:
+        t = args.ticker.upper()
+        if args.res == "snap":
+            for s in store.snapshots(t, args.start, args.end):
+                print(f"{fmt_ts(s['ts'])}  {s['close']:.4f}  {s['volume']:.0f}")
+        else:
+            for b in store.bars(t, args.res, args.start, args.end):
+                print(f"{fmt_ts(b['ts'])}  O={b['open']:.4f} H={b['high']:.4f} L={b['low']:.4f} "
+                      f"C={b['close']:.4f} V={b['volume']:.0f}")
+
+if __name__ == "__main__":
+    main()
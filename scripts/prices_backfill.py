@@ -0,0 +1,282 @@
+# scripts/prices_backfill.py
+# -*- coding: utf-8 -*-
+"""
+Geçmiş günlük fiyat backfill'i (yfinance, çoklu ticker).
+
+  - Evren chunk'lara bölünür; her chunk tek yf.download çağrısıdır (ticker başına
+    istek yok), chunk'lar sınırlı eşzamanlılıkla çekilir.
+  - Ticker başına checkpoint (.cache/backfill_checkpoint.json: ticker -> son gün):
+    kesilen iş kaldığı yerden devam eder, tekrar çalıştırma yalnızca eksik günleri ister.
+    Aynı başlangıç gününe sahip tickerlar birlikte chunk'lanır.
+  - Bitiş varsayılanı bugündür (İstanbul, hariç); kapanışı geçmemiş seansın barı
+    (bist_calendar.last_closed_session) ne yazılır ne checkpoint'lenir, kesinleşince
+    sonraki çalıştırmada çekilir.
+  - Yükleme toplu: yerel PriceStore'a 1d barlar (write_bars) ve/veya Supabase
+    'prices' tablosuna BATCH_ROWS'luk upsert'ler (satır başına round trip yok).
+  - Çevrimdışı test: --record DIR her chunk'ın ham yanıtını CSV olarak kaydeder,
+    --replay DIR ağ yerine bu kayıtları okur (yfinance import edilmez).
+
+Kullanım:
+  python3 scripts/prices_backfill.py --start 2010-01-01 --target store
+  python3 scripts/prices_backfill.py ARCLK TUPRS --target both --record rec/
+  python3 scripts/prices_backfill.py --replay rec/ --target store --reset
+ENV:
+  SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY (--target db|both), UNIVERSE_FILE,
+  BACKFILL_CHUNK (40), BACKFILL_CONCURRENCY (3)
+"""
+
+import os, sys, json, time, hashlib, argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from bist_calendar import TZ, last_closed_session
+from universe import get_universe
+from price_store import PriceStore, BAR_DTYPE, to_epoch
+
+CHUNK_SIZE = int(os.environ.get("BACKFILL_CHUNK", "40"))
+CONCURRENCY = int(os.environ.get("BACKFILL_CONCURRENCY", "3"))   # Yahoo rate limit'e dikkat
+RETRIES = 3
+BACKOFF = 2.0        # sn; deneme başına katlanır
+BATCH_ROWS = 5000    # Supabase upsert başına satır
+DEFAULT_START = "2010-01-01"
+CHECKPOINT_FILE = os.environ.get("BACKFILL_CHECKPOINT", os.path.join(".cache", "backfill_checkpoint.json"))
+# prices.ts için günlük barın zaman damgası: seans kapanışı 18:00 İstanbul = 15:00 UTC
+CLOSE_UTC = "T15:00:00+00:00"
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# ---------- kaynaklar ----------
+def chunk_key(symbols: List[str], start: str, end: Optional[str]) -> str:
+    raw = ",".join(sorted(symbols)) + f"|{start}|{end or ''}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+class YFinanceSource:
+    """Canlı kaynak; record_dir verilirse ham yanıtı CSV olarak kaydeder."""
+    def __init__(self, record_dir: Optional[str] = None):
+        import yfinance as yf
+        self.yf = yf
+        self.record_dir = record_dir
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+
+    def download(self, symbols: List[str], start: str, end: Optional[str]) -> pd.DataFrame:
+        df = self.yf.download(symbols, start=start, end=end, interval="1d", group_by="ticker",
+                              auto_adjust=False, actions=False, threads=False, progress=False)
+        if self.record_dir:
+            df.to_csv(os.path.join(self.record_dir, chunk_key(symbols, start, end) + ".csv"))
+        return df
+
+class ReplaySource:
+    """--record ile kaydedilmiş yanıtları okur (ağ yok)."""
+    def __init__(self, replay_dir: str):
+        self.replay_dir = replay_dir
+
+    def download(self, symbols: List[str], start: str, end: Optional[str]) -> pd.DataFrame:
+        path = os.path.join(self.replay_dir, chunk_key(symbols, start, end) + ".csv")
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"kayıt yok: {path} ({','.join(symbols)} {start})")
+        return pd.read_csv(path, header=[0, 1], index_col=0, parse_dates=True)
+
+# ---------- dönüşüm ----------
+def split_frame(df: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """yf.download çıktısı -> {ticker (".IS"siz): Open/High/Low/Close/Volume frame}.
+    Kolonlar (ticker, alan) ya da (alan, ticker) MultiIndex veya tek ticker için düz olabilir."""
+    out: Dict[str, pd.DataFrame] = {}
+    if df is None or df.empty:
+        return out
+    if not isinstance(df.columns, pd.MultiIndex):
+        if len(symbols) == 1:
+            out[symbols[0].split(".")[0]] = df
+        return out
+    lvl = 0 if set(df.columns.get_level_values(0)) & set(symbols) else 1
+    for sym in symbols:
+        if sym in df.columns.get_level_values(lvl):
+            out[sym.split(".")[0]] = df.xs(sym, axis=1, level=lvl)
+    return out
+
+def to_bars(frame: pd.DataFrame, after: Optional[str] = None, until: Optional[str] = None) -> np.ndarray:
+    """Tek ticker frame'i -> BAR_DTYPE (ts = İstanbul gün başı). Kapanışı olmayan
+    satırlar (tatil / işlem yok), `after` günü dahil öncesi ve `until` sonrası atılır."""
+    if not set(FIELDS) <= set(frame.columns):
+        return np.zeros(0, dtype=BAR_DTYPE)
+    f = frame[list(FIELDS)].dropna(subset=["Close"])
+    days = [d.strftime("%Y-%m-%d") for d in pd.DatetimeIndex(f.index)]
+    keep = np.array([(after is None or d > after) and (until is None or d <= until) for d in days],
+                    dtype=bool)
+    out = np.zeros(int(keep.sum()), dtype=BAR_DTYPE)
+    if not len(out):
+        return out
+    out["ts"] = [to_epoch(d) for d, k in zip(days, keep) if k]
+    for name, col in (("open", "Open"), ("high", "High"), ("low", "Low"), ("close", "Close"), ("volume", "Volume")):
+        out[name] = f[col].to_numpy(dtype=float)[keep]
+    out["volume"] = np.nan_to_num(out["volume"])
+    return out
+
+def bar_day(ts: int) -> str:
+    return datetime.fromtimestamp(int(ts) + 3 * 3600, timezone.utc).strftime("%Y-%m-%d")
+
+def db_rows(ticker: str, bars: np.ndarray) -> List[Dict]:
+    return [{"ticker": ticker, "ts": bar_day(b["ts"]) + CLOSE_UTC,
+             "close": float(b["close"]), "volume": float(b["volume"])} for b in bars]
+
+# ---------- checkpoint ----------
+def load_checkpoint(path: str = CHECKPOINT_FILE) -> Dict[str, str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[WARN] checkpoint okunamadı ({path}): {e}")
+        return {}
+
+def save_checkpoint(cp: Dict[str, str], path: str = CHECKPOINT_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cp, f, sort_keys=True)
+    os.replace(tmp, path)
+
+def plan(tickers: List[str], cp: Dict[str, str], start: str, end: Optional[str],
+         chunk_size: int = CHUNK_SIZE) -> List[tuple]:
+    """[(başlangıç günü, [sembol...])]: aynı başlangıçlı tickerlar birlikte chunk'lanır."""
+    until = end or datetime.now(TZ).date().isoformat()
+    by_start: Dict[str, List[str]] = {}
+    for t in tickers:
+        s = start
+        if cp.get(t):
+            s = max(s, (date.fromisoformat(cp[t]) + timedelta(days=1)).isoformat())
+        if s >= until:
+            continue
+        by_start.setdefault(s, []).append(t + ".IS")
+    jobs = []
+    for s in sorted(by_start):
+        syms = by_start[s]
+        for i in range(0, len(syms), chunk_size):
+            jobs.append((s, syms[i:i + chunk_size]))
+    return jobs
+
+# ---------- çalıştırma ----------
+def fetch(source, symbols: List[str], start: str, end: Optional[str]):
+    t0 = time.perf_counter()
+    err = None
+    for attempt in range(1, RETRIES + 1):
+        try:
+            with metrics.timer("api_seconds", api="yfinance"):
+                df = source.download(symbols, start, end)
+            metrics.inc("api_calls", api="yfinance", result="ok")
+            return df, attempt, time.perf_counter() - t0, None
+        except FileNotFoundError as e:   # replay: kayıt yoksa tekrar denemenin anlamı yok
+            return None, attempt, time.perf_counter() - t0, e
+        except Exception as e:
+            metrics.inc("api_calls", api="yfinance", result="error")
+            err = e
+            if attempt < RETRIES:
+                time.sleep(BACKOFF * 2 ** (attempt - 1))
+    return None, RETRIES, time.perf_counter() - t0, err
+
+def upsert_db(sb, rows: List[Dict]):
+    for i in range(0, len(rows), BATCH_ROWS):
+        sb.table("prices").upsert(rows[i:i + BATCH_ROWS], on_conflict="ticker,ts").execute()
+
+def run(tickers: List[str], source, start: str = DEFAULT_START, end: Optional[str] = None,
+        store: Optional[PriceStore] = None, sb=None, cp_path: str = CHECKPOINT_FILE,
+        concurrency: int = CONCURRENCY, chunk_size: int = CHUNK_SIZE,
+        now: Optional[datetime] = None) -> Dict[str, int]:
+    """Backfill'i çalıştırır; chunk bitince yükler ve checkpoint'i ilerletir.
+    Yalnızca kapanışı geçmiş seansların barları yazılır (`now` testler için)."""
+    now = now or datetime.now(timezone.utc)
+    end = end or now.astimezone(TZ).date().isoformat()
+    closed = last_closed_session(now).isoformat()
+    cp = load_checkpoint(cp_path)
+    jobs = plan(tickers, cp, start, end, chunk_size)
+    stats = {"chunks": len(jobs), "failed": 0, "tickers": 0, "bars": 0, "db_rows": 0}
+    if not jobs:
+        print("✓ backfill: tüm tickerlar güncel")
+        return stats
+    print(f"backfill: {sum(len(s) for _, s in jobs)} ticker, {len(jobs)} chunk, concurrency={concurrency}")
+
+    def work(job):
+        s, syms = job
+        return s, syms, fetch(source, syms, s, end)
+
+    # yükleme ve checkpoint ana thread'de: store dosyaları ve checkpoint tek yazıcılı
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(jobs)))) as ex:
+        for idx, (s, syms, (df, attempts, dt, err)) in enumerate(ex.map(work, jobs)):
+            tag = f"chunk {idx+1}/{len(jobs)} ({len(syms)} ticker, {s}→)"
+            if err is not None:
+                stats["failed"] += 1
+                print(f"[WARN] {tag} failed after {attempts} tries ({dt:.1f} s): {err}")
+                continue
+            frames = split_frame(df, syms)
+            rows: List[Dict] = []
+            n_bars = 0
+            for t, frame in frames.items():
+                bars = to_bars(frame, after=cp.get(t), until=closed)
+                if not len(bars):
+                    continue
+                if store is not None:
+                    store.write_bars(t, "1d", bars)
+                if sb is not None:
+                    rows.extend(db_rows(t, bars))
+                n_bars += len(bars)
+                cp[t] = bar_day(bars["ts"][-1])
+            if rows:
+                upsert_db(sb, rows)
+            save_checkpoint(cp, cp_path)
+            stats["tickers"] += len(frames)
+            stats["bars"] += n_bars
+            stats["db_rows"] += len(rows)
+            metrics.inc("bars", n_bars)
+            missing = len(syms) - len(frames)
+            note = f", {missing} veri yok" if missing else ""
+            print(f"{tag}: {n_bars} bar in {dt:.1f} s{note}")
+    print(f"✓ backfill: {stats['bars']} bar, {stats['db_rows']} db satırı, {stats['failed']} başarısız chunk")
+    return stats
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--start", default=DEFAULT_START, help="YYYY-MM-DD (checkpoint varsa ondan sonrası)")
+    ap.add_argument("--end", default=None, help="YYYY-MM-DD (hariç; varsayılan bugün)")
+    ap.add_argument("--target", choices=["store", "db", "both"], default="store")
+    ap.add_argument("--store", default=None, help="PriceStore kökü (varsayılan PRICE_STORE_DIR)")
+    ap.add_argument("--record", default=None, help="ham yanıtları bu dizine kaydet")
+    ap.add_argument("--replay", default=None, help="ağ yerine kayıtlı yanıtları oku")
+    ap.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    ap.add_argument("--reset", action="store_true", help="checkpoint'i sil, baştan başla")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    args = ap.parse_args()
+
+    sb = None
+    if args.target in ("db", "both"):
+        url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        if not url or not key:
+            print("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY", file=sys.stderr)
+            sys.exit(1)
+        from supabase import create_client
+        sb = metrics.wrap_supabase(create_client(url, key))
+    store = PriceStore(args.store) if args.store else PriceStore()
+    if args.target == "db":
+        store = None
+
+    tickers = [t.strip().upper() for t in args.tickers if t.strip()] or get_universe(sb)
+    if not tickers:
+        print("No tickers (args / UNIVERSE_FILE / companies).", file=sys.stderr)
+        sys.exit(1)
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    source = ReplaySource(args.replay) if args.replay else YFinanceSource(args.record)
+    stats = run(tickers, source, args.start, args.end, store=store, sb=sb, cp_path=args.checkpoint,
+                concurrency=args.concurrency, chunk_size=args.chunk)
+    sys.exit(1 if stats["failed"] and not stats["bars"] else 0)
+
+if __name__ == "__main__":
+    main()
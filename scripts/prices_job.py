@@ -1,9 +1,18 @@
 # scripts/prices_job.py
 # -*- coding: utf-8 -*-
-import os, sys, requests
+import os, sys, json, time, signal, argparse, threading, requests
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
 from supabase import create_client
 
+import metrics
+from bist_calendar import is_open, next_open
+from universe import get_universe
+from price_store import PriceStore
+from valuations import Fundamentals, upsert_valuations
+
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -11,22 +20,75 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     print("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY", file=sys.stderr)
     sys.exit(1)
 
-sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+sb = metrics.wrap_supabase(create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY))
+
+QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"  # Yahoo quote endpoint (daha stabil)
+CHUNK_SIZE = 50
+CONCURRENCY = int(os.environ.get("PRICES_CONCURRENCY", "8"))   # aynı anda uçuştaki chunk sayısı
+RETRIES = int(os.environ.get("PRICES_RETRIES", "3"))
+TIMEOUT = (5, 15)   # (connect, read) sn
+BACKOFF = 0.5       # sn; deneme başına katlanır
+
+DEFAULT_INTERVAL = float(os.environ.get("PRICES_INTERVAL", "300"))  # daemon: sn
+
+# ticker -> [close, volume, ts]: son yazılan değer; değişmeyen kotasyonlar yazılmaz
+LAST_SEEN_FILE = os.environ.get("PRICES_LAST_SEEN", os.path.join(".cache", "prices_last.json"))
+
+_session = None
 
-def tickers_from_db():
-    data = sb.table("companies").select("ticker").execute().data or []
-    return [r["ticker"].upper() for r in data if r.get("ticker")]
+def get_session():
+    """Keep-alive bağlantı havuzlu tek Session (her chunk için yeni TCP/TLS yok)."""
+    global _session
+    if _session is None:
+        s = requests.Session()
+        s.headers.update({"User-Agent": "Mozilla/5.0"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(CONCURRENCY, 1))
+        s.mount("https://", adapter)
+        _session = s
+    return _session
+
+def load_last_seen(path=LAST_SEEN_FILE):
+    """Yerel önbellek; yoksa prices tablosundaki son snapshot ile tohumlanır."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] last-seen cache okunamadı ({path}): {e}")
+    try:
+        last = sb.table("prices").select("ts").order("ts", desc=True).limit(1).execute().data or []
+        if not last:
+            return {}
+        data = sb.table("prices").select("ticker,close,volume,ts").eq("ts", last[0]["ts"]).execute().data or []
+        return {r["ticker"]: [r["close"], r["volume"], r["ts"]] for r in data}
+    except Exception as e:
+        print(f"[WARN] last-seen seed failed: {e}")
+        return {}
+
+def save_last_seen(last, path=LAST_SEEN_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(last, f)
+    os.replace(tmp, path)
+
+def changed_rows(rows, last):
+    """(close, volume) son yazılandan farklı olan satırlar."""
+    out = []
+    for r in rows:
+        prev = last.get(r["ticker"])
+        if prev is None or float(prev[0]) != r["close"] or float(prev[1] or 0) != r["volume"]:
+            out.append(r)
+    return out
 
 def chunks(lst, n):
     for i in range(0, len(lst), n):
         yield lst[i:i+n]
 
 def fetch_batch(symbols):
-    # Yahoo quote endpoint (daha stabil)
-    url = "https://query1.finance.yahoo.com/v7/finance/quote"
-    headers = {"User-Agent": "Mozilla/5.0"}
     params = {"symbols": ",".join(symbols)}
-    r = requests.get(url, headers=headers, params=params, timeout=20)
+    r = get_session().get(QUOTE_URL, params=params, timeout=TIMEOUT)
     r.raise_for_status()
     j = r.json()
     out = []
@@ -39,29 +101,253 @@ def fetch_batch(symbols):
             out.append({"ticker": base, "close": float(price), "volume": float(vol)})
     return out
 
-def main():
-    tickers = tickers_from_db()
+def fetch_chunk(idx, symbols):
+    """Tek chunk: retry + süre ölçümü. (idx, sonuçlar, deneme sayısı, süre sn, hata)"""
+    t0 = time.perf_counter()
+    err = None
+    for attempt in range(1, RETRIES + 1):
+        t1 = time.perf_counter()
+        try:
+            res = fetch_batch(symbols)
+            metrics.inc("api_calls", api="yahoo_quote", result="ok")
+            metrics.observe("api_seconds", time.perf_counter() - t1, api="yahoo_quote")
+            return idx, res, attempt, time.perf_counter() - t0, None
+        except Exception as e:
+            metrics.inc("api_calls", api="yahoo_quote", result="error")
+            err = e
+            if attempt < RETRIES:
+                time.sleep(BACKOFF * 2 ** (attempt - 1))
+    return idx, [], RETRIES, time.perf_counter() - t0, err
+
+def fetch_all(symbols):
+    """Tüm chunk'ları sınırlı eşzamanlılıkla çeker; toplam süre ≈ en yavaş chunk."""
+    batches = list(chunks(symbols, CHUNK_SIZE))
+    results = []
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(CONCURRENCY, len(batches)))) as ex:
+        for idx, res, attempts, dt, err in ex.map(lambda a: fetch_chunk(*a), enumerate(batches)):
+            note = f" retries={attempts - 1}" if attempts > 1 else ""
+            if err is not None:
+                print(f"[WARN] chunk {idx+1}/{len(batches)} failed after {attempts} tries ({dt*1000:.0f} ms): {err}")
+            else:
+                print(f"chunk {idx+1}/{len(batches)}: {len(res)}/{len(batches[idx])} quotes in {dt*1000:.0f} ms{note}")
+            results.extend(res)
+    print(f"Fetched {len(results)} quotes in {(time.perf_counter() - t0)*1000:.0f} ms "
+          f"({len(batches)} chunks, concurrency={CONCURRENCY})")
+    return results
+
+def snapshot_ts(interval=60):
+    """Snapshot zaman damgası: interval'a (varsayılan dakika) yuvarlanmış UTC."""
+    step = max(1, int(interval))
+    now = int(time.time()) // step * step
+    return datetime.fromtimestamp(now, timezone.utc).isoformat()
+
+def poll_once(last, force=False, interval=60, store=None, fundamentals=None):
+    """Tek tur: evren -> kotasyonlar -> değişenleri yaz. İstatistik dict'i döner.
+    store (PriceStore) verilirse tüm kotasyonlar yerel depoya eklenir ve barlar güncellenir.
+    fundamentals (valuations.Fundamentals) verilirse değişen kotasyonlar değerlenip
+    'valuations' tablosuna yazılır."""
+    stats = {"quotes": 0, "written": 0, "suppressed": 0, "valued": 0}
+    tickers = get_universe(sb)   # UNIVERSE_FILE > TTL'li snapshot > companies
     if not tickers:
-        print("No tickers in companies table.")
-        return
+        print("No tickers in universe (UNIVERSE_FILE / companies).")
+        return stats
 
-    now = datetime.now(timezone.utc).replace(second=0, microsecond=0).isoformat()
-    rows = []
+    now = snapshot_ts(interval)
     symbols = [t + ".IS" for t in tickers]
-    for batch in chunks(symbols, 50):
-        try:
-            res = fetch_batch(batch)
-            for r in res:
-                rows.append({"ticker": r["ticker"], "ts": now, "close": r["close"], "volume": r["volume"]})
-        except Exception as e:
-            print(f"[WARN] batch failed: {e}")
+    rows = [{"ticker": r["ticker"], "ts": now, "close": r["close"], "volume": r["volume"]}
+            for r in fetch_all(symbols)]
+    stats["quotes"] = len(rows)
+    metrics.inc("quotes", len(rows))
 
     if not rows:
         print("No rows to upsert.")
+        return stats
+
+    if store is not None:
+        try:
+            n = store.append(rows)
+            store.rollup({r["ticker"] for r in rows})
+            print(f"Stored {n} snapshots -> {store.root}")
+        except Exception as e:
+            print(f"[WARN] price store write failed: {e}")
+
+    fresh = rows if force else changed_rows(rows, last)
+    stats["suppressed"] = len(rows) - len(fresh)
+
+    if fundamentals is not None:
+        try:
+            # temel veri yenilendiyse fiyatı değişmeyenler de yeniden değerlenir
+            reloaded = fundamentals.ensure()
+            vrows = fundamentals.value(rows if reloaded else fresh)
+            if vrows:
+                upsert_valuations(sb, vrows)
+                print(f"Upserted {len(vrows)} rows -> valuations")
+            stats["valued"] = len(vrows)
+        except Exception as e:
+            print(f"[WARN] valuations failed: {e}")
+
+    if not fresh:
+        print(f"No changed quotes; suppressed {stats['suppressed']} rows.")
+        return stats
+
+    sb.table("prices").upsert(fresh, on_conflict="ticker,ts").execute()
+    for r in fresh:
+        last[r["ticker"]] = [r["close"], r["volume"], r["ts"]]
+    save_last_seen(last)
+    stats["written"] = len(fresh)
+    metrics.inc("rows_written", len(fresh), table="prices")
+    metrics.inc("rows_suppressed", stats["suppressed"], table="prices")
+    print(f"Upserted {len(fresh)} rows -> prices (suppressed {stats['suppressed']} unchanged)")
+    return stats
+
+# ---------- daemon ----------
+class DaemonStats:
+    def __init__(self, interval):
+        self.lock = threading.Lock()
+        self.data = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "interval_sec": interval,
+            "polls": 0, "errors": 0, "missed_slots": 0,
+            "last_poll_at": None, "last_error": None,
+            "last_duration_ms": None, "max_duration_ms": 0.0, "avg_duration_ms": None,
+            "last_lag_ms": None, "max_lag_ms": 0.0,
+            "rows_written": 0, "rows_suppressed": 0, "rows_valued": 0,
+            "market_open": None,
+        }
+
+    def update(self, **kw):
+        with self.lock:
+            self.data.update(kw)
+
+    def record_poll(self, duration, lag, stats=None, error=None):
+        with self.lock:
+            d = self.data
+            d["polls"] += 1
+            d["last_poll_at"] = datetime.now(timezone.utc).isoformat()
+            d["last_duration_ms"] = round(duration * 1000, 1)
+            d["max_duration_ms"] = max(d["max_duration_ms"], d["last_duration_ms"])
+            prev = d["avg_duration_ms"]
+            d["avg_duration_ms"] = d["last_duration_ms"] if prev is None else round(prev + (d["last_duration_ms"] - prev) / d["polls"], 1)
+            d["last_lag_ms"] = round(lag * 1000, 1)
+            d["max_lag_ms"] = max(d["max_lag_ms"], d["last_lag_ms"])
+            if stats:
+                d["rows_written"] += stats["written"]
+                d["rows_suppressed"] += stats["suppressed"]
+                d["rows_valued"] += stats["valued"]
+            if error is not None:
+                d["errors"] += 1
+                d["last_error"] = f"{type(error).__name__}: {error}"
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.data)
+
+def start_health_server(port, stats):
+    """GET /health -> JSON istatistikler (son poll 3 aralıktan eskiyse 503)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            snap = stats.snapshot()
+            ok = True
+            if snap["market_open"] and snap["last_poll_at"]:
+                age = time.time() - datetime.fromisoformat(snap["last_poll_at"]).timestamp()
+                ok = age < 3 * snap["interval_sec"] + 60
+            body = json.dumps({"ok": ok, **snap}).encode()
+            self.send_response(200 if ok else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *a):
+            pass
+    srv = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    print(f"Health endpoint: http://0.0.0.0:{port}/health")
+    return srv
+
+def run_daemon(interval, force=False, health_port=None, store=None, fundamentals=None):
+    """Sabit aralıkla (duvar saatine hizalı) poll eder. Slot zamanları başlangıçtan
+    k*interval olarak hesaplandığı için poll süresi birikmez (drift yok); bir poll
+    aralığı aşarsa kaçan slotlar atlanır. SIGTERM/SIGINT: mevcut tur bitince çıkar."""
+    stop = threading.Event()
+    def on_signal(signum, _frame):
+        print(f"Signal {signum}; shutting down after current poll...")
+        stop.set()
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    stats = DaemonStats(interval)
+    srv = start_health_server(health_port, stats) if health_port else None
+    last = load_last_seen()
+    get_session()   # bağlantı havuzunu baştan kur
+
+    next_slot = (time.time() // interval + 1) * interval
+    try:
+        while not stop.is_set():
+            if stop.wait(max(0.0, next_slot - time.time())):
+                break
+            slot = next_slot
+            market_open = force or is_open()
+            stats.update(market_open=market_open)
+            if market_open:
+                t0 = time.time()
+                try:
+                    metrics.observe("poll_lag_seconds", t0 - slot)
+                    res = poll_once(last, force=force, interval=interval, store=store,
+                                    fundamentals=fundamentals)
+                    stats.record_poll(time.time() - t0, t0 - slot, res)
+                    metrics.observe("poll_seconds", time.time() - t0)
+                except Exception as e:
+                    print(f"[WARN] poll failed: {e}")
+                    stats.record_poll(time.time() - t0, t0 - slot, error=e)
+                next_slot = slot + interval
+                metrics.flush()   # daemon: rapor her turda güncel kalsın
+            else:
+                # seans dışı: bir sonraki açılışa kadar (interval'a hizalı) bekle
+                next_slot = max(slot + interval, (next_open().timestamp() // interval) * interval)
+            now = time.time()
+            if next_slot <= now:
+                missed = int((now - next_slot) // interval) + 1
+                next_slot += missed * interval
+                stats.update(missed_slots=stats.snapshot()["missed_slots"] + missed)
+    finally:
+        if srv is not None:
+            srv.shutdown()
+        if _session is not None:
+            _session.close()
+        save_last_seen(last)
+        snap = stats.snapshot()
+        print(f"Stopped. polls={snap['polls']} errors={snap['errors']} "
+              f"written={snap['rows_written']} suppressed={snap['rows_suppressed']}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--force", action="store_true",
+                    help="seans takvimini yok say ve değişmeyen kotasyonları da yaz")
+    ap.add_argument("--daemon", action="store_true",
+                    help="sürekli çalış; her --interval saniyede bir poll et")
+    ap.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                    help="daemon poll aralığı (sn, varsayılan PRICES_INTERVAL ya da 300)")
+    ap.add_argument("--health-port", type=int, default=int(os.environ.get("PRICES_HEALTH_PORT", "0")) or None,
+                    help="daemon: /health JSON endpoint portu")
+    ap.add_argument("--store", default=os.environ.get("PRICE_STORE_DIR"),
+                    help="kotasyonları ayrıca yerel fiyat deposuna yaz (scripts/price_store.py)")
+    ap.add_argument("--no-valuations", action="store_true",
+                    help="market cap / P/E / P/B / EV hesaplamasını ve 'valuations' yazımını kapat")
+    args = ap.parse_args()
+    force = args.force or os.environ.get("PRICES_FORCE") == "1"
+    store = PriceStore(args.store) if args.store else None
+    fundamentals = None if args.no_valuations else Fundamentals(sb)
+
+    if args.daemon:
+        run_daemon(args.interval, force=force, health_port=args.health_port, store=store,
+                   fundamentals=fundamentals)
         return
 
-    sb.table("prices").upsert(rows, on_conflict="ticker,ts").execute()
-    print(f"Upserted {len(rows)} rows -> prices")
+    if not force and not is_open():
+        print(f"Market closed; skipping (next open {next_open():%Y-%m-%d %H:%M %Z}).")
+        return
+    poll_once(load_last_seen(), force=force, store=store, fundamentals=fundamentals)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,235 @@
+# scripts/quarterly.py
+# -*- coding: utf-8 -*-
+"""
+YTD -> çeyreklik / TTM dönüşümü: bilanco_json/*.json -> quarterly_json/<TICKER>.json
+
+bilanco_json'daki gelir tablosu ve nakit akış kalemleri (3*, 4*) yıl başından
+kümülatiftir (YTD); bilanço kalemleri (1*, 2*) dönem sonu stoklarıdır. Akış
+kalemleri için:
+  q   : tekil çeyrek değeri   (Q1 = YTD, diğerleri YTD(t) - YTD(t-1))
+  ttm : son 12 ay             (YTD(t) + FY(t-1) - YTD(t-4); Q4'te = YTD)
+serileri tüm tickerlar için tek (ticker × kod × çeyrek) dizisi üzerinde üretilir
+ve kaydedilir; ratios / screening gibi sonraki adımlar bunu yeniden hesaplamaz.
+
+Önbellek: quarterly_json/<T>.json, bilanco dosyasının hash'ini taşır.
+Ham değer tensörü, güncel snapshot/data.bin varsa (bilanco dosyaları snapshot'tan
+sonra değişmediyse) JSON'dan doldurulmak yerine snapshot'tan alınır (snapshot_tensor).
+
+Kullanım:
+  python3 scripts/quarterly.py              # tickers.txt (yoksa bilanco_json/*)
+  python3 scripts/quarterly.py ARCLK TUPRS
+  python3 scripts/quarterly.py --force
+"""
+
+import os, json, time, hashlib, argparse
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable
+
+import numpy as np
+
+from merge_kap_bilanco import BILANCO_DIR, CANDIDATE_TICKER_FILES, atomic_write_json, ensure_dir
+import metrics
+
+QUARTERLY_DIR = "quarterly_json"
+# Hesap mantığı değişince artır: tüm önbellek geçersizleşir.
+VERSION = 1
+
+# 3* / 4* altında olup dönem sonu bakiyesi olan (kümülatif olmayan) kalemler
+STOCK_CODES_3_4 = {
+    "4BE", "4BEA", "4BEB",     # Net yabancı para pozisyonu
+    "4CBK", "4CBL",            # Dönem başı / dönem sonu nakit
+}
+
+def is_flow(code: str) -> bool:
+    """Gelir tablosu / nakit akış (YTD kümülatif) kalemi mi?"""
+    return code[:1] in ("3", "4") and code not in STOCK_CODES_3_4
+
+# ---------- dönem ekseni ----------
+def period_index(pk: str) -> int:
+    """'2025/6' -> mutlak çeyrek numarası (yıl*4 + çeyrek-1)."""
+    y, m = pk.split("/")
+    return int(y) * 4 + int(m) // 3 - 1
+
+def index_to_period(q: int) -> str:
+    return f"{q // 4}/{(q % 4 + 1) * 3}"
+
+def period_keys(doc: Dict[str, Any]) -> List[str]:
+    return (doc.get("meta") or {}).get("periodKeys") or []
+
+def raw_values(doc: Dict[str, Any], code: str) -> Dict[str, Any]:
+    return ((doc.get("items") or {}).get(code) or {}).get("values") or {}
+
+def build_tensor(docs: List[Dict[str, Any]], codes: List[str],
+                 values: Callable[[Dict[str, Any], str], Dict[str, Any]] = raw_values) -> Tuple[np.ndarray, int]:
+    """docs -> V[ticker, kod, çeyrek] (NaN = veri yok), çeyrek ekseninin başlangıcı (q0).
+    Tüm tickerlar ortak, boşluksuz bir çeyrek eksenine yerleştirilir."""
+    qs = [period_index(pk) for d in docs for pk in period_keys(d)]
+    if not qs:
+        return np.full((len(docs), len(codes), 0), np.nan), 0
+    q0, q1 = min(qs), max(qs)
+    V = np.full((len(docs), len(codes), q1 - q0 + 1), np.nan)
+    for ti, d in enumerate(docs):
+        for ci, code in enumerate(codes):
+            for pk, v in values(d, code).items():
+                if v is not None:
+                    V[ti, ci, period_index(pk) - q0] = v
+    return V, q0
+
+def snapshot_tensor(tickers: List[str], codes: List[str]) -> Optional[Tuple[np.ndarray, int]]:
+    """build_tensor(raw_values) yerine snapshot/data.bin'den (V, q0); tickerlardan biri
+    snapshot'ta yoksa ya da bilanco dosyası snapshot'tan sonra değiştiyse None.
+    Çeyrek ekseni snapshot'ınkidir (daha geniş olabilir; fazla sütunlar NaN)."""
+    import snapshot    # snapshot bu modülü import eder
+    snap = snapshot.open_or_none()
+    if snap is None or not tickers:
+        return None
+    try:
+        if not all(snap.is_fresh(t, kap=False) for t in tickers):
+            return None
+        V, q0 = snap.tensor(codes, tickers)
+    finally:
+        snap.close()
+    metrics.inc("snapshot_hits", len(tickers), kind="tensor")
+    return V, q0
+
+# ---------- vektörel dönüşümler ----------
+def shift(a: np.ndarray, n: int) -> np.ndarray:
+    """Son eksende n dönem geriye kaydır (a[..., i-n]); taşan kısım NaN."""
+    out = np.full_like(a, np.nan)
+    if n < a.shape[-1]:
+        out[..., n:] = a[..., :a.shape[-1] - n]
+    return out
+
+def quarter_pos(n: int, q0: int) -> np.ndarray:
+    """Eksendeki her dönemin yıl içi çeyreği (1..4)."""
+    return (np.arange(n) + q0) % 4 + 1
+
+def quarterly_from_ytd(ytd: np.ndarray, q0: int) -> np.ndarray:
+    """YTD -> tekil çeyrek. Q1 = YTD; diğerleri YTD(t) - YTD(t-1) (aynı yıl)."""
+    qpos = quarter_pos(ytd.shape[-1], q0)
+    return np.where(qpos == 1, ytd, ytd - shift(ytd, 1))
+
+def ttm_from_ytd(ytd: np.ndarray, q0: int) -> np.ndarray:
+    """YTD -> TTM: YTD(t) + FY(t-1) - YTD(t-4). Q4'te TTM = YTD."""
+    n = ytd.shape[-1]
+    qpos = quarter_pos(n, q0)
+    prev_fy = np.arange(n) - qpos                # önceki yılın 12. ay dönemi
+    prev_fy_vals = np.where(prev_fy >= 0, ytd[..., np.clip(prev_fy, 0, None)], np.nan)
+    ttm = ytd + prev_fy_vals - shift(ytd, 4)
+    return np.where(qpos == 4, ytd, ttm)
+
+# ---------- önbellek / IO ----------
+def read_tickers(argv: List[str]) -> List[str]:
+    if argv:
+        return [a.strip().upper() for a in argv if a.strip()]
+    for path in CANDIDATE_TICKER_FILES:
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return [ln.strip().upper() for ln in f if ln.strip() and not ln.strip().startswith("#")]
+    return sorted(p[:-5].upper() for p in os.listdir(BILANCO_DIR) if p.endswith(".json"))
+
+def read_bytes(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def input_hash(bil_raw: bytes) -> str:
+    return hashlib.sha256(f"quarterly-v{VERSION}\0".encode() + bil_raw).hexdigest()
+
+def load_derived(ticker: str, out_dir: str = QUARTERLY_DIR) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(out_dir, f"{ticker}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def series(derived: Dict[str, Any], code: str, kind: str = "ttm") -> Dict[str, Optional[float]]:
+    """quarterly_json dokümanından bir kodun 'q' ya da 'ttm' serisi."""
+    return ((derived.get("items") or {}).get(code) or {}).get(kind) or {}
+
+def _series_dict(row: np.ndarray, keys: Iterable[str], q0: int) -> Dict[str, Optional[float]]:
+    out = {}
+    for pk in keys:
+        v = row[period_index(pk) - q0]
+        out[pk] = None if np.isnan(v) else float(v)
+    return out
+
+def derive(docs: List[Dict[str, Any]], tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """bilanco dokümanları -> türetilmiş (q/ttm) dokümanlar, tek vektörel geçişte.
+    tickers verilirse ham değerler güncel snapshot'tan okunur (varsa)."""
+    codes = sorted({c for d in docs for c in (d.get("items") or {}) if is_flow(c)})
+    V, q0 = (tickers and snapshot_tensor(tickers, codes)) or build_tensor(docs, codes)
+    Q, T = quarterly_from_ytd(V, q0), ttm_from_ytd(V, q0)
+    out = []
+    for ti, d in enumerate(docs):
+        meta = d.get("meta") or {}
+        keys = period_keys(d)
+        items = {}
+        for ci, code in enumerate(codes):
+            if code not in (d.get("items") or {}):
+                continue
+            items[code] = {
+                "q": _series_dict(Q[ti, ci], keys, q0),
+                "ttm": _series_dict(T[ti, ci], keys, q0),
+            }
+        out.append({
+            "meta": {
+                "ticker": meta.get("ticker"),
+                "currency": meta.get("currency"),
+                "version": VERSION,
+                "periodKeys": keys,
+            },
+            "items": items,
+        })
+    return out
+
+def run(tickers: List[str], force: bool = False, out_dir: str = QUARTERLY_DIR) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """quarterly_json'u günceller. (ticker -> türetilmiş doküman, yeniden hesaplananlar)"""
+    ensure_dir(out_dir)
+    result: Dict[str, Dict[str, Any]] = {}
+    todo: List[Tuple[str, str, Dict[str, Any]]] = []
+    spent: Dict[str, float] = {}   # ticker -> sn (okuma + toplu hesabın payı + yazma)
+    for t in tickers:
+        t0 = time.perf_counter()
+        try:
+            raw = read_bytes(os.path.join(BILANCO_DIR, f"{t}.json"))
+            if raw is None:
+                continue
+            h = input_hash(raw)
+            cached = None if force else load_derived(t, out_dir)
+            if cached and (cached.get("meta") or {}).get("input_hash") == h:
+                result[t] = cached
+                continue
+            try:
+                todo.append((t, h, json.loads(raw)))
+            except ValueError as e:
+                print(f"⚠ JSON okunamadı: {t} -> {e}")
+        finally:
+            spent[t] = time.perf_counter() - t0
+
+    if todo:
+        t0 = time.perf_counter()
+        out = derive([d for _, _, d in todo], [t for t, _, _ in todo])
+        share = (time.perf_counter() - t0) / len(todo)
+        for (t, h, _), doc in zip(todo, out):
+            t0 = time.perf_counter()
+            doc["meta"]["ticker"] = doc["meta"].get("ticker") or t
+            doc["meta"]["input_hash"] = h
+            atomic_write_json(os.path.join(out_dir, f"{t}.json"), doc)   # bytes_written dahil
+            result[t] = doc
+            spent[t] += share + time.perf_counter() - t0
+    for t, dt in spent.items():
+        metrics.ticker_time(t, dt)
+    return result, [t for t, _, _ in todo]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--force", action="store_true", help="girdi hash önbelleğini yok say")
+    args = ap.parse_args()
+    docs, changed = run(read_tickers(args.tickers), force=args.force)
+    print(f"✓ quarterly: {len(docs)} ticker, {len(changed)} güncellendi → {QUARTERLY_DIR}/")
+
+if __name__ == "__main__":
+    main()
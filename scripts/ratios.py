@@ -0,0 +1,285 @@
+# scripts/ratios.py
+# -*- coding: utf-8 -*-
+"""
+Oran motoru: bilanco_json/*.json -> ratios/<TICKER>.json (+ Supabase 'ratios' tablosu)
+
+Tüm tickerlar ve dönemler tek geçişte, (ticker × kod × dönem) dizisi üzerinde
+numpy ile hesaplanır. Akış kalemlerinin TTM serileri scripts/quarterly.py'nin
+kaydettiği quarterly_json/ dosyalarından okunur; güncel snapshot/data.bin varsa
+ham değer tensörü oradan alınıp TTM aynı dönüşümle (ttm_from_ytd) hesaplanır. Sheets'teki RATIOS_ROW QUERY formüllerinin yerine geçer;
+Sheets, Supabase ve docs/ buradaki hazır sayıları okur.
+
+Önbellek: her ratios/<T>.json, girdi dosyalarının (bilanco + kap) hash'ini
+taşır. Hash değişmediyse o ticker yeniden hesaplanmaz.
+
+Kullanım:
+  python3 scripts/ratios.py                 # tickers.txt (yoksa bilanco_json/*)
+  python3 scripts/ratios.py ARCLK TUPRS     # belirli semboller
+  python3 scripts/ratios.py --force         # önbelleği yok say
+  python3 scripts/ratios.py --prices p.json # {"ARCLK": 152.3, ...} ile piyasa oranları
+Gereken ENV (DB yazmak / son fiyatları okumak için):
+  SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+"""
+
+import os, json, time, hashlib, argparse
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from merge_kap_bilanco import (
+    KAP_DIR, supabase_client_or_none, atomic_write_json, ensure_dir, turkish_to_number, period_to_date,
+)
+import metrics
+import quarterly
+from quarterly import build_tensor, period_index, period_keys, raw_values, read_bytes, read_tickers, series, shift
+
+RATIOS_DIR = "ratios"
+# Hesap mantığı değişince artır: tüm önbellek geçersizleşir.
+ENGINE_VERSION = 2
+
+# Kullanılan kalemler (bilanco_json kodları)
+REVENUE      = "3C"    # Satış Gelirleri (TTM)
+NET_INCOME   = "3L"    # Dönem Karı (TTM)
+OP_PROFIT    = "3DF"   # Faaliyet Karı (TTM)
+DEPRECIATION = "4B"    # Amortisman Giderleri (TTM)
+EQUITY       = "2N"    # Özkaynaklar
+TOTAL_ASSETS = "1BL"   # Toplam Varlıklar
+CASH         = "1AA"   # Nakit ve Nakit Benzerleri
+ST_DEBT      = "2AA"   # Kısa Vadeli Finansal Borçlar
+LT_DEBT      = "2BA"   # Uzun Vadeli Finansal Borçlar
+CODES = [REVENUE, NET_INCOME, OP_PROFIT, DEPRECIATION, EQUITY, TOTAL_ASSETS, CASH, ST_DEBT, LT_DEBT]
+
+# ratios/<T>.json içindeki dönem satırlarının kolonları (Supabase 'ratios' ile aynı)
+METRICS = [
+    "revenue_ttm", "net_income_ttm", "ebitda_ttm",
+    "equity", "total_assets", "cash", "total_debt", "net_debt",
+    "net_margin", "roe", "roa", "debt_to_equity", "net_debt_to_ebitda",
+    "revenue_growth_yoy", "net_income_growth_yoy",
+]
+MARKET_METRICS = ["price", "shares_outstanding", "market_cap", "ev", "pe", "pb", "ev_ebitda"]
+
+# ---------- yardımcılar ----------
+def input_hash(bil_raw: bytes, kap_raw: Optional[bytes]) -> str:
+    h = hashlib.sha256()
+    h.update(f"ratios-v{ENGINE_VERSION}\0".encode())
+    h.update(bil_raw)
+    h.update(b"\0")
+    h.update(kap_raw or b"")
+    return h.hexdigest()
+
+def shares_outstanding(kap: Optional[Dict[str, Any]]) -> Optional[float]:
+    for row in ((kap or {}).get("ownership") or {}).get("sermaye_5ustu") or []:
+        if str(row.get("Ortağın Adı-Soyadı/Ticaret Ünvanı", "")).strip().upper() == "TOPLAM":
+            v = turkish_to_number(row.get("Sermayedeki Payı(TL)"))
+            return float(v) if v is not None else None
+    return None
+
+def load_cached(ticker: str, out_dir: str = RATIOS_DIR) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(out_dir, f"{ticker}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+# ---------- vektörel hesap ----------
+def safe_div(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = a / b
+    return np.where(np.isfinite(out), out, np.nan)
+
+def compute(V: np.ndarray) -> Dict[str, np.ndarray]:
+    """V[ticker, kod, çeyrek] (akışlar TTM) -> metrik adı -> [ticker, çeyrek]"""
+    c = {code: V[:, i, :] for i, code in enumerate(CODES)}
+
+    revenue, net_income = c[REVENUE], c[NET_INCOME]
+    ebitda = c[OP_PROFIT] + np.nan_to_num(c[DEPRECIATION])
+    equity = c[EQUITY]
+    total_debt = np.nan_to_num(c[ST_DEBT]) + np.nan_to_num(c[LT_DEBT])
+    total_debt = np.where(np.isnan(c[ST_DEBT]) & np.isnan(c[LT_DEBT]), np.nan, total_debt)
+    net_debt = total_debt - np.nan_to_num(c[CASH])
+
+    return {
+        "revenue_ttm": revenue,
+        "net_income_ttm": net_income,
+        "ebitda_ttm": ebitda,
+        "equity": equity,
+        "total_assets": c[TOTAL_ASSETS],
+        "cash": c[CASH],
+        "total_debt": total_debt,
+        "net_debt": net_debt,
+        "net_margin": safe_div(net_income, revenue),
+        "roe": safe_div(net_income, equity),
+        "roa": safe_div(net_income, c[TOTAL_ASSETS]),
+        "debt_to_equity": safe_div(total_debt, equity),
+        "net_debt_to_ebitda": safe_div(net_debt, ebitda),
+        "revenue_growth_yoy": safe_div(revenue, shift(revenue, 4)) - 1,
+        "net_income_growth_yoy": safe_div(net_income - shift(net_income, 4), np.abs(shift(net_income, 4))),
+    }
+
+def market_ratios(latest: Dict[str, Any], price: Optional[float], shares: Optional[float]) -> Dict[str, Any]:
+    """Son dönem temel verisi + fiyat -> piyasa çarpanları."""
+    out: Dict[str, Any] = {k: None for k in MARKET_METRICS}
+    out["price"], out["shares_outstanding"] = price, shares
+    if price is None or not shares:
+        return out
+    mcap = price * shares
+    out["market_cap"] = mcap
+    if latest.get("net_debt") is not None:
+        out["ev"] = mcap + latest["net_debt"]
+    def div(a, b):
+        return a / b if a is not None and b not in (None, 0) else None
+    out["pe"] = div(mcap, latest.get("net_income_ttm"))
+    out["pb"] = div(mcap, latest.get("equity"))
+    out["ev_ebitda"] = div(out["ev"], latest.get("ebitda_ttm"))
+    return out
+
+def to_rows(metrics: Dict[str, np.ndarray], ti: int, q0: int, keys: List[str]) -> List[Dict[str, Any]]:
+    """Tek tickerın, kendi periodKeys'inde olan dönemleri için satırlar (eski -> yeni)."""
+    M = np.stack([metrics[m][ti] for m in METRICS])          # [metrik, çeyrek]
+    rows = []
+    for pk in keys:
+        col = M[:, period_index(pk) - q0]
+        if np.isnan(col).all():
+            continue
+        row = {"period": pk}
+        row.update({m: (None if np.isnan(v) else float(v)) for m, v in zip(METRICS, col)})
+        rows.append(row)
+    return rows
+
+# ---------- fiyatlar ----------
+def latest_prices_from_db(sb) -> Dict[str, float]:
+    """prices tablosundaki son snapshot (tek ts) -> {ticker: close}"""
+    last = sb.table("prices").select("ts").order("ts", desc=True).limit(1).execute().data or []
+    if not last:
+        return {}
+    data = sb.table("prices").select("ticker,close").eq("ts", last[0]["ts"]).execute().data or []
+    return {r["ticker"].upper(): float(r["close"]) for r in data if r.get("close") is not None}
+
+def load_prices(path: Optional[str], sb) -> Dict[str, float]:
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return {k.upper(): float(v) for k, v in json.load(f).items() if v is not None}
+    if sb is not None:
+        try:
+            return latest_prices_from_db(sb)
+        except Exception as e:
+            print(f"⚠ Son fiyatlar okunamadı: {e}")
+    return {}
+
+# ---------- DB ----------
+def db_rows(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for r in doc.get("periods") or []:
+        row = {"ticker": doc["ticker"], "period": period_to_date(r["period"])}
+        row.update({m: r.get(m) for m in METRICS})
+        rows.append(row)
+    if rows:
+        rows[-1].update({m: (doc.get("latest") or {}).get(m) for m in MARKET_METRICS})
+    return rows
+
+# ---------- ana akış ----------
+def run(tickers: List[str], force: bool = False, prices: Optional[Dict[str, float]] = None,
+        out_dir: str = RATIOS_DIR) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Tüm tickerlar için ratios dokümanlarını üretir. (dokümanlar, yeniden hesaplananlar)"""
+    prices = prices or {}
+    ensure_dir(out_dir)
+    docs: Dict[str, Dict[str, Any]] = {}
+    todo: List[Tuple[str, str, Dict[str, Any], Optional[float]]] = []
+    last_price: Dict[str, Optional[float]] = {}
+    spent: Dict[str, float] = {}   # ticker -> sn (okuma + toplu hesabın payı + yazma)
+
+    derived, _ = quarterly.run(tickers, force=force)
+    for t in tickers:
+        t0 = time.perf_counter()
+        try:
+            bil_raw = read_bytes(os.path.join(quarterly.BILANCO_DIR, f"{t}.json"))
+            if bil_raw is None:
+                continue
+            kap_raw = read_bytes(os.path.join(KAP_DIR, f"{t}.json"))
+            h = input_hash(bil_raw, kap_raw)
+            cached = load_cached(t, out_dir)
+            last_price[t] = ((cached or {}).get("latest") or {}).get("price")
+            if cached and not force and cached.get("input_hash") == h:
+                docs[t] = cached
+                continue
+            try:
+                bil = json.loads(bil_raw)
+                kap = json.loads(kap_raw) if kap_raw else None
+            except ValueError as e:
+                print(f"⚠ JSON okunamadı: {t} -> {e}")
+                continue
+            todo.append((t, h, bil, shares_outstanding(kap)))
+        finally:
+            spent[t] = time.perf_counter() - t0
+
+    if todo:
+        t0 = time.perf_counter()
+        def values(bil, code):
+            if quarterly.is_flow(code):
+                return series(derived.get(bil["meta"]["ticker"]) or {}, code, "ttm")
+            return raw_values(bil, code)
+        for t, _, bil, _ in todo:
+            bil.setdefault("meta", {})["ticker"] = t
+        got = quarterly.snapshot_tensor([t for t, _, _, _ in todo], CODES)
+        if got is not None:
+            # ham değerler snapshot'tan; akış kalemlerinin TTM'i quarterly ile aynı dönüşüm
+            V, q0 = got
+            flow = [i for i, c in enumerate(CODES) if quarterly.is_flow(c)]
+            V[:, flow] = quarterly.ttm_from_ytd(V[:, flow], q0)
+        else:
+            V, q0 = build_tensor([b for _, _, b, _ in todo], CODES, values)
+        computed = compute(V)
+        for ti, (t, h, bil, shares) in enumerate(todo):
+            periods = to_rows(computed, ti, q0, period_keys(bil))
+            docs[t] = {
+                "ticker": t,
+                "engine_version": ENGINE_VERSION,
+                "input_hash": h,
+                "currency": (bil.get("meta") or {}).get("currency"),
+                "shares_outstanding": shares,
+                "periods": periods,
+            }
+        share = (time.perf_counter() - t0) / len(todo)
+        for t, _, _, _ in todo:
+            spent[t] += share
+
+    # Piyasa çarpanları fiyata bağlı: her çalıştırmada son dönem üzerine yeniden kurulur.
+    recomputed = {t for t, _, _, _ in todo}
+    changed = []
+    for t, doc in docs.items():
+        last = (doc.get("periods") or [{}])[-1]
+        latest = {"period": last.get("period"), **{m: last.get(m) for m in METRICS}}
+        latest.update(market_ratios(latest, prices.get(t, last_price.get(t)), doc.get("shares_outstanding")))
+        if t in recomputed or doc.get("latest") != latest:
+            t0 = time.perf_counter()
+            doc["latest"] = latest
+            atomic_write_json(os.path.join(out_dir, f"{t}.json"), doc)   # bytes_written dahil
+            spent[t] = spent.get(t, 0.0) + time.perf_counter() - t0
+            changed.append(t)
+    for t, dt in spent.items():
+        metrics.ticker_time(t, dt)
+    return docs, changed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--force", action="store_true", help="girdi hash önbelleğini yok say")
+    ap.add_argument("--prices", help="{ticker: fiyat} JSON dosyası (yoksa Supabase prices son snapshot)")
+    ap.add_argument("--no-db", action="store_true", help="Supabase'e yazma")
+    args = ap.parse_args()
+
+    tickers = read_tickers(args.tickers)
+    sb = None if args.no_db else supabase_client_or_none()
+    prices = load_prices(args.prices, sb)
+
+    docs, changed = run(tickers, force=args.force, prices=prices)
+    print(f"✓ ratios: {len(docs)} ticker, {len(changed)} güncellendi → {RATIOS_DIR}/")
+
+    if sb is not None and changed:
+        rows = [r for t in changed for r in db_rows(docs[t])]
+        for i in range(0, len(rows), 1000):
+            sb.table("ratios").upsert(rows[i:i+1000], on_conflict="ticker,period").execute()
+        print(f"✓ {len(rows)} satır → ratios")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# scripts/screen.py
+# -*- coding: utf-8 -*-
+"""
+Kesitsel tarama (screening): tüm tickerlar üzerinde filtre + sıralama.
+
+Veri: ratios/<T>.json (scripts/ratios.py; bilanco_json'dan) + kap_json/<T>.json summary
+bloğu (sektör, pazar, endeksler; güncel snapshot/data.bin varsa oradan, scripts/snapshot.py). Bir kez derlenen indeks screen/index.npz'ye yazılır:
+  - metrik matrisi (ticker × metrik, son dönem) ve her metrik için sıralı indeks
+    (argsort + sıralı değerler; aralık filtreleri searchsorted ile),
+  - sektör / alt sektör / pazar / endeks için bitmap'ler (ticker başına bir bit),
+  - seçili metrikler için ardışık artış/azalış serileri (<metrik>_up / <metrik>_down).
+Girdiler değişmediyse indeks yeniden derlenmez (fingerprint).
+
+Kullanım:
+  python3 scripts/screen.py --build
+  python3 scripts/screen.py "roe>0.2" "market=ANA PAZAR" "sector=İMALAT" "net_debt_down>=4"
+  python3 scripts/screen.py "index=BIST 100" --sort pe --asc --top 20
+  python3 scripts/screen.py --list-categories
+API:
+  ix = ScreenIndex.load_or_build()
+  ix.screen(["roe>0.2", "net_debt_down>=4"], sector="İMALAT", sort="roe", limit=20)
+"""
+
+import os, re, sys, json, hashlib, argparse, time
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+
+from merge_kap_bilanco import KAP_DIR, ensure_dir
+import metrics
+import ratios
+import snapshot
+from kap_types import norm
+from quarterly import read_tickers
+
+SCREEN_DIR = "screen"
+INDEX_PATH = os.path.join(SCREEN_DIR, "index.npz")
+
+# Ardışık artış/azalış sayısı tutulan metrikler ve bakılan geçmiş uzunluğu
+TREND_METRICS = ["net_debt", "revenue_ttm", "net_income_ttm", "roe", "net_margin", "debt_to_equity"]
+TREND_WINDOW = 12
+
+CATEGORY_KINDS = ("sector", "sub", "market", "index")
+
+# ---------- derleme ----------
+def trailing_streaks(H: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """H[ticker, dönem] (eski -> yeni) -> sondan ardışık (artış, azalış) sayısı."""
+    if H.shape[1] < 2:
+        z = np.zeros(H.shape[0])
+        return z, z
+    d = np.diff(H, axis=1)[:, ::-1]                 # en yeni fark başta
+    up = np.cumprod(d > 0, axis=1).sum(axis=1)
+    down = np.cumprod(d < 0, axis=1).sum(axis=1)
+    return up.astype(float), down.astype(float)
+
+def source_fingerprint(tickers: List[str]) -> str:
+    """ratios/ ve kap_json/ dosyalarının (boyut, mtime) özeti; JSON parse etmeden."""
+    h = hashlib.sha256()
+    for t in sorted(tickers):
+        for path in (os.path.join(ratios.RATIOS_DIR, f"{t}.json"), os.path.join(KAP_DIR, f"{t}.json")):
+            try:
+                st = os.stat(path)
+                h.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+            except FileNotFoundError:
+                h.update(f"{path}\0-\n".encode())
+    return h.hexdigest()
+
+class ScreenIndex:
+    def __init__(self, tickers: List[str], metrics: List[str], values: np.ndarray,
+                 categories: Dict[str, np.ndarray], labels: Dict[str, str],
+                 periods: List[Optional[str]], fp: str = ""):
+        self.tickers = tickers
+        self.metrics = metrics
+        self.values = values                                  # [ticker, metrik]
+        self.categories = categories                          # "kind:NORM" -> packed bitmap
+        self.labels = labels                                  # "kind:NORM" -> orijinal etiket
+        self.periods = periods
+        self.fingerprint = fp
+        self.col = {m: i for i, m in enumerate(metrics)}
+        self.pos = {t: i for i, t in enumerate(tickers)}
+        # metrik başına sıralı indeks: NaN'lar sonda; n_valid ile kesilir
+        self.order = np.argsort(values, axis=0, kind="stable")
+        self.sorted = np.take_along_axis(values, self.order, axis=0)
+        self.n_valid = (~np.isnan(values)).sum(axis=0)
+
+    # --- derleme / kalıcılık ---
+    @classmethod
+    def build(cls, tickers: Optional[List[str]] = None) -> "ScreenIndex":
+        tickers = tickers or read_tickers([])
+        fp = source_fingerprint(tickers)
+        docs = {t: d for t in tickers if (d := ratios.load_cached(t)) is not None}
+        tickers = sorted(docs)
+        summaries = snapshot.kap_summaries(tickers)
+
+        base = ratios.METRICS + ratios.MARKET_METRICS
+        metrics = base + [f"{m}_{d}" for m in TREND_METRICS for d in ("up", "down")]
+        values = np.full((len(tickers), len(metrics)), np.nan)
+        H = {m: np.full((len(tickers), TREND_WINDOW), np.nan) for m in TREND_METRICS}
+        periods = []
+        for i, t in enumerate(tickers):
+            latest = docs[t].get("latest") or {}
+            periods.append(latest.get("period"))
+            values[i, :len(base)] = [np.nan if latest.get(m) is None else latest[m] for m in base]
+            hist = (docs[t].get("periods") or [])[-TREND_WINDOW:]
+            for m in TREND_METRICS:
+                row = [np.nan if r.get(m) is None else r[m] for r in hist]
+                if row:
+                    H[m][i, -len(row):] = row
+        for m in TREND_METRICS:
+            up, down = trailing_streaks(H[m])
+            values[:, metrics.index(f"{m}_up")] = up
+            values[:, metrics.index(f"{m}_down")] = down
+
+        masks: Dict[str, np.ndarray] = {}
+        labels: Dict[str, str] = {}
+        def mark(kind: str, label: Optional[str], i: int):
+            if not label: return
+            key = f"{kind}:{norm(label)}"
+            if key not in masks:
+                masks[key] = np.zeros(len(tickers), dtype=bool)
+                labels[key] = label
+            masks[key][i] = True
+        for i, t in enumerate(tickers):
+            s = summaries[t]
+            mark("sector", s.get("sektor_ana"), i)
+            for sub in s.get("sektor_alt_list") or []:
+                mark("sub", sub, i)
+            mark("market", s.get("islem_gordugu_pazar"), i)
+            for ix in s.get("dahil_oldugu_endeksler") or []:
+                mark("index", ix, i)
+        categories = {k: np.packbits(v) for k, v in masks.items()}
+        return cls(tickers, metrics, values, categories, labels, periods, fp)
+
+    def save(self, path: str = INDEX_PATH):
+        ensure_dir(os.path.dirname(path) or ".")
+        meta = {"tickers": self.tickers, "metrics": self.metrics, "periods": self.periods,
+                "labels": self.labels, "fingerprint": self.fingerprint}
+        cat_keys = sorted(self.categories)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, values=self.values,
+                 categories=np.stack([self.categories[k] for k in cat_keys]) if cat_keys
+                            else np.zeros((0, 0), dtype=np.uint8),
+                 meta=np.frombuffer(json.dumps({**meta, "category_keys": cat_keys}, ensure_ascii=False).encode(), dtype=np.uint8))
+        os.replace(tmp, path)
+        metrics.bytes_written(path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "ScreenIndex":
+        with np.load(path) as z:
+            meta = json.loads(z["meta"].tobytes().decode())
+            cats = {k: z["categories"][i] for i, k in enumerate(meta["category_keys"])}
+            return cls(meta["tickers"], meta["metrics"], z["values"], cats,
+                       meta["labels"], meta["periods"], meta["fingerprint"])
+
+    @classmethod
+    def load_or_build(cls, path: str = INDEX_PATH, rebuild: bool = False) -> "ScreenIndex":
+        """Kayıtlı indeksi açar; girdiler değiştiyse yeniden derleyip kaydeder."""
+        tickers = read_tickers([])
+        if not rebuild and os.path.isfile(path):
+            try:
+                cached = cls.load(path)
+                if cached.fingerprint == source_fingerprint(tickers):
+                    return cached
+            except Exception as e:
+                print(f"⚠ screen indeksi okunamadı: {e}")
+        fresh = cls.build(tickers)
+        fresh.save(path)
+        return fresh
+
+    # --- sorgu ---
+    def category_mask(self, kind: str, label: str) -> np.ndarray:
+        """Etiket tam eşleşme; yoksa alt dize eşleşmesi (tüm eşleşenlerin birleşimi)."""
+        want = norm(label)
+        key = f"{kind}:{want}"
+        n = len(self.tickers)
+        if key in self.categories:
+            return np.unpackbits(self.categories[key], count=n).astype(bool)
+        out = np.zeros(n, dtype=bool)
+        for k, bits in self.categories.items():
+            if k.startswith(kind + ":") and want in k[len(kind) + 1:]:
+                out |= np.unpackbits(bits, count=n).astype(bool)
+        return out
+
+    def range_mask(self, metric: str, op: str, x: float) -> np.ndarray:
+        if metric not in self.col:
+            raise KeyError(f"bilinmeyen metrik: {metric}")
+        j = self.col[metric]
+        nv = int(self.n_valid[j])
+        s, order = self.sorted[:nv, j], self.order[:nv, j]
+        if op == ">":    ids = order[np.searchsorted(s, x, "right"):]
+        elif op == ">=": ids = order[np.searchsorted(s, x, "left"):]
+        elif op == "<":  ids = order[:np.searchsorted(s, x, "left")]
+        elif op == "<=": ids = order[:np.searchsorted(s, x, "right")]
+        elif op == "==": ids = order[np.searchsorted(s, x, "left"):np.searchsorted(s, x, "right")]
+        else: raise ValueError(f"bilinmeyen operatör: {op}")
+        m = np.zeros(len(self.tickers), dtype=bool)
+        m[ids] = True
+        return m
+
+    def screen(self, filters: Optional[List[Union[str, Tuple[str, str, float]]]] = None,
+               sector: Optional[str] = None, sub: Optional[str] = None,
+               market: Optional[str] = None, index: Optional[str] = None,
+               sort: Optional[str] = None, desc: bool = True, limit: Optional[int] = None,
+               columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        mask = np.ones(len(self.tickers), dtype=bool)
+        for kind, label in (("sector", sector), ("sub", sub), ("market", market), ("index", index)):
+            if label:
+                mask &= self.category_mask(kind, label)
+        for f in filters or []:
+            kind, a, b = parse_filter(f) if isinstance(f, str) else ("range", f[0], (f[1], f[2]))
+            if kind == "category":
+                mask &= self.category_mask(a, b)
+            else:
+                op, x = b
+                mask &= self.range_mask(a, op, x)
+
+        if sort:
+            j = self.col[sort]
+            nv = int(self.n_valid[j])
+            ranked = self.order[:nv, j]
+            if desc:
+                ranked = ranked[::-1]
+            ids = ranked[mask[ranked]]
+        else:
+            ids = np.flatnonzero(mask)
+        if limit:
+            ids = ids[:limit]
+
+        cols = columns or ([sort] if sort else [])
+        out = []
+        for i in ids:
+            row: Dict[str, Any] = {"ticker": self.tickers[i], "period": self.periods[i]}
+            for c in cols:
+                v = self.values[i, self.col[c]]
+                row[c] = None if np.isnan(v) else float(v)
+            out.append(row)
+        return out
+
+_FILTER_RE = re.compile(r"^\s*([A-Za-z_][\w]*)\s*(>=|<=|==|=|>|<)\s*(.+?)\s*$")
+
+def parse_filter(expr: str):
+    """'roe>0.2' -> ('range', 'roe', ('>', 0.2)); 'sector=İMALAT' -> ('category', 'sector', 'İMALAT')"""
+    m = _FILTER_RE.match(expr)
+    if not m:
+        raise ValueError(f"filtre anlaşılamadı: {expr!r}")
+    name, op, val = m.groups()
+    if name in CATEGORY_KINDS:
+        if op not in ("=", "=="):
+            raise ValueError(f"{name} için yalnızca '=' desteklenir: {expr!r}")
+        return "category", name, val.strip("\"'")
+    return "range", name, ("==" if op == "=" else op, float(val))
+
+def main():
+    ap = argparse.ArgumentParser(description="Tüm tickerlar üzerinde kesitsel tarama")
+    ap.add_argument("filters", nargs="*", help="ör. roe>0.2  market=ANA PAZAR  net_debt_down>=4")
+    ap.add_argument("--build", action="store_true", help="indeksi (gerekirse) derle ve çık")
+    ap.add_argument("--rebuild", action="store_true", help="fingerprint'e bakmadan yeniden derle")
+    ap.add_argument("--sort", help="sıralama metriği")
+    ap.add_argument("--asc", action="store_true", help="artan sırala (varsayılan azalan)")
+    ap.add_argument("--top", type=int, help="ilk N sonuç")
+    ap.add_argument("--cols", help="virgülle ayrılmış ek kolonlar")
+    ap.add_argument("--json", action="store_true", help="JSON çıktı")
+    ap.add_argument("--list-categories", action="store_true")
+    ap.add_argument("--list-metrics", action="store_true")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    ix = ScreenIndex.load_or_build(rebuild=args.rebuild)
+    t1 = time.perf_counter()
+    if args.build:
+        print(f"✓ screen indeksi: {len(ix.tickers)} ticker, {len(ix.metrics)} metrik, "
+              f"{len(ix.categories)} kategori ({(t1 - t0)*1000:.0f} ms) → {INDEX_PATH}")
+        return
+    if args.list_categories:
+        for k in sorted(ix.categories):
+            print(f"{k.split(':', 1)[0]:7s} {ix.labels[k]}")
+        return
+    if args.list_metrics:
+        print("\n".join(ix.metrics))
+        return
+
+    cols = [c for c in (args.cols or "").split(",") if c]
+    for f in args.filters:
+        kind, name, _ = parse_filter(f)
+        if kind == "range" and name not in cols:
+            cols.append(name)
+    if args.sort and args.sort not in cols:
+        cols.insert(0, args.sort)
+    try:
+        rows = ix.screen(args.filters, sort=args.sort, desc=not args.asc, limit=args.top, columns=cols)
+    except (KeyError, ValueError) as e:
+        print(f"✗ {e}", file=sys.stderr); sys.exit(2)
+    t2 = time.perf_counter()
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        for r in rows:
+            print("  ".join([f"{r['ticker']:6s}", f"{r['period'] or '-':8s}"] +
+                            [f"{c}={'-' if r[c] is None else f'{r[c]:.4g}'}" for c in cols]))
+    print(f"{len(rows)} sonuç (indeks {(t1 - t0)*1000:.0f} ms, sorgu {(t2 - t1)*1000:.2f} ms)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# scripts/search_index.py
+# -*- coding: utf-8 -*-
+"""
+Şirket arama indeksi (docs/search.json): statik istemcide anında typeahead için.
+
+build_index.py her çalıştırmada final/<T>.json'lardaki kap bloğundan üretir; istemci
+şirket dokümanlarını indirmeden yalnızca bu dosyayla arar. Ünvan (title) kap.summary.unvan'dan
+gelir; kap_batch_from_tickerfile.py onu KAP şirket listesinden kazır (bu alandan önce
+kazınmış kap_json dosyalarında yoktur, o şirketler ünvanla bulunmaz).
+
+Alanlar (FIELDS, bit sırası): ticker, title, sector (sektor_ana + sektor_alt),
+sub (sektor_alt_list), index (dahil_oldugu_endeksler), address (merkez_adresi).
+
+Katlama (fold, kap_types.py): Türkçe büyük harf (i→İ, ı→I), aksanlar atılır
+(Ş→S, İ→I, Ğ→G, Ç→C, Ö→O, Ü→U), harf-rakam dışı her şey ayraç. Sorgu da aynı
+şekilde katlanır: "şişe", "SISE", "Şİşe" aynı terim.
+
+search.json:
+  fields   : alan adları (posting maskesindeki bit sırası)
+  docs     : [[ticker, unvan, sektör, pazar], ...]        (doküman no = sıra)
+  terms    : katlanmış terimler, sıralı                     (önek araması: ikili arama)
+  postings : terim başına [Δdoc, maske, Δdoc, maske, ...]  (doküman no'ları farkla kodlu)
+  grams    : {trigram: [Δterim, ...]}                       (bulanık eşleşme; "^" başlangıç işareti)
+
+Sorgu (SearchIndex.search ile aynı algoritma; istemci bunu taklit eder):
+  1) sorgu katlanır, kelimelere bölünür;
+  2) her kelime için terimler: tam eşleşme (3), önek (2); hiçbiri yoksa ve kelime
+     >= 3 harfse trigram Dice benzerliği >= FUZZY_MIN olanlar (benzerlik × 1.5);
+  3) doküman skoru = kelime başına en iyi (terim skoru × alan ağırlığı) toplamı;
+     tüm kelimeleri eşleşen dokümanlar, skora göre sıralı.
+
+Kullanım:
+  python3 scripts/search_index.py "şişe cam"          # docs/search.json üzerinde dene
+  python3 scripts/search_index.py "bist 30 enerji" --limit 5
+"""
+
+import os, sys, json, bisect, argparse, time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from kap_types import fold
+
+SEARCH_PATH = os.path.join("docs", "search.json")
+VERSION = 1
+FIELDS = ["ticker", "title", "sector", "sub", "index", "address"]
+FIELD_WEIGHT = [5.0, 3.0, 2.0, 2.0, 1.0, 0.5]
+FUZZY_MIN = 0.5
+
+def grams(term: str) -> List[str]:
+    t = "^" + term
+    return sorted({t[i:i + 3] for i in range(max(1, len(t) - 2))})
+
+def doc_fields(ticker: str, kap: Dict[str, Any], title: Optional[str] = None) -> Dict[str, List[str]]:
+    """final'in kap bloğundan alan -> ham metinler."""
+    summary = kap.get("summary") or {}
+    general = kap.get("general") or {}
+    return {
+        "ticker": [ticker],
+        "title": [title] if title else [],
+        "sector": [summary.get("sektor_ana"), summary.get("sektor_alt")],
+        "sub": list(summary.get("sektor_alt_list") or []),
+        "index": list(summary.get("dahil_oldugu_endeksler") or []),
+        "address": [general.get("merkez_adresi")],
+    }
+
+def _delta(xs: Iterable[int]) -> List[int]:
+    out, prev = [], 0
+    for x in xs:
+        out.append(x - prev)
+        prev = x
+    return out
+
+def _undelta(xs: List[int]) -> List[int]:
+    out, acc = [], 0
+    for x in xs:
+        acc += x
+        out.append(acc)
+    return out
+
+def build(rows: List[Tuple[str, Dict[str, Any], Optional[str]]], generated_at: Optional[str] = None) -> Dict[str, Any]:
+    """rows: [(ticker, kap, unvan)] -> search.json içeriği."""
+    docs, post = [], {}
+    for doc_id, (ticker, kap, title) in enumerate(sorted(rows, key=lambda r: r[0])):
+        kap = kap or {}
+        summary = kap.get("summary") or {}
+        docs.append([ticker, title, summary.get("sektor_ana"), summary.get("islem_gordugu_pazar")])
+        for bit, field in enumerate(FIELDS):
+            for text in doc_fields(ticker, kap, title)[field]:
+                for term in fold(text).split():
+                    masks = post.setdefault(term, {})
+                    masks[doc_id] = masks.get(doc_id, 0) | (1 << bit)
+    terms = sorted(post)
+    postings = []
+    for term in terms:
+        ids = sorted(post[term])
+        flat = []
+        for d, delta in zip(ids, _delta(ids)):
+            flat += [delta, post[term][d]]
+        postings.append(flat)
+    gram_map: Dict[str, List[int]] = {}
+    for i, term in enumerate(terms):
+        for g in grams(term):
+            gram_map.setdefault(g, []).append(i)
+    return {"version": VERSION, "generated_at": generated_at, "fields": FIELDS, "docs": docs,
+            "terms": terms, "postings": postings,
+            "grams": {g: _delta(ids) for g, ids in sorted(gram_map.items())}}
+
+def write(path: str, index: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+class SearchIndex:
+    """search.json için başvuru sorgu uygulaması (istemci aynısını yapar)."""
+    def __init__(self, data: Dict[str, Any]):
+        self.docs = data["docs"]
+        self.terms = data["terms"]
+        self._postings = data["postings"]
+        self._grams = data["grams"]
+        self._cache: Dict[int, List[Tuple[int, int]]] = {}
+
+    @classmethod
+    def load(cls, path: str = SEARCH_PATH) -> "SearchIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def postings(self, ti: int) -> List[Tuple[int, int]]:
+        p = self._cache.get(ti)
+        if p is None:
+            flat = self._postings[ti]
+            p = self._cache[ti] = list(zip(_undelta(flat[0::2]), flat[1::2]))
+        return p
+
+    def _prefix(self, word: str) -> range:
+        lo = bisect.bisect_left(self.terms, word)
+        hi = bisect.bisect_left(self.terms, word + "\uffff")
+        return range(lo, hi)
+
+    def _fuzzy(self, word: str) -> List[Tuple[int, float]]:
+        qg = grams(word)
+        counts: Dict[int, int] = {}
+        for g in qg:
+            for ti in _undelta(self._grams.get(g) or []):
+                counts[ti] = counts.get(ti, 0) + 1
+        out = []
+        for ti, c in counts.items():
+            dice = 2 * c / (len(qg) + len(grams(self.terms[ti])))
+            if dice >= FUZZY_MIN:
+                out.append((ti, dice))
+        return out
+
+    def matches(self, word: str) -> Dict[int, float]:
+        """Kelime -> {terim no: terim skoru}."""
+        out: Dict[int, float] = {}
+        pre = self._prefix(word)
+        for ti in pre:
+            out[ti] = 3.0 if self.terms[ti] == word else 2.0
+        if not out and len(word) >= 3:
+            for ti, sim in self._fuzzy(word):
+                out[ti] = sim * 1.5
+        return out
+
+    def search(self, q: str, limit: int = 10) -> List[Dict[str, Any]]:
+        words = fold(q).split()
+        if not words:
+            return []
+        total: Optional[Dict[int, float]] = None
+        for w in words:
+            best: Dict[int, float] = {}
+            for ti, ts in self.matches(w).items():
+                for d, mask in self.postings(ti):
+                    fw = max(FIELD_WEIGHT[b] for b in range(len(FIELD_WEIGHT)) if mask >> b & 1)
+                    s = ts * fw
+                    if s > best.get(d, 0.0):
+                        best[d] = s
+            total = best if total is None else {d: total[d] + s for d, s in best.items() if d in total}
+            if not total:
+                return []
+        ranked = sorted(total.items(), key=lambda kv: (-kv[1], self.docs[kv[0]][0]))[:limit]
+        return [{"ticker": self.docs[d][0], "title": self.docs[d][1], "sector": self.docs[d][2],
+                 "market": self.docs[d][3], "score": round(s, 3)} for d, s in ranked]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("query")
+    ap.add_argument("--path", default=SEARCH_PATH)
+    ap.add_argument("--limit", type=int, default=10)
+    a = ap.parse_args()
+    t0 = time.perf_counter()
+    ix = SearchIndex.load(a.path)
+    t1 = time.perf_counter()
+    res = ix.search(a.query, a.limit)
+    t2 = time.perf_counter()
+    for r in res:
+        print(f"{r['ticker']:8s} {r['score']:7.2f}  {r['sector'] or '-'} / {r['market'] or '-'}  {r['title'] or ''}")
+    print(f"({len(res)} sonuç; yükleme {(t1 - t0) * 1000:.1f} ms, sorgu {(t2 - t1) * 1000:.2f} ms)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
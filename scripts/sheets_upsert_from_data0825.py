@@ -1,8 +1,12 @@
-import os, json, re, time, sys
+import os, json, re, time, sys, argparse
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 import gspread
 
+import metrics
+from bilanco_stream import open_values
+from jobqueue import JobQueue, files_hash, work
+
 # == Sabit başlıklar ==
 INFO_HEADERS = [
     "ticker","full_name","description","website","sector","sector_main","sector_sub",
@@ -20,11 +24,32 @@ RATIOS_ROW = [
     '=IFERROR(RATIOS!B2 / RATIOS!C2,)',
 ]
 
+# Tek çalışma kitabı (consolidated) modu: tüm tickerlar tek dosyada, uzun format
+FIN_LONG_HEADERS = ["ticker"] + FIN_HEADERS
+RATIOS_LONG_HEADERS = ["ticker"] + RATIOS_HEADERS
+DEFAULT_WORKBOOK = "data0825"
+DEFAULT_ID_CACHE = os.path.join(".cache", "sheets_ids.json")
+# Google Sheets tek dosyada 10M hücre sınırı var; 550 ticker × 147 kod × tüm
+# tarihçe bunu aşar. Consolidated modda FIN son N dönemle sınırlanır.
+DEFAULT_FIN_PERIODS = 8
+WRITE_CHUNK_ROWS = 20000
+
 def get_client():
     creds = os.environ.get("GOOGLE_CREDENTIALS")
     if not creds:
         print("ERROR: GOOGLE_CREDENTIALS is missing.", file=sys.stderr); sys.exit(1)
-    return gspread.service_account_from_dict(json.loads(creds))
+    return count_requests(gspread.service_account_from_dict(json.loads(creds)))
+
+def count_requests(gc):
+    """Sheets/Drive API isteklerini say ve süresini ölç (metrics, api=sheets)."""
+    target = getattr(gc, "http_client", gc)   # gspread>=6: HTTPClient, <6: Client
+    orig = target.request
+    def request(*a, **k):
+        metrics.inc("api_calls", api="sheets")
+        with metrics.timer("api_seconds", api="sheets"):
+            return orig(*a, **k)
+    target.request = request
+    return gc
 
 def list_tickers(root: Path) -> List[str]:
     txt = root / "tickers.txt"
@@ -40,24 +65,83 @@ def list_tickers(root: Path) -> List[str]:
     return sorted(kap & fin)
 
 def period_key_to_date(pk: str) -> str:
-    m = re.match(r"^(\d{4})[/-]Q?([1-4])$", pk.strip(), re.I)
+    m = re.match(r"^(\d{4})[/-]Q([1-4])$", pk.strip(), re.I)
     if m:
         y, q = int(m.group(1)), int(m.group(2))
         mmdd = {1:"03-31",2:"06-30",3:"09-30",4:"12-31"}[q]
         return f"{y}-{mmdd}"
+    # bilanco_json formatı: "YYYY/AY" (ör. 2025/6 -> 2025-06-30)
+    m = re.match(r"^(\d{4})[/-](3|6|9|12)$", pk.strip())
+    if m:
+        y, mo = int(m.group(1)), int(m.group(2))
+        mmdd = {3:"03-31",6:"06-30",9:"09-30",12:"12-31"}[mo]
+        return f"{y}-{mmdd}"
     return pk  # zaten YYYY-MM-DD ise/diff formatta ise olduğu gibi bırak
 
-def ensure_spreadsheet(gc, title: str, share_with: Optional[str]):
-    try:
-        sp = gc.open(title); created = False
-    except gspread.SpreadsheetNotFound:
-        sp = gc.create(title); created = True
-        sp.batch_update({"requests":[{"updateSpreadsheetProperties":{
-            "properties":{"timeZone":"Europe/Istanbul","locale":"tr_TR"},
-            "fields":"timeZone,locale"}}]})
-        if share_with:
-            try: sp.share(share_with, perm_type="user", role="writer", notify=False)
-            except Exception as e: print(f"[WARN] share failed for {title}: {e}")
+class SpreadsheetIdCache:
+    """title -> spreadsheet id eşlemesi. gc.open(title) her seferinde Drive
+    araması yapar; id biliniyorsa open_by_key doğrudan açar."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.ids: Dict[str, str] = {}
+        self.dirty = False
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.ids = json.load(f) or {}
+            except Exception as e:
+                print(f"[WARN] id cache okunamadı ({path}): {e}")
+
+    def get(self, title: str) -> Optional[str]:
+        return self.ids.get(title)
+
+    def put(self, title: str, key: str):
+        if self.ids.get(title) != key:
+            self.ids[title] = key
+            self.dirty = True
+
+    def drop(self, title: str):
+        if self.ids.pop(title, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.ids, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+def ensure_spreadsheet(gc, title: str, share_with: Optional[str], id_cache: Optional[SpreadsheetIdCache] = None):
+    sp = None; created = False
+    key = id_cache.get(title) if id_cache else None
+    if key:
+        try:
+            sp = gc.open_by_key(key)
+        except gspread.SpreadsheetNotFound:
+            id_cache.drop(title); sp = None
+        except gspread.exceptions.APIError as e:
+            # silinmiş / erişim kaldırılmış -> başlıkla aramaya düş; 429 / 5xx geçicidir,
+            # önbellekteki id korunur ve hata yukarı iletilir (iş kuyruğu tekrar dener)
+            if getattr(getattr(e, "response", None), "status_code", None) not in (403, 404):
+                raise
+            id_cache.drop(title); sp = None
+    if sp is None:
+        try:
+            sp = gc.open(title)
+        except gspread.SpreadsheetNotFound:
+            sp = gc.create(title); created = True
+            sp.batch_update({"requests":[{"updateSpreadsheetProperties":{
+                "properties":{"timeZone":"Europe/Istanbul","locale":"tr_TR"},
+                "fields":"timeZone,locale"}}]})
+            if share_with:
+                try: sp.share(share_with, perm_type="user", role="writer", notify=False)
+                except Exception as e: print(f"[WARN] share failed for {title}: {e}")
+    if id_cache is not None:
+        id_cache.put(title, sp.id)
     return sp, created
 
 def get_or_create(sp, title: str, rows=1000, cols=26):
@@ -87,19 +171,31 @@ def upsert_INFO(sp, ticker: str):
     if not ws.acell("I2").value:
         ws.update_acell("I2", "BIST")  # market varsayılan
 
-def upsert_FIN(sp, fin: Dict[str,Any]):
-    group = fin.get("group",""); currency = fin.get("currency","")
-    pkeys = fin.get("periodKeys") or fin.get("period_keys") or []
-    items = fin.get("items") or {}
+def fin_rows(fin, last_n: Optional[int] = None) -> List[List[Any]]:
+    """bilanco_json dokümanı (dict) ya da dosya yolundan FIN satırları (period_end desc).
+    Yol verilirse dosya akışla okunur (bilanco_stream), doküman belleğe alınmaz.
+    Alanlar bilanco_json'da "meta" altında; eski düz format da desteklenir."""
+    src = open_values(fin)
     rows: List[List[Any]] = []
-    for code, meta in items.items():
-        tr = meta.get("tr") or meta.get("name_tr") or ""
-        en = meta.get("en") or meta.get("name_en") or ""
-        values = meta.get("values") or {}
-        for pk in pkeys:
-            if pk in values and values[pk] is not None:
-                rows.append([period_key_to_date(pk), code, tr, en, values[pk], currency, group])
+    keep, dates = None, {}
+    for code, pk, value in src:
+        if keep is None:
+            head = src.meta
+            group = head.get("group",""); currency = head.get("currency","")
+            pkeys = head.get("periodKeys") or head.get("period_keys") or []
+            keep = set(pkeys[-last_n:] if last_n else pkeys)
+        if pk not in keep:
+            continue
+        d = dates.get(pk)
+        if d is None:
+            d = dates[pk] = period_key_to_date(pk)
+        tr, en = src.labels.get(code, ("", ""))
+        rows.append([d, code, tr, en, value, currency, group])
     rows.sort(key=lambda r: r[0], reverse=True)
+    return rows
+
+def upsert_FIN(sp, fin):
+    rows = fin_rows(fin)
     ws, _ = get_or_create(sp, "FIN", rows=max(2000, len(rows)+10), cols=8)
     ws.clear()
     ws.update("A1:G1", [FIN_HEADERS])
@@ -110,20 +206,168 @@ def upsert_FIN(sp, fin: Dict[str,Any]):
             chunk = rows[i:i+step]
             ws.update(f"A{2+i}:G{1+i+len(chunk)}", chunk)
 
-def run_one(gc, root: Path, ticker: str, share_with: Optional[str]):
+def ratios_values(doc: Optional[Dict[str,Any]]) -> Optional[List[Any]]:
+    """ratios/<T>.json (scripts/ratios.py) son dönemi -> RATIOS_HEADERS sırasıyla değerler.
+    P/E canlı fiyata bağlı olduğu için formülde kalır (None döner)."""
+    latest = (doc or {}).get("latest") or {}
+    if not latest.get("period"):
+        return None
+    return [latest.get("revenue_ttm"), latest.get("net_income_ttm"), latest.get("equity"),
+            None, latest.get("net_margin"), latest.get("roe")]
+
+def upsert_RATIOS(sp, doc: Optional[Dict[str,Any]]):
+    """QUERY formülleri yerine hazır oranları yazar (D2 = P/E formülü korunur)."""
+    vals = ratios_values(doc)
+    if vals is None:
+        return
+    vals = ["" if v is None else v for v in vals]
+    ws, _ = get_or_create(sp, "RATIOS", rows=20, cols=8)
+    ws.batch_update([
+        {"range": "A2:C2", "values": [vals[0:3]]},
+        {"range": "E2:F2", "values": [vals[4:6]]},
+    ])
+
+def run_one(gc, root: Path, ticker: str, share_with: Optional[str], id_cache: Optional[SpreadsheetIdCache] = None):
     kap_path = root/"kap_json"/f"{ticker}.json"
     fin_path = root/"bilanco_json"/f"{ticker}.json"
     if not fin_path.exists():
         print(f"[SKIP] {ticker}: bilanco_json yok"); return
     # KAP JSON'u şu an Sheets'e yazmıyoruz; INFO alanlarına ileride map edebiliriz.
-    fin = json.loads(fin_path.read_text(encoding="utf-8"))
+    fin = str(fin_path)   # upsert_FIN -> fin_rows dosyayı akışla okur
 
-    sp, created = ensure_spreadsheet(gc, ticker, share_with)
+    sp, created = ensure_spreadsheet(gc, ticker, share_with, id_cache)
     if created: init_prices_ratios(sp)
     upsert_INFO(sp, ticker)
     upsert_FIN(sp, fin)
+    upsert_RATIOS(sp, read_json_or_none(root/"ratios"/f"{ticker}.json"))
+
+# ---------- consolidated (tek çalışma kitabı) ----------
+def read_json_or_none(path: Path) -> Optional[Dict[str,Any]]:
+    if not path.exists(): return None
+    try: return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[WARN] JSON okunamadı: {path} -> {e}"); return None
+
+def _tr_num(s) -> Optional[float]:
+    if s is None: return None
+    if isinstance(s, (int, float)): return s
+    s = re.sub(r"\s+", "", str(s).replace(".", "").replace(",", "."))
+    try: return float(s)
+    except ValueError: return None
+
+def info_row(ticker: str, kap: Optional[Dict[str,Any]], updated_at: str) -> List[Any]:
+    """INFO_HEADERS sırasıyla tek satır (KAP özetinden doldurulabilenler)."""
+    kap = kap or {}
+    summary = kap.get("summary") or {}
+    general = kap.get("general") or {}
+    ownership = kap.get("ownership") or {}
+    holders = ownership.get("sermaye_5ustu") or []
+
+    shares = None
+    owners = []
+    for r in holders:
+        name = str(r.get("Ortağın Adı-Soyadı/Ticaret Ünvanı","")).strip()
+        if name.upper() == "TOPLAM":
+            shares = _tr_num(r.get("Sermayedeki Payı(TL)"))
+        elif name:
+            owners.append(f"{name} ({r.get('Sermayedeki Payı(%)','')})")
+    votes = [f"{p.get('alan','')}: {p.get('deger','')}" for p in ((kap.get("oy_haklari") or {}).get("pairs") or [])]
+    row = {
+        "ticker": ticker,
+        "website": summary.get("internet_adresi"),
+        "sector": summary.get("sektoru_raw"),
+        "sector_main": summary.get("sektor_ana"),
+        "sector_sub": summary.get("sektor_alt"),
+        "address": general.get("merkez_adresi"),
+        "market": summary.get("islem_gordugu_pazar") or "BIST",
+        "indices": ", ".join(summary.get("dahil_oldugu_endeksler") or []),
+        "shares_outstanding": shares,
+        "free_float": _tr_num(ownership.get("fiili_dolasim_oran")),
+        "kap_denetim_kurulusu": summary.get("denetim_kurulusu"),
+        "kap_sermaye_5ustu_csv": "; ".join(owners),
+        "kap_yk_sayisi": len(kap.get("board_members") or []) or None,
+        "kap_oy_haklari_csv": "; ".join(votes),
+        "updated_at": updated_at,
+    }
+    return [("" if row.get(h) is None else row.get(h)) for h in INFO_HEADERS]
+
+def ratios_row(ticker: str, row_no: int, doc: Optional[Dict[str,Any]]) -> List[Any]:
+    """ratios/<T>.json varsa hazır sayılar, yoksa QUERY formülleri."""
+    formulas = ratios_formula_row(ticker, row_no)
+    vals = ratios_values(doc)
+    if vals is None:
+        return formulas
+    return [ticker] + [formulas[1 + i] if i == 3 else ("" if v is None else v) for i, v in enumerate(vals)]
+
+def ratios_formula_row(ticker: str, row_no: int) -> List[Any]:
+    """RATIOS_ROW'un uzun-format FIN (A=ticker, B=period_end, C=code, F=value) karşılığı."""
+    q = lambda code, lim: f'QUERY(FIN!A:F,"select F where A=\'{ticker}\' and C=\'{code}\' order by B desc limit {lim}",0)'
+    info = f'INDEX(INFO!K:K,MATCH(A{row_no},INFO!A:A,0))'
+    return [
+        ticker,
+        f'=IFERROR(SUM({q("3C", 4)}),)',
+        f'=IFERROR(SUM({q("3L", 4)}),)',
+        f'=IFERROR(INDEX({q("2N", 1)},1,1),)',
+        f'=IFERROR(INDEX(GOOGLEFINANCE("BIST:"&A{row_no},"price"),2,2) * {info} / C{row_no},)',
+        f'=IFERROR(C{row_no} / B{row_no},)',
+        f'=IFERROR(C{row_no} / D{row_no},)',
+    ]
+
+def write_table(sp, title: str, headers: List[str], rows: List[List[Any]], chunk_rows: int = WRITE_CHUNK_ROWS):
+    """Sayfayı tek seferde boyutlandırıp başlık+veriyi büyük parçalarla yazar."""
+    ws, _ = get_or_create(sp, title, rows=len(rows)+1, cols=len(headers))
+    ws.clear()
+    ws.resize(rows=max(2, len(rows)+1), cols=len(headers))
+    data = [headers] + rows
+    for i in range(0, len(data), chunk_rows):
+        ws.update(f"A{1+i}", data[i:i+chunk_rows], value_input_option="USER_ENTERED")
+    return ws
+
+def run_consolidated(gc, root: Path, tickers: List[str], share_with: Optional[str],
+                     id_cache: SpreadsheetIdCache, title: str, fin_periods: int):
+    info: List[List[Any]] = []
+    fin: List[List[Any]] = []
+    ratios: List[List[Any]] = []
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    for i, t in enumerate(tickers, 1):
+        bil_path = root/"bilanco_json"/f"{t}.json"
+        if not bil_path.exists():
+            print(f"[SKIP] {t}: bilanco_json yok"); continue
+        try:
+            rows = fin_rows(str(bil_path), fin_periods)
+        except ValueError as e:
+            print(f"[WARN] JSON okunamadı: {bil_path} -> {e}"); continue
+        kap = read_json_or_none(root/"kap_json"/f"{t}.json")
+        info.append(info_row(t, kap, now))
+        fin.extend([t] + r for r in rows)
+        ratios.append(ratios_row(t, len(ratios) + 2, read_json_or_none(root/"ratios"/f"{t}.json")))
+    if not info:
+        print("Yazılacak ticker yok."); return
+
+    sp, _ = ensure_spreadsheet(gc, title, share_with, id_cache)
+    write_table(sp, "INFO", INFO_HEADERS, info)
+    write_table(sp, "FIN", FIN_LONG_HEADERS, fin)
+    write_table(sp, "RATIOS", RATIOS_LONG_HEADERS, ratios)
+    print(f"✓ {title}: INFO={len(info)} FIN={len(fin)} RATIOS={len(ratios)} satır")
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["per-ticker", "consolidated"],
+                    default=os.environ.get("SHEETS_MODE", "per-ticker"),
+                    help="per-ticker: her sembol ayrı dosya (varsayılan); consolidated: tek çalışma kitabı")
+    ap.add_argument("--workbook", default=os.environ.get("SHEETS_WORKBOOK", DEFAULT_WORKBOOK),
+                    help="consolidated modda çalışma kitabı başlığı")
+    ap.add_argument("--fin-periods", type=int, default=DEFAULT_FIN_PERIODS,
+                    help="consolidated modda FIN'e yazılacak son dönem sayısı (0 = hepsi)")
+    ap.add_argument("--id-cache", default=os.environ.get("SHEETS_ID_CACHE", DEFAULT_ID_CACHE),
+                    help="title -> spreadsheet id önbellek dosyası")
+    ap.add_argument("--fresh", action="store_true",
+                    help="per-ticker: iş kuyruğunda tamamlananları da yeniden yaz")
+    ap.add_argument("--changes", metavar="CONSUMER",
+                    help="per-ticker: yalnızca değişiklik akışında (scripts/changefeed.py) değişen tickerlar "
+                         "(akış fiyatla değişen ratios/ dosyalarını kapsamaz: RATIOS eskiyebilir)")
+    args = ap.parse_args()
+
     root = Path(".").resolve()
     gc = get_client()
     share = os.environ.get("SHARE_WITH_EMAIL")
@@ -131,11 +375,34 @@ def main():
     if not tickers:
         print("No tickers found (kap_json & bilanco_json)."); sys.exit(0)
 
-    print(f"Total tickers: {len(tickers)}")
-    for i, t in enumerate(tickers, 1):
-        print(f"[{i}/{len(tickers)}] {t}")
-        run_one(gc, root, t, share)
-        time.sleep(1.0)  # rate limit dostu
+    id_cache = SpreadsheetIdCache(args.id_cache)
+    print(f"Total tickers: {len(tickers)} (mode={args.mode})")
+    try:
+        if args.mode == "consolidated":
+            run_consolidated(gc, root, tickers, share, id_cache, args.workbook, args.fin_periods)
+            return
+        # iş kuyruğu: girdisi değişmeyen ve yazılmış tickerlar atlanır, hata alanlar
+        # tekrar denenir; yarıda kalan çalıştırma kaldığı yerden devam eder
+        feed_upto = None
+        if args.changes:
+            import changefeed
+            tickers, feed_upto = changefeed.filter_tickers(args.changes, tickers)
+        queue = JobQueue("sheets")
+        hashes = {t: files_hash([root/"kap_json"/f"{t}.json", root/"bilanco_json"/f"{t}.json",
+                                 root/"ratios"/f"{t}.json"]) for t in tickers}
+        todo = queue.enqueue(tickers, hashes, fresh=args.fresh)
+        print(f"Queued: {todo}")
+        def one(t):
+            print(f"[{t}]")
+            run_one(gc, root, t, share, id_cache)
+            id_cache.save()
+        stats = work(queue, one, pause=1.0, tickers=tickers)  # rate limit dostu
+        print(f"✓ {stats['done']} done, {stats['failed']} failed; queue: {queue.counts()}")
+        queue.close()
+        if feed_upto is not None and not stats["failed"]:
+            changefeed.ack(args.changes, feed_upto)
+    finally:
+        id_cache.save()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,367 @@
+# scripts/snapshot.py
+# -*- coding: utf-8 -*-
+"""
+Tüm veri setinin tek dosyalık, bellek eşlemeli (mmap) ikili snapshot'ı.
+
+Her merge'den sonra bilanco_json/ + kap_json/ -> snapshot/data.bin:
+  - values   : float64 [ticker, kod, çeyrek] (NaN = veri yok). Çeyrek ekseni
+               quarterly.build_tensor ile aynı: q0'dan başlayan boşluksuz eksen.
+  - tickers / codes / periods / kod etiketleri (tr, en): paketlenmiş UTF-8 string
+    yığınına (heap) offset tabloları (int64, n+1 uzunluk)
+  - kap      : ticker × KAP_FIELDS summary alanları için heap offsetleri
+               (liste alanları \\x1f ile birleştirilir)
+  - src_stat : kaynak dosyaların (boyut, mtime_ns); okuyucu tazelik kontrolü için
+
+Okuyucu dosyayı mmap ile açar; başlık sabit boyutlu, bölümler np.frombuffer ile
+kopyasız görünümler. Açılış veri boyutundan bağımsızdır (milisaniyeler) ve aynı
+dosyayı açan süreçler sayfaları paylaşır. Yeni snapshot tmp + os.replace ile
+yazılır; açık okuyucular eski dosyayı görmeye devam eder.
+
+Kullanım:
+  python3 scripts/snapshot.py build
+  python3 scripts/snapshot.py info
+  python3 scripts/snapshot.py get ARCLK 1A --last 8
+  python3 scripts/snapshot.py get ARCLK              # KAP summary alanları
+API:
+  snap = Snapshot.open()
+  snap.series("ARCLK", "1A"); snap.summary("ARCLK"); V, q0 = snap.tensor(["1A", "2N"])
+"""
+
+import os, sys, json, mmap, time, struct, argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from merge_kap_bilanco import BILANCO_DIR, KAP_DIR, ensure_dir, load_json_safe
+import metrics
+import quarterly
+
+SNAPSHOT_DIR = "snapshot"
+SNAPSHOT_PATH = os.path.join(SNAPSHOT_DIR, "data.bin")
+MAGIC = b"D825SNAP"
+VERSION = 1
+HEAD = struct.Struct("<8sII")     # magic, sürüm, başlık JSON uzunluğu
+ALIGN = 64
+LIST_SEP = "\x1f"
+
+KAP_FIELDS = ["sektor_ana", "sektor_alt", "sektor_alt_list", "islem_gordugu_pazar",
+              "dahil_oldugu_endeksler", "internet_adresi", "denetim_kurulusu"]
+LIST_FIELDS = {"sektor_alt_list", "dahil_oldugu_endeksler"}
+
+def _stat(path: str) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except FileNotFoundError:
+        return -1, -1
+
+class _Heap:
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.size = 0
+
+    def add(self, s: Optional[str]) -> int:
+        """Stringi ekler, bitiş offsetini döner."""
+        if s:
+            b = s.encode("utf-8")
+            self.parts.append(b)
+            self.size += len(b)
+        return self.size
+
+    def table(self, strings: List[Optional[str]]) -> np.ndarray:
+        off = np.empty(len(strings) + 1, dtype=np.int64)
+        off[0] = self.size
+        for i, s in enumerate(strings):
+            off[i + 1] = self.add(s)
+        return off
+
+# ---------- derleme ----------
+def build(tickers: List[str], path: str = SNAPSHOT_PATH) -> Dict[str, Any]:
+    """İki geçiş: (1) kodlar / çeyrek aralığı / etiketler, (2) değerler doğrudan dosyaya."""
+    ensure_dir(os.path.dirname(path) or ".")
+    codes: Dict[str, Tuple[str, str]] = {}
+    q_lo, q_hi, present = None, None, []
+    for t in tickers:
+        doc = load_json_safe(os.path.join(BILANCO_DIR, f"{t}.json"))
+        if doc is None:
+            continue
+        present.append(t)
+        for code, node in (doc.get("items") or {}).items():
+            if code not in codes:
+                codes[code] = (node.get("tr") or "", node.get("en") or "")
+        qs = [quarterly.period_index(pk) for pk in quarterly.period_keys(doc)]
+        if qs:
+            q_lo = min(qs) if q_lo is None else min(q_lo, min(qs))
+            q_hi = max(qs) if q_hi is None else max(q_hi, max(qs))
+    tickers = present
+    code_list = sorted(codes)
+    code_pos = {c: i for i, c in enumerate(code_list)}
+    q0 = q_lo or 0
+    nq = 0 if q_lo is None else q_hi - q_lo + 1
+    periods = [quarterly.index_to_period(q0 + i) for i in range(nq)]
+
+    heap = _Heap()
+    summaries = {t: ((load_json_safe(os.path.join(KAP_DIR, f"{t}.json")) or {}).get("summary") or {}) for t in tickers}
+    kap_strings = []
+    for t in tickers:
+        s = summaries[t]
+        for f in KAP_FIELDS:
+            v = s.get(f)
+            kap_strings.append(LIST_SEP.join(map(str, v)) if isinstance(v, list) else (None if v is None else str(v)))
+    arrays = {
+        "ticker_off": heap.table(tickers),
+        "code_off": heap.table(code_list),
+        "tr_off": heap.table([codes[c][0] for c in code_list]),
+        "en_off": heap.table([codes[c][1] for c in code_list]),
+        "period_off": heap.table(periods),
+        "kap_off": heap.table(kap_strings),
+        "src_stat": np.array([[*_stat(os.path.join(BILANCO_DIR, f"{t}.json")), *_stat(os.path.join(KAP_DIR, f"{t}.json"))]
+                              for t in tickers], dtype=np.int64).reshape(len(tickers), 4),
+    }
+    del summaries, kap_strings
+
+    # bölüm yerleşimi
+    layout = [("values", "<f8", [len(tickers), len(code_list), nq])]
+    layout += [(k, "<i8", list(a.shape)) for k, a in arrays.items()]
+    layout.append(("heap", "u1", [heap.size]))
+    header = {"version": VERSION, "q0": q0, "kap_fields": KAP_FIELDS, "created_at": time.time(), "sections": {}}
+    reserve = 4096   # başlık JSON için sabit alan (bölüm sayısı sabit)
+    off = HEAD.size + reserve
+    for name, dtype, shape in layout:
+        off = (off + ALIGN - 1) // ALIGN * ALIGN
+        header["sections"][name] = [off, dtype, shape]
+        off += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    hjson = json.dumps(header).encode()
+    if len(hjson) > reserve:
+        raise RuntimeError("snapshot başlığı sığmadı")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEAD.pack(MAGIC, VERSION, len(hjson)) + hjson)
+        f.truncate(max(off, 1))
+    def section(name):
+        o, dt, shape = header["sections"][name]
+        return np.memmap(tmp, dtype=dt, mode="r+", offset=o, shape=tuple(shape))
+    if tickers and code_list and nq:
+        V = section("values")
+        V[...] = np.nan
+        # 2. geçiş: değerler doğrudan dosyaya (ticker başına bir doküman bellekte)
+        for ti, t in enumerate(tickers):
+            doc = load_json_safe(os.path.join(BILANCO_DIR, f"{t}.json")) or {}
+            for code, node in (doc.get("items") or {}).items():
+                row = V[ti, code_pos[code]]
+                for pk, v in (node.get("values") or {}).items():
+                    if v is not None:
+                        row[quarterly.period_index(pk) - q0] = v
+        V.flush()
+        del V   # satır görünümleriyle birlikte eşleme GC ile kapanır
+    with open(tmp, "r+b") as f:
+        for k, a in arrays.items():
+            f.seek(header["sections"][k][0])
+            f.write(a.tobytes())
+        f.seek(header["sections"]["heap"][0])
+        for b in heap.parts:
+            f.write(b)
+    os.replace(tmp, path)
+    metrics.bytes_written(path)
+    return {"tickers": len(tickers), "codes": len(code_list), "periods": nq, "bytes": off}
+
+# ---------- okuma ----------
+class Snapshot:
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, hlen = HEAD.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"snapshot biçimi tanınmadı: {path}")
+        self.header = json.loads(self._mm[HEAD.size:HEAD.size + hlen])
+        self.q0 = self.header["q0"]
+        self.kap_fields = self.header["kap_fields"]
+        self.values = self._view("values")        # [ticker, kod, çeyrek], salt okunur
+        self._heap = self._view("heap")
+        self._cache: Dict[str, Any] = {}
+
+    @classmethod
+    def open(cls, path: str = SNAPSHOT_PATH) -> "Snapshot":
+        return cls(path)
+
+    def _view(self, name: str) -> np.ndarray:
+        off, dtype, shape = self.header["sections"][name]
+        return np.frombuffer(self._mm, dtype=dtype, count=int(np.prod(shape)), offset=off).reshape(shape)
+
+    def close(self):
+        self.values = self._heap = None
+        self._cache.clear()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass   # dışarıda yaşayan görünümler var; mmap GC ile kapanır
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- string tabloları (ilk erişimde çözülür) ---
+    def _str(self, a: int, b: int) -> str:
+        return self._heap[a:b].tobytes().decode("utf-8")
+
+    def _table(self, name: str) -> List[str]:
+        if name not in self._cache:
+            off = self._view(name)
+            raw = self._heap[off[0]:off[-1]].tobytes()
+            base = int(off[0])
+            self._cache[name] = [raw[int(a) - base:int(b) - base].decode("utf-8") for a, b in zip(off[:-1], off[1:])]
+        return self._cache[name]
+
+    @property
+    def tickers(self) -> List[str]:
+        return self._table("ticker_off")
+
+    @property
+    def codes(self) -> List[str]:
+        return self._table("code_off")
+
+    @property
+    def periods(self) -> List[str]:
+        return self._table("period_off")
+
+    def label(self, code: str) -> Tuple[str, str]:
+        ci = self.code_pos(code)
+        return self._table("tr_off")[ci], self._table("en_off")[ci]
+
+    def ticker_pos(self, ticker: str) -> int:
+        if "tpos" not in self._cache:
+            self._cache["tpos"] = {t: i for i, t in enumerate(self.tickers)}
+        return self._cache["tpos"][ticker]
+
+    def code_pos(self, code: str) -> int:
+        if "cpos" not in self._cache:
+            self._cache["cpos"] = {c: i for i, c in enumerate(self.codes)}
+        return self._cache["cpos"][code]
+
+    def __contains__(self, ticker: str) -> bool:
+        try:
+            self.ticker_pos(ticker)
+            return True
+        except KeyError:
+            return False
+
+    # --- değerler ---
+    def row(self, ticker: str, code: str) -> np.ndarray:
+        """Kopyasız görünüm: çeyrek ekseni boyunca değerler."""
+        return self.values[self.ticker_pos(ticker), self.code_pos(code)]
+
+    def series(self, ticker: str, code: str) -> Dict[str, float]:
+        row = self.row(ticker, code)
+        return {quarterly.index_to_period(self.q0 + int(i)): float(row[i]) for i in np.flatnonzero(~np.isnan(row))}
+
+    def value(self, ticker: str, code: str, period: str) -> Optional[float]:
+        v = self.row(ticker, code)[quarterly.period_index(period) - self.q0]
+        return None if np.isnan(v) else float(v)
+
+    def tensor(self, codes: List[str], tickers: Optional[List[str]] = None) -> Tuple[np.ndarray, int]:
+        """quarterly.build_tensor ile aynı yerleşim: (V[ticker, kod, çeyrek], q0). Bilinmeyen kod -> NaN."""
+        ti = [self.ticker_pos(t) for t in tickers] if tickers is not None else slice(None)
+        V = np.full((len(self.tickers) if tickers is None else len(tickers), len(codes), self.values.shape[2]), np.nan)
+        for j, c in enumerate(codes):
+            try:
+                V[:, j] = self.values[ti, self.code_pos(c)]
+            except KeyError:
+                pass
+        return V, self.q0
+
+    # --- KAP ---
+    def summary(self, ticker: str) -> Dict[str, Any]:
+        off = self._view("kap_off")
+        n = len(self.kap_fields)
+        base = self.ticker_pos(ticker) * n
+        out = {}
+        for k, f in enumerate(self.kap_fields):
+            s = self._str(int(off[base + k]), int(off[base + k + 1]))
+            out[f] = (s.split(LIST_SEP) if s else []) if f in LIST_FIELDS else (s or None)
+        return out
+
+    def is_fresh(self, ticker: str, bilanco: bool = True, kap: bool = True) -> bool:
+        """Kaynak dosyalar snapshot'tan sonra değişmediyse True."""
+        if ticker not in self:
+            return False
+        st = self._view("src_stat")[self.ticker_pos(ticker)]
+        if bilanco and tuple(st[:2]) != _stat(os.path.join(BILANCO_DIR, f"{ticker}.json")):
+            return False
+        if kap and tuple(st[2:]) != _stat(os.path.join(KAP_DIR, f"{ticker}.json")):
+            return False
+        return True
+
+def open_or_none(path: str = SNAPSHOT_PATH) -> Optional[Snapshot]:
+    try:
+        return Snapshot(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠ snapshot açılamadı ({path}): {e}")
+        return None
+
+def kap_summaries(tickers: List[str], snap: Optional[Snapshot] = None) -> Dict[str, Dict[str, Any]]:
+    """ticker -> KAP summary; kap_json'u snapshot'tan sonra değişmemişse snapshot'tan, değilse dosyadan."""
+    own = snap is None
+    snap = snap or open_or_none()
+    out, hit = {}, 0
+    try:
+        for t in tickers:
+            if snap is not None and snap.is_fresh(t, bilanco=False):
+                out[t] = snap.summary(t)
+                hit += 1
+            else:
+                out[t] = (load_json_safe(os.path.join(KAP_DIR, f"{t}.json")) or {}).get("summary") or {}
+    finally:
+        if own and snap is not None:
+            snap.close()
+    metrics.inc("snapshot_hits", hit, kind="kap_summary")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["build", "info", "get"])
+    ap.add_argument("args", nargs="*", help="get: TICKER [KOD]")
+    ap.add_argument("--path", default=SNAPSHOT_PATH)
+    ap.add_argument("--last", type=int, default=0, help="get: son N dönem")
+    a = ap.parse_args()
+    if a.cmd == "build":
+        t0 = time.perf_counter()
+        with metrics.timer("snapshot_build_seconds"):
+            info = build(quarterly.read_tickers(a.args), a.path)
+        print(f"✓ snapshot: {info['tickers']} ticker × {info['codes']} kod × {info['periods']} çeyrek, "
+              f"{info['bytes'] / 1e6:.1f} MB → {a.path} ({time.perf_counter() - t0:.1f} s)")
+        return
+    t0 = time.perf_counter()
+    snap = Snapshot(a.path)
+    opened = (time.perf_counter() - t0) * 1000
+    if a.cmd == "info":
+        h = snap.header
+        T, C, Q = snap.values.shape
+        print(f"{a.path}: {T} ticker × {C} kod × {Q} çeyrek ({snap.periods[0] if Q else '-'} … {snap.periods[-1] if Q else '-'})")
+        print(f"oluşturma: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(h['created_at']))}, açılış {opened:.2f} ms")
+        return
+    if not a.args:
+        print("TICKER gerekli", file=sys.stderr); sys.exit(1)
+    t = a.args[0].upper()
+    if t not in snap:
+        print(f"✗ {t} snapshot'ta yok", file=sys.stderr); sys.exit(1)
+    if len(a.args) == 1:
+        print(json.dumps(snap.summary(t), ensure_ascii=False, indent=2))
+        return
+    code = a.args[1]
+    items = list(snap.series(t, code).items())
+    if a.last:
+        items = items[-a.last:]
+    tr, en = snap.label(code)
+    print(f"{t} {code} {tr} / {en}")
+    for pk, v in items:
+        print(f"  {pk:8s} {v:,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# scripts/synth_data.py
+# -*- coding: utf-8 -*-
+"""
+Sentetik N-ticker veri seti üretici (benchmark / yük testi için).
+
+Depodaki örnek dosyalar şablon olarak kullanılır:
+  - bilanco_json/<T>.json : şablonun tüm kodları (147) × dönemleri (70+); değerler
+    ticker ölçeği × dönem gürültüsü ile türetilir. Bir kısmı geç halka arz
+    (ilk dönemler yok), bir kısmı son çeyreği henüz açıklamamış olur.
+  - kap_json/<T>.json     : summary / general / ownership / board_members /
+    oy_haklari / katilim_4_7. Yönetim kurulu üyeleri ve ortaklar ortak havuzlardan
+    seçilir (gerçek piyasadaki gibi kesişen yönetim / çapraz ortaklık).
+  - public/tickers.txt    : üretilen semboller
+  - final/<T>.json        : (--final) merge çıktısıyla aynı biçim
+
+Aynı seed ve N ile çıktı deterministiktir.
+
+Kullanım:
+  python3 scripts/synth_data.py 500 --out .cache/bench/n500
+  python3 scripts/synth_data.py 50 --out /tmp/synth --final --seed 7
+"""
+
+import os, json, glob, random, argparse
+from typing import Any, Dict, List
+
+import numpy as np
+
+TEMPLATE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+META_FILE = "synth.json"
+
+FIRST_NAMES = ["AHMET", "MEHMET", "AYŞE", "FATMA", "MUSTAFA", "ZEYNEP", "ALİ", "ELİF", "HÜSEYİN", "EMİNE",
+               "MURAT", "SELİN", "KEMAL", "DENİZ", "CAN", "BURCU", "OĞUZ", "GÜLŞEN", "İSMAİL", "ŞEBNEM"]
+LAST_NAMES = ["YILMAZ", "KAYA", "DEMİR", "ŞAHİN", "ÇELİK", "YILDIZ", "ÖZTÜRK", "AYDIN", "ÖZDEMİR", "ARSLAN",
+              "DOĞAN", "KILIÇ", "ASLAN", "ÇETİN", "KOÇ", "KURT", "ÖZKAN", "ŞİMŞEK", "POLAT", "GÜNEŞ"]
+HOLDER_SUFFIX = ["HOLDİNG A.Ş.", "YATIRIM A.Ş.", "SANAYİ VE TİCARET A.Ş.", "GİRİŞİM SERMAYESİ A.Ş."]
+ROLES = ["Yönetim Kurulu Başkanı", "Yönetim Kurulu Başkan Vekili", "Yönetim Kurulu Üyesi",
+         "Bağımsız Yönetim Kurulu Üyesi"]
+MARKETS = ["YILDIZ PAZAR", "ANA PAZAR", "ALT PAZAR", "YAKIN İZLEME PAZARI"]
+INDICES = ["BIST 30", "BIST 50", "BIST 100", "BIST TÜM", "BIST SINAİ", "BIST MALİ", "BIST HİZMETLER",
+           "BIST KURUMSAL YÖNETİM", "BIST SÜRDÜRÜLEBİLİRLİK", "BIST 500", "BIST İSTANBUL", "BIST TEMETTÜ"]
+EXTRA_SECTORS = [("MALİ KURULUŞLAR", "BANKALAR"), ("MALİ KURULUŞLAR", "HOLDİNGLER VE YATIRIM ŞİRKETLERİ"),
+                 ("ELEKTRİK GAZ VE SU", "ELEKTRİK GAZ VE BUHAR"), ("TEKNOLOJİ", "BİLİŞİM"),
+                 ("ULAŞTIRMA VE HABERLEŞME", "ULAŞTIRMA VE DEPOLAMA"), ("İNŞAAT VE BAYINDIRLIK", "İNŞAAT")]
+
+def tr_number(x: float, decimals: int = 2) -> str:
+    """1234567.8 -> '1.234.567,80' (KAP biçimi)"""
+    s = f"{x:,.{decimals}f}"
+    return s.replace(",", "_").replace(".", ",").replace("_", ".")
+
+def make_tickers(n: int) -> List[str]:
+    """Beş harfli, benzersiz semboller: ZAAAA, ZAAAB, ..."""
+    out = []
+    for i in range(n):
+        s, k = "", i
+        for _ in range(4):
+            s = chr(65 + k % 26) + s
+            k //= 26
+        out.append("Z" + s)
+    return out
+
+def load_templates(root: str = TEMPLATE_ROOT):
+    bil = [json.load(open(p, encoding="utf-8")) for p in sorted(glob.glob(os.path.join(root, "bilanco_json", "*.json")))]
+    kap = [json.load(open(p, encoding="utf-8")) for p in sorted(glob.glob(os.path.join(root, "kap_json", "*.json")))]
+    if not bil or not kap:
+        raise SystemExit(f"✗ şablon bulunamadı: {root}/bilanco_json, kap_json")
+    return bil, kap
+
+def synth_bilanco(tpl: Dict[str, Any], ticker: str, rng: np.random.Generator) -> Dict[str, Any]:
+    meta = tpl["meta"]
+    pkeys = list(meta["periodKeys"])
+    # geç halka arz (%30) / son çeyrek henüz yok (%10)
+    start = int(rng.integers(0, len(pkeys) - 8)) if rng.random() < 0.3 else 0
+    end = len(pkeys) - 1 if rng.random() < 0.1 else len(pkeys)
+    pkeys = pkeys[start:end]
+    scale = float(rng.lognormal(0.0, 1.2))
+    # dönem gürültüsü tüm kodlarda ortak (şirket büyüklüğü) + kod başına küçük sapma
+    common = np.exp(np.cumsum(rng.normal(0.0, 0.03, len(pkeys))))
+    items = {}
+    for code, node in tpl["items"].items():
+        vals = node.get("values") or {}
+        noise = common * rng.lognormal(0.0, 0.05, len(pkeys))
+        out = {}
+        for pk, f in zip(pkeys, noise):
+            v = vals.get(pk)
+            out[pk] = None if v is None else int(round(v * scale * f))
+        items[code] = {"code": code, "tr": node.get("tr"), "en": node.get("en"), "values": out}
+    return {"meta": {"ticker": ticker, "group": meta.get("group"), "currency": meta.get("currency"),
+                     "fetchedAt": meta.get("fetchedAt"), "periodKeys": pkeys},
+            "items": items}
+
+class People:
+    """Ortak kişi / ortak havuzları: küçük havuz = daha çok kesişim."""
+    def __init__(self, n: int, rnd: random.Random):
+        self.rnd = rnd
+        self.persons = sorted({f"{rnd.choice(FIRST_NAMES)} {rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+                               for _ in range(max(60, n * 3))})
+        self.holders = sorted({f"{rnd.choice(LAST_NAMES)} {rnd.choice(HOLDER_SUFFIX)}" for _ in range(max(20, n // 3))})
+
+    def board(self, template: Dict[str, Any]) -> List[Dict[str, Any]]:
+        k = self.rnd.randint(5, 12)
+        out = []
+        for i, name in enumerate(self.rnd.sample(self.persons, k)):
+            m = dict(template)
+            m.update({
+                "Adı-Soyadı": name,
+                "Cinsiyeti": self.rnd.choice(["Erkek", "Kadın"]),
+                "Görevi": ROLES[0] if i == 0 else (ROLES[1] if i == 1 else self.rnd.choice(ROLES[2:])),
+                "Yönetim Kuruluna İlk Seçilme Tarihi": f"{self.rnd.randint(1, 28):02d}/{self.rnd.randint(1, 12):02d}/{self.rnd.randint(1990, 2025)}",
+                "İcrada Görevli Olup Olmadığı": self.rnd.choice(["İcrada Görevli", "İcrada Görevli Değil"]),
+                "Denetim, Muhasebe ve/veya Finans Alanında En Az 5 Yıllık Deneyime Sahip Olup Olmadığı": self.rnd.choice(["Evet", "Hayır"]),
+                "Sermayedeki Payı (%)": tr_number(self.rnd.random() * 3) if self.rnd.random() < 0.3 else "0",
+            })
+            out.append(m)
+        return out
+
+def synth_kap(tpl: Dict[str, Any], ticker: str, people: People, sectors: List, rnd: random.Random) -> Dict[str, Any]:
+    sektor_ana, sektor_alt = rnd.choice(sectors)
+    capital = rnd.choice([1e7, 5e7, 1e8, 2.5e8, 1e9]) * rnd.randint(1, 9)
+    # ortaklar: 1-4 büyük ortak + DİĞER + TOPLAM
+    holders = rnd.sample(people.holders, rnd.randint(1, 4))
+    left, own = 100.0, []
+    for h in holders:
+        pct = round(rnd.uniform(5, min(60.0, left - 5)), 2) if left > 10 else 0
+        if pct < 5:
+            break
+        left -= pct
+        own.append({"Ortağın Adı-Soyadı/Ticaret Ünvanı": h, "Sermayedeki Payı(TL)": tr_number(capital * pct / 100),
+                    "Sermayedeki Payı(%)": tr_number(pct), "Oy Hakkı Oranı(%)": tr_number(pct)})
+    for name, pct in (("DİĞER", left), ("TOPLAM", 100.0)):
+        own.append({"Ortağın Adı-Soyadı/Ticaret Ünvanı": name, "Sermayedeki Payı(TL)": tr_number(capital * pct / 100),
+                    "Sermayedeki Payı(%)": tr_number(pct), "Oy Hakkı Oranı(%)": tr_number(pct)})
+    subs = []
+    for i in range(rnd.choice([0, 1, 2, 3, 5, 8, 15, 40])):
+        paid = capital * rnd.uniform(0.01, 0.5)
+        pct = rnd.choice([100.0, 100.0, rnd.uniform(10, 99)])
+        subs.append({"Ticaret Ünvanı": f"{ticker} İŞTİRAK {i + 1} A.Ş.", "Şirketin Faaliyet Konusu": sektor_alt.title(),
+                     "Ödenmiş/Çıkarılmış Sermayesi": tr_number(paid), "Şirketin Sermayedeki Payı": tr_number(paid * pct / 100),
+                     "Para Birimi": "TRY", "Şirketin Sermayedeki Payı(%)": tr_number(pct),
+                     "Şirket ile Olan İlişkinin Niteliği": "Bağlı Ortaklık" if pct > 50 else "İştirak"})
+    ff = rnd.uniform(5, 80)
+    summary = dict(tpl.get("summary") or {})
+    summary.update({
+        "internet_adresi": f"www.{ticker.lower()}.com.tr",
+        "sektoru_raw": sektor_ana + sektor_alt, "sektor_ana": sektor_ana, "sektor_alt": sektor_alt,
+        "sektor_alt_list": [sektor_alt],
+        "islem_gordugu_pazar": rnd.choice(MARKETS),
+        "dahil_oldugu_endeksler": rnd.sample(INDICES, rnd.randint(1, 6)),
+    })
+    board_tpl = ((tpl.get("board_members") or [{}])[0])
+    return {
+        "ticker": ticker,
+        "summary": summary,
+        "general": {"merkez_adresi": f"{ticker} Plaza No:{rnd.randint(1, 200)} İstanbul", "uretim_tesis_adresleri": [],
+                    "kotasyon_tarihi": f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/{rnd.randint(1986, 2024)}"},
+        "ownership": {"odenmis_cikarilmis_sermaye": None, "kayitli_sermaye_tavani": None, "sermaye_5ustu": own,
+                      "fiili_dolasim_tutar_tl": tr_number(capital * ff / 100), "fiili_dolasim_oran": tr_number(ff),
+                      "bagli_ortakliklar": subs},
+        "board_members": people.board(board_tpl),
+        "oy_haklari": {"pairs": [
+            {"alan": "Oy hakkında imtiyaz bulunup bulunmadığı", "deger": rnd.choice(["Hayır (No)", "Evet (Yes)"])},
+            {"alan": "En büyük pay sahibinin ortaklık oranı", "deger": "%" + own[0]["Sermayedeki Payı(%)"]}]},
+        "katilim_4_7": {"m1": rnd.choice(["EVET", "HAYIR"]), "m2": "HAYIR", "m3": "HAYIR", "m4": "HAYIR",
+                        "m5": tr_number(rnd.uniform(0, 5)), "m6": tr_number(rnd.uniform(0, 20)),
+                        "m7": tr_number(rnd.uniform(0, 60))},
+    }
+
+def write_json(path: str, obj: Any):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+def generate(n: int, out: str, seed: int = 42, final: bool = False, template_root: str = TEMPLATE_ROOT) -> List[str]:
+    bil_tpl, kap_tpl = load_templates(template_root)
+    rng, rnd = np.random.default_rng(seed), random.Random(seed)
+    people = People(n, rnd)
+    sectors = sorted({((k.get("summary") or {}).get("sektor_ana"), (k.get("summary") or {}).get("sektor_alt"))
+                      for k in kap_tpl} | set(EXTRA_SECTORS))
+    sectors = [s for s in sectors if s[0] and s[1]]
+    for d in ("bilanco_json", "kap_json", "public") + (("final",) if final else ()):
+        os.makedirs(os.path.join(out, d), exist_ok=True)
+    tickers = make_tickers(n)
+    for i, t in enumerate(tickers):
+        bil = synth_bilanco(bil_tpl[i % len(bil_tpl)], t, rng)
+        kap = synth_kap(kap_tpl[i % len(kap_tpl)], t, people, sectors, rnd)
+        write_json(os.path.join(out, "bilanco_json", f"{t}.json"), bil)
+        write_json(os.path.join(out, "kap_json", f"{t}.json"), kap)
+        if final:
+            write_json(os.path.join(out, "final", f"{t}.json"), {"ticker": t, "kap": kap, "bilanco": bil})
+        if (i + 1) % 500 == 0:
+            print(f"  … {i + 1}/{n}")
+    with open(os.path.join(out, "public", "tickers.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(tickers) + "\n")
+    write_json(os.path.join(out, META_FILE), {"n": n, "seed": seed, "final": final})
+    return tickers
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("n", type=int, help="ticker sayısı")
+    ap.add_argument("--out", required=True, help="hedef kök klasör (bilanco_json/, kap_json/, public/ oluşturulur)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--final", action="store_true", help="final/<T>.json da yaz")
+    ap.add_argument("--templates", default=TEMPLATE_ROOT, help="şablon bilanco_json/ ve kap_json/ kökü")
+    args = ap.parse_args()
+    tickers = generate(args.n, args.out, seed=args.seed, final=args.final, template_root=args.templates)
+    print(f"✓ {len(tickers)} sentetik ticker → {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# scripts/universe.py
+# -*- coding: utf-8 -*-
+"""
+Ticker evreni (universe) sağlayıcı.
+
+Çözüm sırası:
+  1) Açık override: ticker_file parametresi ya da UNIVERSE_FILE ENV'i verilmişse dosyadan
+  2) .cache/universe.json snapshot'ı TTL içindeyse oradan
+  3) Supabase 'companies' tablosundan çekip snapshot'ı yenile
+Pipeline'ın universe aşaması companies güncellendikten sonra `--refresh` ile
+snapshot'ı yeniler. CI'da dosya actions/cache'te 'universe-*' anahtarıyla taşınır:
+pipeline.yml yeniledikçe, prices.yml de TTL dolup kendisi yenilediğinde kaydeder;
+prices.yml her turda en yenisini geri yükler. Böylece 5 dakikalık prices job'unun
+sıcak yolunda DB sorgusu günde en fazla bir kez kalır.
+Varsayılan evren companies tablosunun tamamıdır; iş akışlarının genel TICKER_FILE'ı
+(public/tickers.txt, birkaç örnek ticker) bilerek okunmaz, evreni sessizce daraltmasın.
+
+Kullanım:
+  from universe import get_universe
+  tickers = get_universe(sb)
+  python3 scripts/universe.py            # evreni yazdır
+  python3 scripts/universe.py --refresh  # companies'ten yenile
+ENV:
+  UNIVERSE_FILE (override), UNIVERSE_CACHE (.cache/universe.json), UNIVERSE_TTL_HOURS (24)
+"""
+
+import os, sys, json, time, argparse
+from typing import List, Optional
+
+UNIVERSE_CACHE = os.environ.get("UNIVERSE_CACHE", os.path.join(".cache", "universe.json"))
+TTL_SEC = float(os.environ.get("UNIVERSE_TTL_HOURS", "24")) * 3600
+
+def from_file(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [ln.strip().upper() for ln in f if ln.strip() and not ln.strip().startswith("#")]
+
+def snapshot_from_db(sb) -> List[str]:
+    data = sb.table("companies").select("ticker").execute().data or []
+    return sorted({r["ticker"].upper() for r in data if r.get("ticker")})
+
+def load_snapshot(path: str = UNIVERSE_CACHE) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+        return snap if isinstance(snap.get("tickers"), list) else None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[WARN] universe cache okunamadı ({path}): {e}")
+        return None
+
+def save_snapshot(tickers: List[str], source: str, path: str = UNIVERSE_CACHE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": time.time(), "source": source, "tickers": tickers}, f)
+    os.replace(tmp, path)
+
+def refresh(sb, path: str = UNIVERSE_CACHE) -> List[str]:
+    tickers = snapshot_from_db(sb)
+    save_snapshot(tickers, "companies", path)
+    return tickers
+
+def get_universe(sb=None, ticker_file: Optional[str] = None, ttl: float = TTL_SEC,
+                 path: str = UNIVERSE_CACHE) -> List[str]:
+    ticker_file = ticker_file or os.environ.get("UNIVERSE_FILE")
+    if ticker_file and os.path.isfile(ticker_file):
+        return from_file(ticker_file)
+    snap = load_snapshot(path)
+    if snap and time.time() - float(snap.get("fetched_at") or 0) < ttl:
+        return snap["tickers"]
+    if sb is None:
+        # DB yok: bayat da olsa snapshot'ı kullan
+        return snap["tickers"] if snap else []
+    try:
+        return refresh(sb, path)
+    except Exception as e:
+        if snap:
+            print(f"[WARN] companies okunamadı, bayat snapshot kullanılıyor: {e}")
+            return snap["tickers"]
+        raise
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--refresh", action="store_true", help="companies tablosundan snapshot'ı yenile")
+    args = ap.parse_args()
+    sb = None
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if url and key:
+        from supabase import create_client
+        import metrics
+        sb = metrics.wrap_supabase(create_client(url, key))
+    if args.refresh:
+        if sb is None:
+            print("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY", file=sys.stderr); sys.exit(1)
+        tickers = refresh(sb)
+        print(f"✓ universe: {len(tickers)} ticker → {UNIVERSE_CACHE}")
+        return
+    for t in get_universe(sb):
+        print(t)
+
+if __name__ == "__main__":
+    main()
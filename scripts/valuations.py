@@ -0,0 +1,180 @@
+# scripts/valuations.py
+# -*- coding: utf-8 -*-
+"""
+Fiyat geldikçe piyasa değeri / çarpanlar (prices_job içinde akış olarak).
+
+Bellekte ticker başına son TTM temel veri + pay adedi tutulur:
+  - companies.shares_outstanding
+  - financials (bilanco, çeyreklik YTD) son ~2 yılı -> TTM (quarterly.ttm_from_ytd)
+    -> ratios.compute ile son dönem net_income_ttm / equity / net_debt / ebitda_ttm
+Her kotasyon batch'inde yalnızca gelen tickerlar için market_cap, EV, P/E, P/B,
+EV/EBITDA hesaplanır (ratios.market_ratios) ve 'valuations' tablosuna (ticker
+başına tek satır) upsert edilir. Böylece değerlemeler Sheets yeniden hesabı
+olmadan bir poll aralığı içinde günceldir.
+
+Snapshot .cache/fundamentals.json'a yazılır; TTL (VALUATIONS_TTL_HOURS, 6)
+dolunca DB'den yenilenir ve o tur tüm tickerlar yeniden değerlenir.
+
+Kullanım:
+  from valuations import Fundamentals
+  fund = Fundamentals(sb); rows = fund.value(quotes)
+  python3 scripts/valuations.py --refresh     # snapshot'ı DB'den yenile
+"""
+
+import os, sys, json, time, argparse
+from datetime import date
+from typing import Any, Dict, List
+
+import numpy as np
+
+import metrics
+import quarterly
+from merge_kap_bilanco import period_to_date
+from ratios import CODES, compute, market_ratios, to_rows
+
+FUNDAMENTALS_CACHE = os.environ.get("FUNDAMENTALS_CACHE", os.path.join(".cache", "fundamentals.json"))
+TTL_SEC = float(os.environ.get("VALUATIONS_TTL_HOURS", "6")) * 3600
+# TTM için t, t-4 ve önceki yıl sonu gerekir: 9 çeyrek yeterli
+LOOKBACK_QUARTERS = 9
+PAGE = 1000
+VALUATION_FIELDS = ["market_cap", "ev", "pe", "pb", "ev_ebitda"]
+
+def fetch_rows(query, page: int = PAGE) -> List[Dict[str, Any]]:
+    """PostgREST sayfalama (varsayılan 1000 satır sınırı)."""
+    out, start = [], 0
+    while True:
+        batch = query().range(start, start + page - 1).execute().data or []
+        out.extend(batch)
+        if len(batch) < page:
+            return out
+        start += page
+
+def date_to_period(d: str) -> str:
+    """'2025-06-30' -> '2025/6'"""
+    y, m = str(d)[:7].split("-")
+    return f"{int(y)}/{int(m)}"
+
+def docs_from_financials(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """financials satırları -> bilanco_json benzeri {ticker: {meta, items}} (yalnız CODES)."""
+    docs: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        t = (r.get("ticker") or "").upper()
+        if not t:
+            continue
+        pk = date_to_period(r["period"])
+        d = docs.setdefault(t, {"meta": {"ticker": t, "periodKeys": []}, "items": {c: {"values": {}} for c in CODES}})
+        d["meta"]["periodKeys"].append(pk)
+        data = r.get("data") or {}
+        for c in CODES:
+            if data.get(c) is not None:
+                d["items"][c]["values"][pk] = float(data[c])
+    for d in docs.values():
+        d["meta"]["periodKeys"].sort(key=quarterly.period_index)
+    return docs
+
+def latest_fundamentals(docs: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Tek vektörel geçiş: akış kalemleri TTM'e çevrilir, son dolu dönem alınır."""
+    tickers = sorted(docs)
+    if not tickers:
+        return {}
+    V, q0 = quarterly.build_tensor([docs[t] for t in tickers], CODES)
+    flow = np.array([quarterly.is_flow(c) for c in CODES])
+    V[:, flow, :] = quarterly.ttm_from_ytd(V[:, flow, :], q0)
+    series = compute(V)
+    out = {}
+    for ti, t in enumerate(tickers):
+        rows = to_rows(series, ti, q0, quarterly.period_keys(docs[t]))
+        if rows:
+            out[t] = rows[-1]
+    return out
+
+class Fundamentals:
+    """ticker -> {period, net_income_ttm, equity, net_debt, ebitda_ttm, ..., shares_outstanding}"""
+    def __init__(self, sb, ttl: float = TTL_SEC, path: str = FUNDAMENTALS_CACHE):
+        self.sb, self.ttl, self.path = sb, ttl, path
+        self.data: Dict[str, Dict[str, Any]] = {}
+        self.loaded_at = 0.0
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+            self.data, self.loaded_at = snap["data"], float(snap["loaded_at"])
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"[WARN] fundamentals cache okunamadı ({self.path}): {e}")
+            return False
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"loaded_at": self.loaded_at, "data": self.data}, f)
+        os.replace(tmp, self.path)
+
+    def refresh(self):
+        since = date(date.today().year - LOOKBACK_QUARTERS // 4 - 1, 1, 1).isoformat()
+        companies = fetch_rows(lambda: self.sb.table("companies").select("ticker,shares_outstanding"))
+        fin = fetch_rows(lambda: self.sb.table("financials").select("ticker,period,data")
+                         .eq("statement", "bilanco").eq("freq", "Q").gte("period", since)
+                         .order("ticker").order("period"))
+        with metrics.timer("fundamentals_seconds"):
+            data = latest_fundamentals(docs_from_financials(fin))
+        for r in companies:
+            t = (r.get("ticker") or "").upper()
+            if t:
+                data.setdefault(t, {})["shares_outstanding"] = r.get("shares_outstanding")
+        self.data, self.loaded_at = data, time.time()
+        self.save()
+        print(f"Fundamentals: {len(data)} ticker ({len(fin)} financials satırı)")
+
+    def ensure(self) -> bool:
+        """Snapshot'ı gerekiyorsa yükler/yeniler. Yenilendiyse True (tümü yeniden değerlenmeli)."""
+        if not self.data and not self.load():
+            self.refresh()
+            return True
+        if time.time() - self.loaded_at >= self.ttl:
+            try:
+                self.refresh()
+                return True
+            except Exception as e:
+                print(f"[WARN] fundamentals yenilenemedi, eski snapshot kullanılıyor: {e}")
+        return False
+
+    def value(self, quotes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """[{ticker, ts, close}] -> valuations satırları (pay adedi bilinmeyenler atlanır)."""
+        out = []
+        for q in quotes:
+            f = self.data.get(q["ticker"])
+            if not f or not f.get("shares_outstanding"):
+                continue
+            m = market_ratios(f, q["close"], float(f["shares_outstanding"]))
+            row = {"ticker": q["ticker"], "ts": q["ts"], "price": q["close"],
+                   "shares_outstanding": m["shares_outstanding"],
+                   # ratios tablosuyla aynı biçim ('2025/6' -> '2025-06-30'); period ile join'lenir
+                   "period": period_to_date(f["period"]) if f.get("period") else None}
+            row.update({k: m[k] for k in VALUATION_FIELDS})
+            out.append(row)
+        return out
+
+def upsert_valuations(sb, rows: List[Dict[str, Any]]):
+    for i in range(0, len(rows), PAGE):
+        sb.table("valuations").upsert(rows[i:i + PAGE], on_conflict="ticker").execute()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--refresh", action="store_true", help="snapshot'ı DB'den yenile")
+    args = ap.parse_args()
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        print("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY", file=sys.stderr); sys.exit(1)
+    from supabase import create_client
+    fund = Fundamentals(metrics.wrap_supabase(create_client(url, key)), ttl=0 if args.refresh else TTL_SEC)
+    fund.ensure()
+    n = sum(1 for f in fund.data.values() if f.get("shares_outstanding") and f.get("period"))
+    print(f"✓ fundamentals: {len(fund.data)} ticker, {n} değerlenebilir → {fund.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# tests/test_bilanco_fetch.py
+# -*- coding: utf-8 -*-
+"""bilanco_fetch'in artımlı yolu, yerel sahte MaliTablo sunucusuna (serve_stub) karşı."""
+
+import os, sys, json, shutil
+
+import pytest
+
+os.environ.setdefault("METRICS_DISABLE", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import bilanco_fetch
+
+SOURCE = os.path.join(os.path.dirname(__file__), "..", "bilanco_json", "ARCLK.json")
+DROP = 3   # dosyadan silinen son dönem sayısı
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    root = tmp_path / "stub"
+    (root / "bilanco_json").mkdir(parents=True)
+    shutil.copy(SOURCE, root / "bilanco_json" / "ARCLK.json")
+    srv = bilanco_fetch.serve_stub(0, str(root), block=False)
+    monkeypatch.setattr(bilanco_fetch, "API_URL", f"http://127.0.0.1:{srv.server_address[1]}/MaliTablo")
+    monkeypatch.setattr(bilanco_fetch, "MIN_INTERVAL", 0.0)
+    monkeypatch.chdir(tmp_path)   # jobqueue: .cache/jobs.sqlite test dizininde
+    try:
+        yield
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+def _truncated(doc):
+    doc = json.loads(json.dumps(doc))
+    gone = doc["meta"]["periodKeys"][-DROP:]
+    doc["meta"]["periodKeys"] = doc["meta"]["periodKeys"][:-DROP]
+    for node in doc["items"].values():
+        for p in gone:
+            node["values"].pop(p, None)
+    return doc, gone
+
+def _filled(doc):
+    return {(k, p): v for k, node in doc["items"].items() for p, v in node["values"].items() if v is not None}
+
+def test_incremental_fill_then_noop(stub, tmp_path, capsys):
+    with open(SOURCE, "r", encoding="utf-8") as f:
+        full = json.load(f)
+    out = tmp_path / "out"
+    out.mkdir()
+    path = out / "ARCLK.json"
+    doc, gone = _truncated(full)
+    assert not any(p in gone for (_, p) in _filled(doc))
+    bilanco_fetch.write_doc(str(path), doc)
+
+    # 1) eksik dönemler sahte API'den geri doldurulur
+    stats = bilanco_fetch.run(["ARCLK"], str(out), concurrency=1, run_key="t1")
+    assert stats == {"done": 1, "failed": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        got = json.load(f)
+    assert _filled(got) == _filled(full)
+    assert set(gone) <= set(got["meta"]["periodKeys"])
+
+    # 2) aynı run-key: kuyrukta iş yok, dosyaya dokunulmaz
+    before = (path.stat().st_mtime_ns, path.read_bytes())
+    capsys.readouterr()
+    stats = bilanco_fetch.run(["ARCLK"], str(out), concurrency=1, run_key="t1")
+    assert stats == {"done": 0, "failed": 0}
+    assert "→ 0/1 ticker kuyrukta" in capsys.readouterr().out
+    assert (path.stat().st_mtime_ns, path.read_bytes()) == before
+
+    # 3) --fresh: yeniden çekilir ama değer değişmediği için dosya yeniden yazılmaz
+    stats = bilanco_fetch.run(["ARCLK"], str(out), concurrency=1, run_key="t1", fresh=True)
+    assert stats == {"done": 1, "failed": 0}
+    assert "değişiklik yok" in capsys.readouterr().out
+    assert (path.stat().st_mtime_ns, path.read_bytes()) == before
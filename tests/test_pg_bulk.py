@@ -0,0 +1,141 @@
+# tests/test_pg_bulk.py
+# -*- coding: utf-8 -*-
+"""PgBulkLoader'ın yerel Postgres'e karşı testi (PG_DSN yoksa atlanır).
+
+  PG_DSN=postgresql://postgres:pg@localhost:5432/postgres python -m pytest -q tests/test_pg_bulk.py
+
+Tablolar her test için ayrı bir şemada kurulur ve sonunda silinir."""
+
+import os, sys, copy, json, glob, uuid
+
+import pytest
+
+os.environ.setdefault("METRICS_DISABLE", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+PG_DSN = os.environ.get("PG_DSN")
+pytestmark = pytest.mark.skipif(not PG_DSN, reason="PG_DSN tanımlı değil")
+psycopg = pytest.importorskip("psycopg")
+
+from merge_kap_bilanco import DB_TABLES, db_rows
+from pg_bulk import PgBulkLoader
+
+FINAL = os.path.join(os.path.dirname(__file__), "..", "final")
+
+SCHEMA = """
+create table raw_company_json(ticker text primary key, source text, payload jsonb, fetched_at timestamptz,
+    json_hash text);
+create table companies(ticker text primary key, website text, sector_main text, sector_sub text, market text,
+    indices jsonb, address text, listing_date date, free_float_ratio numeric, free_float_mcap numeric,
+    shares_outstanding numeric);
+create table kap_board_members(ticker text, name text, gender text, role text, profession text,
+    first_elected date, is_executive boolean, duties_last5y text, outside_roles text, has_fin_exp boolean,
+    equity_pct numeric, represented_share_group text, primary key (ticker, name));
+create table kap_ownership(ticker text, holder text, paid_in_tl numeric, pct numeric, voting_pct numeric,
+    primary key (ticker, holder));
+create table kap_subsidiaries(ticker text, company text, activity text, paid_in_capital numeric,
+    share_amount numeric, currency text, share_pct numeric, relation text, primary key (ticker, company));
+create table kap_vote_rights(ticker text, field text, value text, primary key (ticker, field));
+create table kap_katilim_4_7(ticker text primary key, m1 text, m2 text, m3 text, m4 text, m5 text, m6 text,
+    m7 text);
+create table financial_labels(code text primary key, tr text, en text, statement text);
+create table financials(ticker text, period date, freq text, statement text, currency text, data jsonb,
+    primary key (ticker, period, freq, statement));
+"""
+
+def _docs():
+    out = []
+    for p in sorted(glob.glob(os.path.join(FINAL, "*.json"))):
+        with open(p, "r", encoding="utf-8") as f:
+            out.append(json.load(f))
+    return out
+
+def _expected_counts(docs):
+    """Tablo -> anahtar bazında tekil satır sayısı (aynı anahtar tekrar ederse tek satır)."""
+    keys = {}
+    for d in docs:
+        for table, rows in db_rows(d).items():
+            key = dict(DB_TABLES)[table].split(",")
+            keys.setdefault(table, set()).update(tuple(str(r.get(k)) for k in key) for r in rows)
+    return {t: len(v) for t, v in keys.items() if v}
+
+@pytest.fixture
+def dsn():
+    schema = "test_pg_bulk_" + uuid.uuid4().hex[:8]
+    with psycopg.connect(PG_DSN, autocommit=True) as conn:
+        conn.execute(f"create schema {schema}")
+        conn.execute(f"set search_path to {schema}")
+        conn.execute(SCHEMA)
+    try:
+        yield psycopg.conninfo.make_conninfo(PG_DSN, options=f"-c search_path={schema}")
+    finally:
+        with psycopg.connect(PG_DSN, autocommit=True) as conn:
+            conn.execute(f"drop schema {schema} cascade")
+
+def _load(dsn, docs):
+    loader = PgBulkLoader(dsn)
+    for d in docs:
+        loader.add(d)
+    return loader.commit()
+
+def _counts(dsn):
+    with psycopg.connect(dsn) as conn:
+        return {t: conn.execute(f"select count(*) from {t}").fetchone()[0] for t, _ in DB_TABLES}
+
+def _scalar(dsn, query, *args):
+    with psycopg.connect(dsn) as conn:
+        row = conn.execute(query, args).fetchone()
+        return row[0] if row else None
+
+def test_load_twice_is_idempotent(dsn):
+    docs = _docs()
+    assert docs
+    expected = _expected_counts(docs)
+    for _ in range(2):
+        _load(dsn, docs)
+        counts = _counts(dsn)
+        assert {t: n for t, n in counts.items() if n} == expected
+
+def test_duplicate_key_last_write_wins(dsn):
+    doc = _docs()[0]
+    newer = copy.deepcopy(doc)
+    newer["kap"]["summary"]["internet_adresi"] = "www.example.com.tr"
+    _load(dsn, [doc, newer])
+    assert _scalar(dsn, "select website from companies where ticker = %s", doc["ticker"]) == "www.example.com.tr"
+    assert _counts(dsn)["companies"] == 1
+
+def test_replace_tables_drop_stale_rows(dsn):
+    docs = _docs()
+    _load(dsn, docs)
+    doc = docs[0]
+    t = doc["ticker"]
+    before = _counts(dsn)
+    n_board = _scalar(dsn, "select count(*) from kap_board_members where ticker = %s", t)
+    gone = doc["kap"]["board_members"][0]["Adı-Soyadı"]
+
+    changed = copy.deepcopy(doc)
+    del changed["kap"]["board_members"][0]
+    _load(dsn, [changed])
+    assert _scalar(dsn, "select count(*) from kap_board_members where ticker = %s", t) == n_board - 1
+    assert _scalar(dsn, "select count(*) from kap_board_members where ticker = %s and name = %s", t, gone) == 0
+    # diğer tickerların satırları yerinde
+    assert _counts(dsn)["kap_board_members"] == before["kap_board_members"] - 1
+
+def test_failed_table_rolls_back_everything(dsn):
+    docs = _docs()
+    _load(dsn, docs)
+    before = _counts(dsn)
+    doc = docs[0]
+    website = _scalar(dsn, "select website from companies where ticker = %s", doc["ticker"])
+
+    # companies'ten sonra yazılan kap_vote_rights'ın COPY'si metin değerlerde düşer
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("alter table kap_vote_rights alter column value type integer using null")
+    changed = copy.deepcopy(doc)
+    changed["kap"]["summary"]["internet_adresi"] = "www.example.com.tr"
+    del changed["kap"]["board_members"][0]
+    with pytest.raises(psycopg.Error):
+        _load(dsn, [changed])
+
+    assert _scalar(dsn, "select website from companies where ticker = %s", doc["ticker"]) == website
+    assert _counts(dsn) == before
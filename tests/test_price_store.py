@@ -0,0 +1,74 @@
+# tests/test_price_store.py
+# -*- coding: utf-8 -*-
+"""Kayıtlı yfinance yanıtlarıyla (tests/fixtures/backfill) çevrimdışı backfill testi."""
+
+import os, sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import prices_backfill
+from price_store import PriceStore, BAR_DTYPE, to_epoch
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "backfill")
+
+def _bars(days, close):
+    out = np.zeros(len(days), dtype=BAR_DTYPE)
+    out["ts"] = [to_epoch(d) for d in days]
+    out["open"] = out["high"] = out["low"] = out["close"] = close
+    return out
+
+def test_replay_resume_merges_bars(tmp_path):
+    store = PriceStore(str(tmp_path / "store"))
+    cp = str(tmp_path / "cp.json")
+    src = prices_backfill.ReplaySource(FIXTURES)
+
+    first = prices_backfill.run(["ARCLK"], src, start="2020-01-01", end="2020-01-04",
+                                store=store, cp_path=cp, concurrency=1)
+    assert first["bars"] == 3 and first["failed"] == 0
+    assert prices_backfill.load_checkpoint(cp) == {"ARCLK": "2020-01-03"}
+
+    # devam: checkpoint'ten sonraki günler mevcut barlara eklenmeli
+    second = prices_backfill.run(["ARCLK"], src, start="2020-01-01", end="2020-01-08",
+                                 store=store, cp_path=cp, concurrency=1)
+    assert second["bars"] == 2 and second["failed"] == 0
+    bars = store.bars("ARCLK", "1d")
+    assert len(bars) == 5
+    assert [prices_backfill.bar_day(t) for t in bars["ts"]] == [
+        "2020-01-01", "2020-01-02", "2020-01-03", "2020-01-06", "2020-01-07"]
+    assert bars["close"].tolist() == [100.0, 101.0, 102.0, 110.0, 111.0]
+    assert prices_backfill.load_checkpoint(cp) == {"ARCLK": "2020-01-07"}
+
+def test_write_bars_keeps_open_bar(tmp_path):
+    store = PriceStore(str(tmp_path))
+    assert store.write_bars("ARCLK", "1d", _bars(["2020-01-01", "2020-01-02", "2020-01-03"], 1.0)) == 3
+    # son (açık) bar korunur, diğer çakışanlar yenisiyle değişir, yeniler eklenir
+    n = store.write_bars("ARCLK", "1d", _bars(["2020-01-02", "2020-01-03", "2020-01-06"], 2.0))
+    assert n == 2
+    bars = store.bars("ARCLK", "1d")
+    assert len(bars) == 4
+    assert bars["close"].tolist() == [1.0, 2.0, 1.0, 2.0]
+
+def test_open_session_bar_not_checkpointed(tmp_path):
+    store = PriceStore(str(tmp_path / "store"))
+    cp = str(tmp_path / "cp.json")
+    src = prices_backfill.ReplaySource(FIXTURES)
+
+    # 2020-01-03 12:00 TR: seans açık, o günün barı kısmi -> yazılmaz, checkpoint 01-02'de kalır
+    during = datetime(2020, 1, 3, 9, 0, tzinfo=timezone.utc)
+    first = prices_backfill.run(["ARCLK"], src, start="2020-01-01", end="2020-01-04",
+                                store=store, cp_path=cp, concurrency=1, now=during)
+    assert first["bars"] == 2
+    assert prices_backfill.load_checkpoint(cp) == {"ARCLK": "2020-01-02"}
+
+    # kapanıştan sonra kesinleşmiş bar çekilir
+    after = datetime(2020, 1, 3, 16, 0, tzinfo=timezone.utc)
+    second = prices_backfill.run(["ARCLK"], src, start="2020-01-01", end="2020-01-04",
+                                 store=store, cp_path=cp, concurrency=1, now=after)
+    assert second["bars"] == 1
+    bars = store.bars("ARCLK", "1d")
+    assert [prices_backfill.bar_day(t) for t in bars["ts"]] == ["2020-01-01", "2020-01-02", "2020-01-03"]
+    assert bars["close"].tolist() == [100.0, 101.0, 102.5]
+    assert prices_backfill.load_checkpoint(cp) == {"ARCLK": "2020-01-03"}